@@ -0,0 +1,103 @@
+"""
+Issue aggregation and capping.
+
+Generated or legacy files can produce thousands of near-identical
+findings (one naming issue per variable, ...). Responses, stored versions
+and AI prompts get a bounded list instead:
+
+- at most ISSUE_CAP_PER_TYPE issues of each type (ISSUE_TYPE_CAPS
+  overrides per type), at most MAX_ISSUES in total, in line order
+- a summary grouping every issue by (type, message template) with its
+  count and a few sample lines, so nothing is silently lost
+- exact totals per (type, severity) ("counts"), which a saved version
+  sends back so trend analytics are not clipped by the caps
+
+The full list stays available through GET /analyze/{result_id}/issues.
+
+Settings (environment):
+- CODESAGE_ISSUE_CAP_PER_TYPE   (default 50)
+- CODESAGE_ISSUE_MAX            (default 500)
+"""
+
+import os
+from typing import Optional
+
+from analysis.common import issue_line, split_message
+
+ISSUE_CAP_PER_TYPE = int(os.environ.get("CODESAGE_ISSUE_CAP_PER_TYPE", "50"))
+MAX_ISSUES = int(os.environ.get("CODESAGE_ISSUE_MAX", "500"))
+
+# Per-type overrides of ISSUE_CAP_PER_TYPE
+ISSUE_TYPE_CAPS = {
+    "syntax-error": 1,
+    "rule-error": 10,
+}
+
+SAMPLE_LINES = 5    # lines listed per group
+MAX_GROUPS = 200    # groups listed in the summary (largest first)
+
+
+def type_cap(issue_type: str, per_type_cap: Optional[int] = None) -> int:
+    cap = ISSUE_TYPE_CAPS.get(issue_type, ISSUE_CAP_PER_TYPE)
+    return min(cap, per_type_cap) if per_type_cap is not None else cap
+
+
+def cap_issues(issues: list, per_type_cap: Optional[int] = None) -> list:
+    """First issues of each type (input is in line order), bounded overall."""
+    kept, seen = [], {}
+    for issue in issues:
+        if len(kept) >= MAX_ISSUES:
+            break
+        issue_type = issue.get("type")
+        count = seen.get(issue_type, 0)
+        if count < type_cap(issue_type, per_type_cap):
+            kept.append(issue)
+        seen[issue_type] = count + 1
+    return kept
+
+
+def group_issues(issues: list) -> list:
+    groups = {}
+    for issue in issues:
+        template, _ = split_message(issue.get("message"))
+        key = (issue.get("type"), template)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "type": key[0],
+                "template": template,
+                "severity": issue.get("severity"),
+                "count": 0,
+                "sample_lines": [],
+            }
+        group["count"] += 1
+        if len(group["sample_lines"]) < SAMPLE_LINES:
+            group["sample_lines"].append(issue_line(issue))
+
+    ordered = sorted(groups.values(), key=lambda g: -g["count"])
+    return ordered[:MAX_GROUPS]
+
+
+def count_issues(issues: list) -> list:
+    """[{type, severity, count}] over every issue (no cap)."""
+    counts = {}
+    for issue in issues:
+        key = (issue.get("type"), issue.get("severity"))
+        counts[key] = counts.get(key, 0) + 1
+    return [
+        {"type": issue_type, "severity": severity, "count": count}
+        for (issue_type, severity), count in counts.items()
+    ]
+
+
+def summarize_issues(issues: list, per_type_cap: Optional[int] = None) -> tuple:
+    """(capped issues, summary) for a full, line-ordered issue list."""
+    capped = cap_issues(issues, per_type_cap)
+    summary = {
+        "total": len(issues),
+        "returned": len(capped),
+        "truncated": len(capped) < len(issues),
+        "groups": group_issues(issues),
+        "counts": count_issues(issues),
+    }
+    return capped, summary
@@ -1,13 +1,91 @@
 import ast
+import re
+import sys
+
+ISSUE_FIELDS = ("type", "message", "line", "severity", "suggestion")
+
+# Names are quoted in rule messages: "Function name 'F' is not snake_case."
+_QUOTED = re.compile(r"'([^']*)'")
+
+
+class Issue:
+    """
+    One finding. Slotted (no per-instance dict) with interned type and
+    severity, so large result sets stay small in memory.
+
+    Reads like the dict it replaces (issue["line"], issue.get("type"),
+    dict(issue)); it is turned into JSON only at the response boundary
+    (services/responses.py).
+    """
+
+    __slots__ = ISSUE_FIELDS
+
+    def __init__(self, type: str, message: str, line: int, severity: str = "low", suggestion: str = ""):
+        self.type = sys.intern(type)
+        self.message = message
+        self.line = line
+        self.severity = sys.intern(severity)
+        self.suggestion = suggestion
+
+    def keys(self):
+        return ISSUE_FIELDS
+
+    def __getitem__(self, key: str):
+        if key not in ISSUE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in ISSUE_FIELDS else default
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "message": self.message, "line": self.line,
+                "severity": self.severity, "suggestion": self.suggestion}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Issue, dict)):
+            return all(self.get(k) == other.get(k) for k in ISSUE_FIELDS)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Rebuilt through __init__ so type / severity are interned again
+        # after crossing a process boundary (services/sandbox.py)
+        return (Issue, (self.type, self.message, self.line, self.severity, self.suggestion))
+
+    def __repr__(self) -> str:
+        return f"Issue({self.to_dict()!r})"
+
+
+class AnalysisCancelled(Exception):
+    """Raised between analysis stages once the caller's cancel event is set."""
+
+
+def check_cancelled(cancel) -> None:
+    """`cancel` is a threading.Event (or None); checked between stages."""
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled()
+
 
 def make_issue(issue_type: str, message: str, line: int, severity: str = "low", suggestion: str = ""):
-    return {
-        "type": issue_type,
-        "message": message,
-        "line": line,
-        "severity": severity,
-        "suggestion": suggestion
-    }
+    return Issue(issue_type, message, line, severity, suggestion)
+
+
+def issue_line(issue) -> int:
+    return issue.get("line") or 0
+
+
+def split_message(text) -> tuple:
+    """
+    "Variable 'i' is unused." -> ("Variable '{}' is unused.", ["i"]).
+    Text that already contains '{}' is kept verbatim (no args).
+    """
+    if not isinstance(text, str):
+        return "" if text is None else str(text), []
+    if "{}" in text:
+        return text, []
+    return _QUOTED.sub("'{}'", text), _QUOTED.findall(text)
 
 
 def parse_code_safely(code: str):
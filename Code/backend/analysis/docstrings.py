@@ -1,9 +1,9 @@
 import ast
 from analysis.common import make_issue
 
-def rule_docstrings(code: str):
+def rule_docstrings(code: str, tree=None):
     issues = []
-    tree = ast.parse(code)
+    tree = tree or ast.parse(code)
 
     for node in ast.walk(tree):
 
@@ -2,8 +2,8 @@ import ast
 from analysis.common import make_issue
 
 
-def rule_duplicate_logic(code: str):
-    tree = ast.parse(code)
+def rule_duplicate_logic(code: str, tree=None):
+    tree = tree or ast.parse(code)
     issues = []
 
     # Store: hash → first occurrence line
@@ -1,151 +1,148 @@
-import ast
 from analysis.common import make_issue
+from analysis.symbols import symbol_table_for
 
 
-def rule_bad_naming(code: str):
-    issues = []
-    tree = ast.parse(code)
+# Definition kinds that come from a Name in store context
+VARIABLE_SITE_KINDS = (
+    "assign",
+    "unpack",
+    "annassign",
+    "augassign",
+    "for",
+    "with",
+    "comprehension",
+    "walrus",
+)
 
-    # Helper: check if node is inside module (for constants)
-    def is_module_level(node):
-        return isinstance(node, ast.Module)
 
-    # Find parent map to detect module-level targets
-    parent = {}
-    for node in ast.walk(tree):
-        for child in ast.iter_child_nodes(node):
-            parent[child] = node
+def rule_bad_naming(code: str, symbols=None):
+    issues = []
+    symbols = symbol_table_for(code, symbols)
 
     # ---- FUNCTION NAME CHECK (snake_case) ----
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            name = node.name
-            valid = True
+    for binding, line, _ in symbols.sites("function"):
+        name = binding.name
+        valid = True
 
-            # ignore magic methods: __init__, __str__, etc.
-            if name.startswith("__") and name.endswith("__"):
-                continue
-
-            # 1. Must start lowercase letter
-            if not (name[0].islower() and name[0].isalpha()):
-                valid = False
+        # ignore magic methods: __init__, __str__, etc.
+        if name.startswith("__") and name.endswith("__"):
+            continue
 
-            # 2. All characters must be lowercase/digit/underscore
-            for char in name:
-                if not (char.islower() or char.isdigit() or char == "_"):
-                    valid = False
+        # 1. Must start lowercase letter
+        if not (name[0].islower() and name[0].isalpha()):
+            valid = False
 
-            # 3. No uppercase anywhere
-            if any(c.isupper() for c in name):
+        # 2. All characters must be lowercase/digit/underscore
+        for char in name:
+            if not (char.islower() or char.isdigit() or char == "_"):
                 valid = False
 
-            if not valid:
-                issues.append(
-                    make_issue(
-                        issue_type="naming-convention",
-                        message=f"Function name '{name}' is not snake_case.",
-                        line=node.lineno,
-                        severity="low",
-                        suggestion=f"Rename the function '{name}' to snake_case."
-                    )
+        # 3. No uppercase anywhere
+        if any(c.isupper() for c in name):
+            valid = False
+
+        if not valid:
+            issues.append(
+                make_issue(
+                    issue_type="naming-convention",
+                    message=f"Function name '{name}' is not snake_case.",
+                    line=line,
+                    severity="low",
+                    suggestion=f"Rename the function '{name}' to snake_case."
                 )
+            )
 
     # ---- CLASS NAME CHECK (PascalCase) ----
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            name = node.name
-            valid = True
+    for binding, line, _ in symbols.sites("class"):
+        name = binding.name
+        valid = True
 
-            # 1. Must start with uppercase
-            if not (name[0].isupper() and name[0].isalpha()):
-                valid = False
-
-            # 2. Remaining characters must be alphanumeric (no underscores)
-            for char in name:
-                if not char.isalnum():
-                    valid = False
+        # 1. Must start with uppercase
+        if not (name[0].isupper() and name[0].isalpha()):
+            valid = False
 
-            # 3. Cannot be ALL CAPS (those are constants)
-            if name.isupper():
+        # 2. Remaining characters must be alphanumeric (no underscores)
+        for char in name:
+            if not char.isalnum():
                 valid = False
 
-            if not valid:
-                issues.append(
-                    make_issue(
-                        issue_type="naming-convention",
-                        message=f"Class name '{name}' is not PascalCase.",
-                        line=node.lineno,
-                        severity="low",
-                        suggestion=f"Rename the class '{name}' to PascalCase."
-                    )
+        # 3. Cannot be ALL CAPS (those are constants)
+        if name.isupper():
+            valid = False
+
+        if not valid:
+            issues.append(
+                make_issue(
+                    issue_type="naming-convention",
+                    message=f"Class name '{name}' is not PascalCase.",
+                    line=line,
+                    severity="low",
+                    suggestion=f"Rename the class '{name}' to PascalCase."
                 )
+            )
 
     # ---- VARIABLE NAME CHECK (snake_case) ----
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
-            name = node.id
-            valid = True
+    for binding, line, _ in symbols.sites(*VARIABLE_SITE_KINDS):
+        name = binding.name
+        valid = True
+
+        # Skip constants (ALL CAPS)
+        if name.isupper():
+            continue  # Constant rule handles it
 
-            # Skip constants (ALL CAPS)
-            if name.isupper():
-                continue  # Constant rule handles it
+        # 1. Must start lowercase or underscore
+        if not (name[0].islower() or name[0] == "_"):
+            valid = False
 
-            # 1. Must start lowercase or underscore
-            if not (name[0].islower() or name[0] == "_"):
+        # 2. All characters must be lowercase/digit/underscore
+        for char in name:
+            if not (char.islower() or char.isdigit() or char == "_"):
                 valid = False
 
-            # 2. All characters must be lowercase/digit/underscore
+        # 3. No uppercase anywhere
+        if any(c.isupper() for c in name):
+            valid = False
+
+        if not valid:
+            issues.append(
+                make_issue(
+                    issue_type="naming-convention",
+                    message=f"Variable name '{name}' is not snake_case.",
+                    line=line,
+                    severity="low",
+                    suggestion=f"Rename the variable '{name}' to snake_case."
+                )
+            )
+
+    # ---- CONSTANT NAME CHECK (UPPER_CASE) ----
+    for binding, line, _ in symbols.sites("assign"):
+        # Only constants at module-level
+        if binding.scope is not symbols.module:
+            continue
+
+        name = binding.name
+        valid = True
+
+        # Must be ALL CAPS to qualify as constant
+        if name.isupper():
+            # 1. Must contain only A-Z, digits, underscore
             for char in name:
-                if not (char.islower() or char.isdigit() or char == "_"):
+                if not (char.isupper() or char.isdigit() or char == "_"):
                     valid = False
 
-            # 3. No uppercase anywhere
-            if any(c.isupper() for c in name):
+            # 2. Cannot start with a digit
+            if name[0].isdigit():
                 valid = False
 
             if not valid:
                 issues.append(
                     make_issue(
                         issue_type="naming-convention",
-                        message=f"Variable name '{name}' is not snake_case.",
-                        line=node.lineno,
+                        message=f"Constant '{name}' should be UPPER_CASE.",
+                        line=line,
                         severity="low",
-                        suggestion=f"Rename the variable '{name}' to snake_case."
+                        suggestion=f"Rename '{name}' to UPPER_CASE format."
                     )
                 )
 
-    # ---- CONSTANT NAME CHECK (UPPER_CASE) ----
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Assign):
-            # Only constants at module-level
-            if not is_module_level(parent.get(node, None)):
-                continue
-
-            for target in node.targets:
-                if isinstance(target, ast.Name):
-                    name = target.id
-                    valid = True
-
-                    # Must be ALL CAPS to qualify as constant
-                    if name.isupper():
-                        # 1. Must contain only A-Z, digits, underscore
-                        for char in name:
-                            if not (char.isupper() or char.isdigit() or char == "_"):
-                                valid = False
-
-                        # 2. Cannot start with a digit
-                        if name[0].isdigit():
-                            valid = False
-
-                        if not valid:
-                            issues.append(
-                                make_issue(
-                                    issue_type="naming-convention",
-                                    message=f"Constant '{name}' should be UPPER_CASE.",
-                                    line=target.lineno,
-                                    severity="low",
-                                    suggestion=f"Rename '{name}' to UPPER_CASE format."
-                                )
-                            )
-
     return issues
@@ -1,9 +1,9 @@
 import ast
 from analysis.common import make_issue
 
-def rule_nesting(code: str):
+def rule_nesting(code: str, tree=None):
     MAX_DEPTH = 4   # configure as needed
-    tree = ast.parse(code)
+    tree = tree or ast.parse(code)
     issues = []
 
     # These AST node types increase nesting level
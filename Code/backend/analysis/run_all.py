@@ -1,5 +1,5 @@
-import ast
-from analysis.common import make_issue, parse_code_safely
+import heapq
+from analysis.common import check_cancelled, issue_line, make_issue, parse_code_safely
 from analysis.unused_imports import rule_unused_names
 from analysis.nesting import rule_nesting
 from analysis.naming import rule_bad_naming
@@ -7,9 +7,11 @@ from analysis.long_functions import rule_long_function
 from analysis.dead_code import rule_dead_code
 from analysis.docstrings import rule_docstrings
 from analysis.duplicate_logic import rule_duplicate_logic
+from analysis.symbols import build_symbol_table
 from complexity.loops import analyze_loops
 from complexity.nesting_depth import analyze_nest
 from complexity.big_o import estimate_big_o
+from complexity.cfg import attach_source
 from complexity.score import complexity_score
 
 
@@ -25,129 +27,184 @@ RULES_ENABLED = {
     "docstrings": True,
 }
 
-def run_static_analysis(code: str):
+# Each rule: name -> fn(code, tree, symbols) -> list of issues
+RULES = (
+    ("unused_imports", lambda code, tree, symbols: rule_unused_names(code, symbols)),
+    ("deep_nesting", lambda code, tree, symbols: rule_nesting(code, tree)),
+    ("naming", lambda code, tree, symbols: rule_bad_naming(code, symbols)),
+    ("long_functions", lambda code, tree, symbols: rule_long_function(code, tree)),
+    ("dead_code", lambda code, tree, symbols: rule_dead_code(code, tree)),
+    ("docstrings", lambda code, tree, symbols: rule_docstrings(code, tree)),
+    ("duplicate_logic", lambda code, tree, symbols: rule_duplicate_logic(code, tree)),
+)
+
+
+RULE_NAMES = tuple(name for name, _ in RULES)
+
+# Rules that read the shared symbol table (built only when one is selected)
+SYMBOL_RULES = {"unused_imports", "naming"}
+
+COMPLEXITY_STAGES = ("loops", "nesting", "big_o", "score")
+
+# The score is computed from the other three
+COMPLEXITY_ANALYZERS = (
+    ("loops", analyze_loops),
+    ("nesting", analyze_nest),
+    ("big_o", estimate_big_o),
+)
+
+# PROFILES (per request): which rules, complexity stages and scorers run.
+# "fast" is meant for lint-as-you-type, "full" for explicit analyze/save;
+# budget_ms is the latency target for sources up to BUDGET_BYTES (scaled
+# linearly beyond); a slower run is logged, and tests/test_analysis_budget.py
+# checks it (with CI headroom)
+PROFILES = {
+    "fast": {
+        "rules": ("deep_nesting", "naming"),
+        "complexity": ("nesting",),
+        "scores": False,
+        "budget_ms": 25,
+    },
+    "full": {
+        "rules": RULE_NAMES,
+        "complexity": COMPLEXITY_STAGES,
+        "scores": True,
+        "budget_ms": 150,
+    },
+}
+BUDGET_BYTES = 16 * 1024
+
+
+def resolve_selection(profile: str = "full", rules=None) -> dict:
+    """
+    Profile settings, with the rule list replaced by `rules` when given.
+    Raises ValueError for an unknown profile or rule name.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}' (expected one of: {', '.join(PROFILES)})")
+    selection = {"profile": profile, **PROFILES[profile]}
+
+    if rules is not None:
+        unknown = sorted(set(rules) - set(RULE_NAMES))
+        if unknown:
+            raise ValueError(f"Unknown rules: {', '.join(unknown)} (expected: {', '.join(RULE_NAMES)})")
+        selection["rules"] = tuple(name for name in RULE_NAMES if name in rules)
+    return selection
+
+
+def selection_key(selection: dict):
+    """None for the default (full) selection, else a short stable label."""
+    if selection["profile"] == "full" and selection["rules"] == RULE_NAMES:
+        return None
+    if selection["rules"] == PROFILES[selection["profile"]]["rules"]:
+        return selection["profile"]
+    return f"{selection['profile']}:{','.join(selection['rules'])}"
+
+
+def _run_rule(name, rule, code, tree, symbols) -> list:
+    try:
+        issues = rule(code, tree, symbols)
+    except:
+        return [make_issue(
+            issue_type="rule-error",
+            message=f"Rule '{name}' failed internally.",
+            line=1,
+            severity="high",
+            suggestion="Contact tool developer."
+            )]
+    # Rules mostly emit in line order already, so this is near-linear
+    issues.sort(key=issue_line)
+    return issues
+
+
+def stage_estimate_ms(code: str, selection: dict) -> float:
+    """Expected cost of one rule / complexity stage / the scorers: the profile budget split evenly."""
+    stages = len(selection["rules"]) + len(selection["complexity"]) + (1 if selection["scores"] else 0)
+    return selection["budget_ms"] * max(1.0, len(code) / BUDGET_BYTES) / max(1, stages)
+
+
+def run_static_analysis(code: str, selection: dict = None, cancel=None, deadline=None):
+    """
+    `cancel` (threading.Event) stops the run between stages with AnalysisCancelled.
+    `deadline` (services.deadline.Deadline) skips the remaining rules and
+    complexity stages once less than their estimated cost is left; they
+    are listed under "skipped".
+    """
+    selection = selection or resolve_selection()
     issues = []
     complexity = {}
+    skipped = []
 
     tree, syntax_issue = parse_code_safely(code)
     if syntax_issue:
         return {
             "issues": [syntax_issue],
-            "complexity": {}
+            "complexity": {},
+            "skipped": skipped,
             }
-    
-    
-    #ISSUES
-    try:
-        if RULES_ENABLED["unused_imports"]:
-            issues += rule_unused_names(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'unused_imports' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    attach_source(tree, code)
 
-    try:
-        if RULES_ENABLED["deep_nesting"]:
-            issues += rule_nesting(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'deep_nesting' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    estimate_ms = stage_estimate_ms(code, selection)
 
-    try:
-        if RULES_ENABLED["naming"]:
-            issues += rule_bad_naming(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'naming' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    def in_time() -> bool:
+        return deadline is None or deadline.allows(estimate_ms)
 
-    try:
-        if RULES_ENABLED["long_functions"]:
-            issues += rule_long_function(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'long_functions' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    selected = [
+        (name, rule) for name, rule in RULES
+        if RULES_ENABLED[name] and name in selection["rules"]
+    ]
 
-    try:
-        if RULES_ENABLED["dead_code"]:
-            issues += rule_dead_code(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'dead_code' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    # Shared symbol table (scopes + def/use sites), built once per analysis
+    symbols = None
+    if any(name in SYMBOL_RULES for name, _ in selected):
+        try:
+            symbols = build_symbol_table(tree)
+        except Exception:
+            symbols = None  # rules rebuild it and report their own failure
 
-    try:
-        if RULES_ENABLED["docstrings"]:
-            issues += rule_docstrings(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'docstrings' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
+    #ISSUES
+    per_rule = []
+    for name, rule in selected:
+        check_cancelled(cancel)
+        if not in_time():
+            skipped.append(name)
+            continue
+        per_rule.append(_run_rule(name, rule, code, tree, symbols))
 
-    try:
-        if RULES_ENABLED["duplicate_logic"]:
-            issues += rule_duplicate_logic(code)
-    except:
-        issues.append(make_issue(
-            issue_type="rule-error",
-            message="Rule 'duplicate_logic' failed internally.",
-            line=1,
-            severity="high",
-            suggestion="Contact tool developer."
-            )
-            )
-    
-    if issues:
-        issues = sorted(issues, key=lambda x: x.get("line", 0))
+    # k-way merge of the sorted per-rule lists (ties keep rule order)
+    issues = list(heapq.merge(*per_rule, key=issue_line))
 
     
-    #COMPLEXITY
-    loops_result = analyze_loops(tree)
-    nesting_result = analyze_nest(tree)
-    big_o_result = estimate_big_o(tree)
-    complexity_final_score = complexity_score(code)
-
-    complexity = {
-        "loops": loops_result,
-        "nesting": nesting_result,
-        "big_o": big_o_result["estimated_big_o"],
-        "score": complexity_final_score
-    }
+    #COMPLEXITY (only the selected stages; the score reuses the others)
+    check_cancelled(cancel)
+    stages = selection["complexity"]
+    needed = COMPLEXITY_STAGES[:3] if "score" in stages else stages
+    results = {}
+    for stage, analyze in COMPLEXITY_ANALYZERS:
+        if stage not in needed:
+            continue
+        if not in_time():
+            skipped.append(f"complexity.{stage}")
+            continue
+        results[stage] = analyze(tree)
+
+    if "loops" in results and "loops" in stages:
+        complexity["loops"] = results["loops"]
+    if "nesting" in results and "nesting" in stages:
+        complexity["nesting"] = results["nesting"]
+    if "big_o" in results and "big_o" in stages:
+        complexity["big_o"] = results["big_o"]["estimated_big_o"]
+    if "score" in stages:
+        check_cancelled(cancel)
+        if len(results) == 3 and in_time():
+            complexity["score"] = complexity_score(
+                code, tree, loops=results["loops"], nesting=results["nesting"], big_o=results["big_o"]
+            )
+        else:
+            skipped.append("complexity.score")
 
     return {
         "issues": issues,
-        "complexity": complexity
+        "complexity": complexity,
+        "skipped": skipped,
     }
-    
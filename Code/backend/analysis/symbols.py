@@ -0,0 +1,411 @@
+"""
+Symbol Table
+
+Builds, in a single AST pass, the scopes of a module together with the
+definition and use sites of every name. Rules query the finished table
+instead of walking the tree again:
+
+- table.module                 -> module scope
+- scope.bindings[name]         -> Binding (O(1) per symbol)
+- table.lookup(name, scope)    -> Binding resolved with LEGB rules
+- table.sites(kind, ...)       -> every definition site of the given kinds
+
+Scopes follow Python semantics: functions, lambdas, classes and
+comprehensions get their own scope, `global` / `nonlocal` redirect
+bindings, and uses are resolved after the whole tree is seen so late
+binding (a function using a module name defined below it) is handled.
+"""
+
+import ast
+
+# Definition site kinds that describe plain variables
+VARIABLE_KINDS = (
+    "assign",
+    "unpack",
+    "annassign",
+    "augassign",
+    "for",
+    "with",
+    "except",
+    "walrus",
+    "comprehension",
+    "match",
+)
+
+FUNCTION_SCOPES = ("function", "lambda", "comprehension")
+
+
+class Binding:
+    """A name bound in one scope, with all its definition and use sites."""
+
+    __slots__ = ("name", "scope", "defs", "uses")
+
+    def __init__(self, name, scope):
+        self.name = name
+        self.scope = scope
+        self.defs = []      # [(line, kind)] in source order
+        self.uses = []      # [line] of every resolved use
+
+    @property
+    def kinds(self):
+        return {kind for _, kind in self.defs}
+
+    @property
+    def is_used(self):
+        return bool(self.uses)
+
+    def first_line(self, kinds=None):
+        for line, kind in self.defs:
+            if kinds is None or kind in kinds:
+                return line
+        return None
+
+
+class Scope:
+    """Module, class, function, lambda or comprehension scope."""
+
+    __slots__ = (
+        "kind", "name", "node", "parent",
+        "bindings", "global_names", "nonlocal_names", "raw_uses",
+    )
+
+    def __init__(self, kind, name, node, parent=None):
+        self.kind = kind
+        self.name = name
+        self.node = node
+        self.parent = parent
+        self.bindings = {}
+        self.global_names = set()
+        self.nonlocal_names = set()
+        self.raw_uses = []      # [(name, line)] before resolution
+
+    def binding(self, name):
+        binding = self.bindings.get(name)
+        if binding is None:
+            binding = Binding(name, self)
+            self.bindings[name] = binding
+        return binding
+
+
+class SymbolTable:
+    def __init__(self, module_scope):
+        self.module = module_scope
+        self.scopes = [module_scope]
+        self.unresolved = {}        # name -> [line] (builtins / undefined)
+        self._sites = []            # [(binding, line, kind)] in source order
+
+    # ---- Queries ----
+
+    def lookup(self, name, scope=None):
+        """Resolve `name` as seen from `scope` (module by default)."""
+        scope = scope or self.module
+
+        if name in scope.global_names:
+            return self.module.bindings.get(name)
+        if name in scope.nonlocal_names:
+            return self._enclosing_function_binding(name, scope)
+
+        if name in scope.bindings:
+            return scope.bindings[name]
+
+        # Enclosing scopes - class bodies are not visible from nested scopes
+        current = scope.parent
+        while current is not None:
+            if current.kind != "class" and name in current.bindings:
+                return current.bindings[name]
+            current = current.parent
+        return None
+
+    def is_used(self, name, scope=None):
+        binding = self.lookup(name, scope)
+        return bool(binding and binding.uses)
+
+    def sites(self, *kinds):
+        """Yield (binding, line, kind) for every definition of the given kinds."""
+        for binding, line, kind in self._sites:
+            if not kinds or kind in kinds:
+                yield binding, line, kind
+
+    def bindings(self, scope_kinds=None):
+        for scope in self.scopes:
+            if scope_kinds is None or scope.kind in scope_kinds:
+                yield from scope.bindings.values()
+
+    # ---- Resolution ----
+
+    def _enclosing_function_binding(self, name, scope):
+        current = scope.parent
+        while current is not None and current.kind != "module":
+            if current.kind in FUNCTION_SCOPES and name in current.bindings:
+                return current.bindings[name]
+            current = current.parent
+        return None
+
+    def _resolve(self):
+        for scope in self.scopes:
+            for name, line in scope.raw_uses:
+                binding = self.lookup(name, scope)
+                if binding is None:
+                    self.unresolved.setdefault(name, []).append(line)
+                else:
+                    binding.uses.append(line)
+            scope.raw_uses = []
+
+
+class _SymbolTableBuilder(ast.NodeVisitor):
+    def __init__(self, tree):
+        self.table = SymbolTable(Scope("module", "<module>", tree))
+        self.scope = self.table.module
+
+    # ---- Scope helpers ----
+
+    def push_scope(self, kind, name, node):
+        scope = Scope(kind, name, node, self.scope)
+        self.table.scopes.append(scope)
+        self.scope = scope
+        return scope
+
+    def pop_scope(self):
+        self.scope = self.scope.parent
+
+    def define(self, name, line, kind, scope=None):
+        scope = scope or self.scope
+
+        # Walrus targets inside comprehensions bind in the enclosing scope
+        if kind == "walrus":
+            while scope.kind == "comprehension":
+                scope = scope.parent
+
+        if name in scope.global_names:
+            target = self.table.module
+        elif name in scope.nonlocal_names:
+            target = self.table._enclosing_function_binding(name, scope)
+            target = target.scope if target else scope
+        else:
+            target = scope
+
+        binding = target.binding(name)
+        binding.defs.append((line, kind))
+        self.table._sites.append((binding, line, kind))
+
+    def use(self, name, line):
+        self.scope.raw_uses.append((name, line))
+
+    def define_target(self, target, kind):
+        """Bind every Name inside an assignment target (handles unpacking)."""
+        if isinstance(target, ast.Name):
+            self.define(target.id, target.lineno, kind)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            inner = "unpack" if kind == "assign" else kind
+            for elt in target.elts:
+                self.define_target(elt, inner)
+        elif isinstance(target, ast.Starred):
+            self.define_target(target.value, kind)
+        else:
+            # Attribute / Subscript targets only use names
+            self.visit(target)
+
+    # ---- Imports ----
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            # `import os.path` binds `os`
+            name = alias.asname or alias.name.split(".")[0]
+            self.define(name, node.lineno, "import")
+
+    def visit_ImportFrom(self, node):
+        if node.module == "__future__":
+            return
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            self.define(alias.asname or alias.name, node.lineno, "import")
+
+    # ---- Assignments ----
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self.define_target(target, "assign")
+
+        # Names listed in __all__ count as used
+        if (
+            self.scope.kind == "module"
+            and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets)
+            and isinstance(node.value, (ast.List, ast.Tuple))
+        ):
+            for elt in node.value.elts:
+                if isinstance(elt, ast.Constant) and isinstance(elt.value, str):
+                    self.use(elt.value, elt.lineno)
+
+    def visit_AnnAssign(self, node):
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+        self.define_target(node.target, "annassign")
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            # `x += 1` reads x before rebinding it
+            self.use(node.target.id, node.target.lineno)
+            self.define(node.target.id, node.target.lineno, "augassign")
+        else:
+            self.visit(node.target)
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        self.define(node.target.id, node.target.lineno, "walrus")
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.define_target(node.target, "for")
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def visit_With(self, node):
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self.define_target(item.optional_vars, "with")
+        for stmt in node.body:
+            self.visit(stmt)
+
+    visit_AsyncWith = visit_With
+
+    def visit_ExceptHandler(self, node):
+        if node.type is not None:
+            self.visit(node.type)
+        if isinstance(node.name, str):
+            self.define(node.name, node.lineno, "except")
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def visit_Global(self, node):
+        self.scope.global_names.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self.scope.nonlocal_names.update(node.names)
+
+    # ---- Pattern matching captures ----
+
+    def visit_MatchAs(self, node):
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name:
+            self.define(node.name, node.lineno, "match")
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.define(node.name, node.lineno, "match")
+
+    def visit_MatchMapping(self, node):
+        self.generic_visit(node)
+        if node.rest:
+            self.define(node.rest, node.lineno, "match")
+
+    # ---- Names ----
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self.define(node.id, node.lineno, "assign")
+        else:
+            self.use(node.id, node.lineno)
+
+    # ---- Scoped definitions ----
+
+    def _visit_arguments(self, args):
+        # Defaults and annotations are evaluated in the enclosing scope
+        for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+            self.visit(default)
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None and arg.annotation is not None:
+                self.visit(arg.annotation)
+
+    def _define_params(self, args):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                self.define(arg.arg, arg.lineno, "param")
+
+    def visit_FunctionDef(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._visit_arguments(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+
+        self.define(node.name, node.lineno, "function")
+
+        self.push_scope("function", node.name, node)
+        self._define_params(node.args)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.pop_scope()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_arguments(node.args)
+        self.push_scope("lambda", "<lambda>", node)
+        self._define_params(node.args)
+        self.visit(node.body)
+        self.pop_scope()
+
+    def visit_ClassDef(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        for base in node.bases:
+            self.visit(base)
+        for keyword in node.keywords:
+            self.visit(keyword.value)
+
+        self.define(node.name, node.lineno, "class")
+
+        self.push_scope("class", node.name, node)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.pop_scope()
+
+    def _visit_comprehension(self, node, elements):
+        generators = node.generators
+
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(generators[0].iter)
+
+        self.push_scope("comprehension", "<comprehension>", node)
+        for index, generator in enumerate(generators):
+            if index > 0:
+                self.visit(generator.iter)
+            self.define_target(generator.target, "comprehension")
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self.pop_scope()
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+
+def build_symbol_table(tree) -> SymbolTable:
+    """Build the symbol table for a parsed module (one pass + resolution)."""
+    builder = _SymbolTableBuilder(tree)
+    for stmt in tree.body:
+        builder.visit(stmt)
+    builder.table._resolve()
+    return builder.table
+
+
+def symbol_table_for(code: str, symbols=None):
+    """Return `symbols` when the caller already built it, else build from source."""
+    if symbols is not None:
+        return symbols
+    return build_symbol_table(ast.parse(code))
@@ -1,157 +1,82 @@
-import ast
+from collections import Counter
+
 from analysis.common import make_issue
+from analysis.symbols import symbol_table_for
+
+# Binding kinds reported as unused variables
+UNUSED_VARIABLE_KINDS = ("assign", "unpack", "annassign", "for", "with", "except", "walrus")
+
+# Scopes whose variables are reported (class bodies define attributes,
+# comprehension / lambda targets are throwaway by design)
+CHECKED_SCOPES = ("module", "function")
+
+# Kinds that make a binding more than a plain variable
+NON_VARIABLE_KINDS = {"import", "param", "function", "class"}
+
+
+def _read_lines(binding):
+    """Lines reading the binding, minus the self-read of each `x += ...`."""
+    reads = Counter(binding.uses)
+    reads.subtract(line for line, kind in binding.defs if kind == "augassign")
+    return +reads
 
 
-class _UnusedNameVisitor(ast.NodeVisitor):
-    def __init__(self):
-        # First scope = module scope
-        self.scope_stack = [{"assigned": {}, "used": set()}]
-        self.assigned_imports = []
-        self.issues = []
-
-    # Scope helpers
-    def enter_scope(self):
-        self.scope_stack.append({"assigned": {}, "used": set()})
-
-    def exit_scope(self):
-        return self.scope_stack.pop()
-
-    def add_assigned(self, name, line):
-        self.scope_stack[-1]["assigned"][name] = line
-
-    def mark_used(self, name):
-        for scope in reversed(self.scope_stack):
-            if name in scope["assigned"]:
-                scope["used"].add(name)
-                return
-
-    # Visitors
-    def visit_Import(self, node):
-        for alias in node.names:
-            self.assigned_imports.append({
-                "name": alias.asname or alias.name,
-                "line": node.lineno
-            })
-        self.generic_visit(node)
-
-    def visit_ImportFrom(self, node):
-        for alias in node.names:
-            self.assigned_imports.append({
-                "name": alias.asname or alias.name,
-                "line": node.lineno
-            })
-        self.generic_visit(node)
-
-    def visit_Assign(self, node):
-        for target in node.targets:
-            if isinstance(target, ast.Name):
-                self.add_assigned(target.id, target.lineno)
-        self.generic_visit(node)
-
-    def visit_AnnAssign(self, node):
-        if isinstance(node.target, ast.Name):
-            self.add_assigned(node.target.id, node.target.lineno)
-        self.generic_visit(node)
-
-    def visit_For(self, node):
-        if isinstance(node.target, ast.Name):
-            self.add_assigned(node.target.id, node.target.lineno)
-        self.generic_visit(node)
-
-    def visit_With(self, node):
-        for item in node.items:
-            if isinstance(item.optional_vars, ast.Name):
-                self.add_assigned(item.optional_vars.id, item.optional_vars.lineno)
-        self.generic_visit(node)
-
-    def visit_ExceptHandler(self, node):
-        if isinstance(node.name, str):
-            self.add_assigned(node.name, node.lineno)
-        self.generic_visit(node)
-
-    def visit_Name(self, node):
-        if isinstance(node.ctx, ast.Load):
-            self.mark_used(node.id)
-
-    def visit_FunctionDef(self, node):
-        self.enter_scope()
-        self.generic_visit(node)
-        self._finalize_scope()
-        self.exit_scope()
-
-    def visit_AsyncFunctionDef(self, node):
-        self.enter_scope()
-        self.generic_visit(node)
-        self._finalize_scope()
-        self.exit_scope()
-
-    def visit_ClassDef(self, node):
-        self.enter_scope()
-        self.generic_visit(node)
-        self._finalize_scope()
-        self.exit_scope()
-
-    # Finalization
-    def _finalize_scope(self):
-        scope = self.scope_stack[-1]
-
-        for name, line in scope["assigned"].items():
-            if name.startswith("_"):
-                continue
-            if name not in scope["used"]:
-                self.issues.append(
-                    make_issue(
-                        issue_type="unused-variable",
-                        message=f"Variable '{name}' is assigned but never used.",
-                        line=line,
-                        severity="low",
-                        suggestion=f"Remove variable '{name}' or use it."
-                    )
-                )
-
-
-def rule_unused_names(code: str):
+def rule_unused_names(code: str, symbols=None):
     """
-    Detect unused variables and imports using AST-safe scope tracking.
+    Detect unused variables and imports using the shared symbol table.
+
+    Scoping follows Python, which differs from the old per-rule visitor:
+    - class-body names are not reported (they are attributes, read as
+      `self.x` / `Cls.x`); comprehension and lambda targets neither
+    - `import os.path` binds and reports `os`, so `os.path.join(...)`
+      counts as a use (it used to be reported as unused 'os.path')
+    - `x += 1` alone is not a use: a variable only ever updated in place
+      is still reported, as before
     """
     try:
-        tree = ast.parse(code)
+        symbols = symbol_table_for(code, symbols)
     except SyntaxError:
         return []
 
-    visitor = _UnusedNameVisitor()
-    visitor.visit(tree)
+    issues = []
 
-    # Module-level unused vars
-    module_scope = visitor.scope_stack[0]
+    # Unused variables
+    for binding in symbols.bindings(CHECKED_SCOPES):
+        name = binding.name
+        if name.startswith("_") or _read_lines(binding):
+            continue
+
+        kinds = binding.kinds
+        if kinds & NON_VARIABLE_KINDS:
+            continue
 
-    for name, line in module_scope["assigned"].items():
-        if name.startswith("_"):
+        line = binding.first_line(UNUSED_VARIABLE_KINDS)
+        if line is None:
             continue
-        if name not in module_scope["used"]:
-            visitor.issues.append(
-                make_issue(
-                    issue_type="unused-variable",
-                    message=f"Variable '{name}' is assigned but never used.",
-                    line=line,
-                    severity="low",
-                    suggestion=f"Remove variable '{name}' or use it."
-                )
+
+        issues.append(
+            make_issue(
+                issue_type="unused-variable",
+                message=f"Variable '{name}' is assigned but never used.",
+                line=line,
+                severity="low",
+                suggestion=f"Remove variable '{name}' or use it."
             )
+        )
 
     # Unused imports
-    all_used = set().union(*(s["used"] for s in visitor.scope_stack))
-
-    for imp in visitor.assigned_imports:
-        if imp["name"] not in all_used:
-            visitor.issues.append(
-                make_issue(
-                    issue_type="unused-import",
-                    message=f"Import '{imp['name']}' is never used.",
-                    line=imp["line"],
-                    severity="low",
-                    suggestion=f"Remove the unused import '{imp['name']}'."
-                )
+    for binding, line, _ in symbols.sites("import"):
+        if binding.uses:
+            continue
+
+        issues.append(
+            make_issue(
+                issue_type="unused-import",
+                message=f"Import '{binding.name}' is never used.",
+                line=line,
+                severity="low",
+                suggestion=f"Remove the unused import '{binding.name}'."
             )
+        )
 
-    return visitor.issues
+    return issues
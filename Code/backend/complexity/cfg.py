@@ -0,0 +1,508 @@
+"""
+Control-Flow Graph Builder
+
+Builds one CFG per code unit (module body, function, class body) and
+caches it by a structural fingerprint of the unit, so unchanged
+functions are not rebuilt between analyses. Handles:
+
+- if / elif / else
+- for / while loops with else, break and continue (`while True` never falls through)
+- try / except / else / finally (abrupt exits are routed through finally)
+- match statements (a trailing irrefutable case removes the fall-through edge)
+- return / raise
+
+Everything structural is derived from the cached graph:
+- unreachable statements      -> dead-code rule
+- McCabe complexity (E - N + 2) -> complexity score
+- nesting depth               -> nesting metrics
+"""
+
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+
+CFG_CACHE_SIZE = 512
+
+# Statements that increase nesting depth (same set as the nesting metric)
+NESTING_STATEMENTS = (
+    ast.If,
+    ast.For,
+    ast.While,
+    ast.With,
+    ast.Try,
+    ast.AsyncFor,
+    ast.AsyncWith,
+)
+
+UNIT_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Statements that end the current path, by the keyword reported for them
+TERMINATORS = {ast.Return: "return", ast.Raise: "raise", ast.Break: "break", ast.Continue: "continue"}
+
+# Shared by the analysis threads (fast lane, live analysis)
+_cfg_cache = OrderedDict()
+_cfg_lock = threading.Lock()
+
+
+class Block:
+    __slots__ = ("id", "statements", "successors")
+
+    def __init__(self, block_id):
+        self.id = block_id
+        self.statements = []    # indexes into CFG.statements
+        self.successors = []    # block ids
+
+
+class CFG:
+    """Control-flow graph of one code unit."""
+
+    def __init__(self, name, lineno):
+        self.name = name
+        self.lineno = lineno
+        self.blocks = []
+        self.entry = None
+        self.exit = None
+
+        # [(line, block_id, cause, parent_statement_index)]; cause is
+        # (keyword, line, exits) of the earlier sibling after which the
+        # path stopped, or None
+        self.statements = []
+
+        self.max_depth = 0          # deepest nesting inside this unit
+        self.decisions = 0          # boolean operators / conditional expressions
+        self.children = []          # [(nesting depth at definition, CFG)]
+
+        self.reachable_blocks = frozenset()
+
+    # ---- Derived metrics ----
+
+    def reachable(self):
+        return self.reachable_blocks
+
+    def unreachable_statements(self):
+        """
+        Return [(line, cause)] for the first-level unreachable
+        statements (children of unreachable statements are not repeated).
+        `cause` is (keyword, line, exits): the sibling that ends the path
+        ("return" ... "continue", or a compound statement such as "if"
+        whose paths all end, with the keywords of those exits), or None
+        when no path reaches the enclosing block at all.
+        """
+        reachable = self.reachable()
+        stmt_reachable = [block_id in reachable for _, block_id, _, _ in self.statements]
+
+        result = []
+        for index, (line, _, cause, parent) in enumerate(self.statements):
+            if stmt_reachable[index]:
+                continue
+            if parent is not None and not stmt_reachable[parent]:
+                continue
+            result.append((line, cause))
+        return result
+
+    def cyclomatic(self):
+        """McCabe complexity over the reachable graph plus boolean decisions."""
+        reachable = self.reachable()
+        edges = sum(
+            1
+            for block_id in reachable
+            for succ in self.blocks[block_id].successors
+        )
+        return max(1, edges - len(reachable) + 2) + self.decisions
+
+
+# ---------------------------
+# Builder
+# ---------------------------
+
+class _Frame:
+    """Enclosing try/finally or loop context for routing jumps."""
+
+    __slots__ = ("kind", "break_target", "continue_target", "finally_entry", "pending")
+
+    def __init__(self, kind, break_target=None, continue_target=None, finally_entry=None):
+        self.kind = kind
+        self.break_target = break_target
+        self.continue_target = continue_target
+        self.finally_entry = finally_entry
+        self.pending = set()    # targets reached through this finally block
+
+
+def _keyword(stmt) -> str:
+    """Leading keyword of a compound statement ("if", "while", "try", ...)."""
+    name = type(stmt).__name__.lower()
+    return name[5:] if name.startswith("async") else name.replace("trystar", "try")
+
+
+class _CFGBuilder:
+    def __init__(self, name, lineno, source=None):
+        self.cfg = CFG(name, lineno)
+        self.source = source
+        self.frames = []
+        self.current = None
+        self.reach = set()
+        self.exits = []         # keywords of terminators, in build order
+
+    # ---- Block helpers ----
+
+    def new_block(self):
+        block = Block(len(self.cfg.blocks))
+        self.cfg.blocks.append(block)
+        return block.id
+
+    def edge(self, src, dst):
+        successors = self.cfg.blocks[src].successors
+        if dst in successors:
+            return
+        successors.append(dst)
+
+        # Reachability is maintained incrementally (each block is marked once)
+        if src in self.reach and dst not in self.reach:
+            stack = [dst]
+            self.reach.add(dst)
+            while stack:
+                for succ in self.cfg.blocks[stack.pop()].successors:
+                    if succ not in self.reach:
+                        self.reach.add(succ)
+                        stack.append(succ)
+
+    def jump(self, target, frames=None):
+        """Route an abrupt exit to `target`, passing through enclosing finally blocks."""
+        frames = self.frames if frames is None else frames
+        for index in range(len(frames) - 1, -1, -1):
+            frame = frames[index]
+            if frame.kind == "finally":
+                self.edge(self.current, frame.finally_entry)
+                frame.pending.add((target, index))
+                return
+            if frame.kind == "loop" and target in (frame.break_target, frame.continue_target):
+                break
+        self.edge(self.current, target)
+
+    def dead_end(self):
+        self.current = self.new_block()
+
+    def add_statement(self, stmt, cause, parent):
+        index = len(self.cfg.statements)
+        self.cfg.statements.append((stmt.lineno, self.current, cause, parent))
+        self.cfg.blocks[self.current].statements.append(index)
+
+        # Boolean operators and conditional expressions are extra decisions
+        for field, value in ast.iter_fields(stmt):
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if not isinstance(item, ast.expr):
+                    continue
+                for node in ast.walk(item):
+                    if isinstance(node, ast.BoolOp):
+                        self.cfg.decisions += len(node.values) - 1
+                    elif isinstance(node, ast.IfExp):
+                        self.cfg.decisions += 1
+        return index
+
+    def loop_frame(self):
+        for frame in reversed(self.frames):
+            if frame.kind == "loop":
+                return frame
+        return None
+
+    # ---- Entry point ----
+
+    def build(self, body):
+        self.cfg.entry = self.new_block()
+        self.cfg.exit = self.new_block()
+        self.reach.add(self.cfg.entry)
+        self.current = self.cfg.entry
+        self.body(body, depth=0, parent=None)
+        self.edge(self.current, self.cfg.exit)
+        self.cfg.reachable_blocks = frozenset(self.reach)
+        return self.cfg
+
+    def body(self, statements, depth, parent):
+        cause = None
+        for stmt in statements:
+            live = cause is None and self.current in self.reach
+            exits = len(self.exits)
+            self.statement(stmt, depth, parent, cause)
+            # Blocks after a statement get no later incoming edges, so this
+            # is final: the rest of the body is dead because of `stmt`
+            if live and self.current not in self.reach:
+                keyword = TERMINATORS.get(type(stmt)) or _keyword(stmt)
+                cause = (keyword, stmt.lineno, tuple(dict.fromkeys(self.exits[exits:])))
+
+    # ---- Statements ----
+
+    def statement(self, stmt, depth, parent, cause):
+        inner = depth
+        if isinstance(stmt, NESTING_STATEMENTS):
+            inner = depth + 1
+            self.cfg.max_depth = max(self.cfg.max_depth, inner)
+
+        if isinstance(stmt, ast.If):
+            self._if(stmt, inner, cause, parent)
+        elif isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)):
+            self._loop(stmt, inner, cause, parent)
+        elif isinstance(stmt, (ast.Try, getattr(ast, "TryStar", ast.Try))):
+            self._try(stmt, inner, cause, parent)
+        elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+            index = self.add_statement(stmt, cause, parent)
+            self.body(stmt.body, inner, index)
+        elif hasattr(ast, "Match") and isinstance(stmt, ast.Match):
+            self._match(stmt, inner, cause, parent)
+        elif isinstance(stmt, (ast.Return, ast.Raise)):
+            self.add_statement(stmt, cause, parent)
+            self.exits.append(TERMINATORS[type(stmt)])
+            self.jump(self.cfg.exit)
+            self.dead_end()
+        elif isinstance(stmt, ast.Break):
+            self.add_statement(stmt, cause, parent)
+            self.exits.append("break")
+            frame = self.loop_frame()
+            if frame is not None:
+                self.jump(frame.break_target)
+            self.dead_end()
+        elif isinstance(stmt, ast.Continue):
+            self.add_statement(stmt, cause, parent)
+            self.exits.append("continue")
+            frame = self.loop_frame()
+            if frame is not None:
+                self.jump(frame.continue_target)
+            self.dead_end()
+        elif isinstance(stmt, UNIT_NODES):
+            self.add_statement(stmt, cause, parent)
+            self.cfg.children.append((depth, get_cfg(stmt, self.source)))
+        else:
+            self.add_statement(stmt, cause, parent)
+
+    def _if(self, stmt, depth, cause, parent):
+        index = self.add_statement(stmt, cause, parent)
+        cond = self.current
+        join = self.new_block()
+
+        self.current = self.new_block()
+        self.edge(cond, self.current)
+        self.body(stmt.body, depth, index)
+        self.edge(self.current, join)
+
+        if stmt.orelse:
+            self.current = self.new_block()
+            self.edge(cond, self.current)
+            self.body(stmt.orelse, depth, index)
+            self.edge(self.current, join)
+        else:
+            self.edge(cond, join)
+
+        self.current = join
+
+    def _loop(self, stmt, depth, cause, parent):
+        header = self.new_block()
+        self.edge(self.current, header)
+        self.current = header
+        index = self.add_statement(stmt, cause, parent)
+
+        after = self.new_block()
+        infinite = (
+            isinstance(stmt, ast.While)
+            and isinstance(stmt.test, ast.Constant)
+            and bool(stmt.test.value)
+        )
+
+        self.frames.append(_Frame("loop", break_target=after, continue_target=header))
+        self.current = self.new_block()
+        self.edge(header, self.current)
+        self.body(stmt.body, depth, index)
+        self.edge(self.current, header)
+        self.frames.pop()
+
+        # `else` runs when the loop ends without break
+        if stmt.orelse:
+            self.current = self.new_block()
+            if not infinite:
+                self.edge(header, self.current)
+            self.body(stmt.orelse, depth, index)
+            self.edge(self.current, after)
+        elif not infinite:
+            self.edge(header, after)
+
+        self.current = after
+
+    def _try(self, stmt, depth, cause, parent):
+        index = self.add_statement(stmt, cause, parent)
+
+        finally_frame = None
+        if stmt.finalbody:
+            finally_frame = _Frame("finally", finally_entry=self.new_block())
+            self.frames.append(finally_frame)
+
+        try_entry = self.new_block()
+        self.edge(self.current, try_entry)
+        self.current = try_entry
+
+        self.body(stmt.body, depth, index)
+
+        # else
+        self.body(stmt.orelse, depth, index)
+        normal_ends = [self.current]
+
+        # Any statement of the try body may raise into a handler
+        for handler in stmt.handlers:
+            self.current = self.new_block()
+            self.edge(try_entry, self.current)
+            self.body(handler.body, depth, index)
+            normal_ends.append(self.current)
+
+        after = self.new_block()
+
+        if finally_frame is None:
+            for end in normal_ends:
+                self.edge(end, after)
+            self.current = after
+            return
+
+        self.frames.pop()
+        finally_entry = finally_frame.finally_entry
+        for end in normal_ends:
+            self.edge(end, finally_entry)
+
+        # An exception escaping the try body also runs finally
+        if not stmt.handlers:
+            self.edge(try_entry, finally_entry)
+            finally_frame.pending.add((self.cfg.exit, len(self.frames)))
+
+        self.current = finally_entry
+        self.body(stmt.finalbody, depth, index)
+        finally_end = self.current
+
+        # Code after the try only runs if some path completed normally
+        if any(end in self.reach for end in normal_ends):
+            self.edge(finally_end, after)
+
+        for target, frame_index in finally_frame.pending:
+            self.current = finally_end
+            self.jump(target, self.frames[:frame_index])
+
+        self.current = after
+
+    def _match(self, stmt, depth, cause, parent):
+        index = self.add_statement(stmt, cause, parent)
+        subject = self.current
+        join = self.new_block()
+
+        irrefutable = False
+        for case in stmt.cases:
+            self.current = self.new_block()
+            self.edge(subject, self.current)
+            if case.guard is not None:
+                self.cfg.decisions += 1
+            self.body(case.body, depth, index)
+            self.edge(self.current, join)
+
+            if (
+                case.guard is None
+                and isinstance(case.pattern, ast.MatchAs)
+                and case.pattern.pattern is None
+            ):
+                irrefutable = True
+
+        if not irrefutable:
+            self.edge(subject, join)
+
+        self.current = join
+
+
+# ---------------------------
+# Cache + public API
+# ---------------------------
+
+class Source:
+    """Source text of a parsed module, for cheap unit fingerprints."""
+
+    def __init__(self, code: str):
+        self.data = code.encode("utf-8")
+        # Byte offset of each line start (ast columns are UTF-8 byte offsets)
+        self.line_starts = [0]
+        for line in self.data.splitlines(keepends=True):
+            self.line_starts.append(self.line_starts[-1] + len(line))
+
+    def segment(self, node) -> bytes:
+        start = node.lineno
+        for decorator in getattr(node, "decorator_list", ()):
+            start = min(start, decorator.lineno)
+        first = self.line_starts[start - 1]
+        last = self.line_starts[node.end_lineno - 1] + node.end_col_offset
+        return self.data[first:last]
+
+
+def attach_source(tree, code: str) -> None:
+    """Let CFG fingerprints hash source bytes instead of dumping the AST."""
+    tree._codesage_source = Source(code)
+
+
+def fingerprint(node, source=None) -> bytes:
+    """Structural hash of a unit, including positions (reported lines depend on them)."""
+    if source is None:
+        dumped = ast.dump(node, include_attributes=True).encode("utf-8")
+        return hashlib.blake2b(dumped, digest_size=16).digest()
+
+    # Same text at the same position parses to the same unit
+    if isinstance(node, ast.Module):
+        text, position = source.data, b"module"
+    else:
+        text, position = source.segment(node), f"{node.lineno}:{node.col_offset}".encode()
+    return hashlib.blake2b(position + b"\0" + text, digest_size=16, person=b"src").digest()
+
+
+def get_cfg(node, source=None) -> CFG:
+    """Return the (cached) CFG for a module, function or class node."""
+    key = fingerprint(node, source)
+    with _cfg_lock:
+        cached = _cfg_cache.get(key)
+        if cached is not None:
+            _cfg_cache.move_to_end(key)
+            return cached
+
+    if isinstance(node, ast.Module):
+        name, lineno = "<module>", 1
+    else:
+        name, lineno = node.name, node.lineno
+
+    # Built outside the lock: nested units call get_cfg recursively
+    cfg = _CFGBuilder(name, lineno, source).build(node.body)
+
+    with _cfg_lock:
+        _cfg_cache[key] = cfg
+        if len(_cfg_cache) > CFG_CACHE_SIZE:
+            _cfg_cache.popitem(last=False)
+    return cfg
+
+
+def clear_cache() -> None:
+    """Drop every cached CFG (benchmarks measuring a cold first analysis)."""
+    with _cfg_lock:
+        _cfg_cache.clear()
+
+
+def module_cfg(tree) -> CFG:
+    """CFG of a parsed module, memoised on the tree for the current analysis."""
+    cfg = getattr(tree, "_codesage_cfg", None)
+    if cfg is None:
+        cfg = get_cfg(tree, getattr(tree, "_codesage_source", None))
+        tree._codesage_cfg = cfg
+    return cfg
+
+
+def iter_units(cfg, base_depth=0):
+    """Yield (cfg, absolute base nesting depth) for a unit and all nested units."""
+    yield cfg, base_depth
+    for depth, child in cfg.children:
+        yield from iter_units(child, base_depth + depth)
+
+
+def max_nesting_depth(cfg) -> int:
+    return max(base + unit.max_depth for unit, base in iter_units(cfg))
+
+
+def cyclomatic_complexity(cfg) -> int:
+    """File-level McCabe complexity: 1 + decision points of every unit."""
+    return 1 + sum(unit.cyclomatic() - 1 for unit, _ in iter_units(cfg))
@@ -2,9 +2,11 @@ import ast
 from complexity.loops import analyze_loops
 from complexity.nesting_depth import analyze_nest
 from complexity.big_o import estimate_big_o
+from complexity.cfg import module_cfg, cyclomatic_complexity
 
-def complexity_score(code: str):
-    tree = ast.parse(code)
+def complexity_score(code: str, tree=None, loops=None, nesting=None, big_o=None):
+    """Callers that already ran the loop / nesting / big-O analyses pass their results in."""
+    tree = tree or ast.parse(code)
 
     # Penalty accumulators
     loop_penalty = 0
@@ -14,9 +16,9 @@ def complexity_score(code: str):
     branching_penalty = 0
 
     # Run previous analyses
-    loop_result = analyze_loops(tree)
-    nest_result = analyze_nest(tree)
-    big_o_result = estimate_big_o(tree)
+    loop_result = loops or analyze_loops(tree)
+    nest_result = nesting or analyze_nest(tree)
+    big_o_result = big_o or estimate_big_o(tree)
 
     # LOOP PENALTY
     loops = loop_result["total_loops"]
@@ -79,28 +81,8 @@ def complexity_score(code: str):
         big_o_penalty += 35
 
     # CYCLOMATIC COMPLEXITY PENALTY
-    cc_count = 1  # CC starts at 1
-    branch_nodes = [ast.If, ast.Try, ast.ExceptHandler]
-    
-    # These nodes exist only in Python 3.10–3.11
-    if hasattr(ast, "Match"):
-        branch_nodes.append(ast.Match)
-    if hasattr(ast, "MatchCase"):
-        branch_nodes.append(ast.MatchCase)
-    if hasattr(ast, "MatchClass"):  # Python 3.12–3.13 replacement
-        branch_nodes.append(ast.MatchClass)
-    
-    branch_nodes = tuple(branch_nodes)
-
-
-    for node in ast.walk(tree):
-        # Decision nodes
-        if isinstance(node, branch_nodes):
-            cc_count += 1
-        
-        # Logical conditions (and/or)
-        if isinstance(node, ast.BoolOp):
-            cc_count += 1
+    # McCabe (E - N + 2) per unit, taken from the cached control-flow graphs
+    cc_count = cyclomatic_complexity(module_cfg(tree))
 
     # CC penalty
     if cc_count <= 5:
@@ -0,0 +1,307 @@
+# engine.py — Line Diff Engine
+# Responsibilities:
+# - Histogram diff over interned line hashes (robust to repeated lines)
+# - Time-bounded: regions left when the deadline passes become replace blocks
+# - Structured hunks + unified text rendering
+#
+# Used by diff/generator.py, versions.generate_diff and the delta encoder
+# in versions/blobs.py.
+
+import difflib
+import time
+from typing import List, Optional, Tuple
+
+# Lines occurring more often than this in a region are never used as anchors
+MAX_CHAIN = 64
+
+# Regions without a usable anchor fall back to difflib when this small
+FALLBACK_REGION = 400 * 400
+
+DEFAULT_TIMEOUT = 2.0  # seconds
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _intern(old_lines: List[str], new_lines: List[str]):
+    """Map every distinct line to a small int so comparisons are int compares."""
+    table = {}
+    old_ids = [table.setdefault(line, len(table)) for line in old_lines]
+    new_ids = [table.setdefault(line, len(table)) for line in new_lines]
+    return old_ids, new_ids
+
+
+# Polynomial rolling hash over interned ids (Mersenne prime modulus)
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+
+
+class _RunHasher:
+    """Prefix hashes so 'how far do these two runs match' is a binary search."""
+
+    def __init__(self, a, b):
+        longest = max(len(a), len(b)) + 1
+        self.powers = [1] * longest
+        for k in range(1, longest):
+            self.powers[k] = self.powers[k - 1] * _BASE % _MOD
+        self.prefix_a = self._prefix(a)
+        self.prefix_b = self._prefix(b)
+
+    @staticmethod
+    def _prefix(seq):
+        prefix = [0] * (len(seq) + 1)
+        for k, value in enumerate(seq):
+            prefix[k + 1] = (prefix[k] * _BASE + value + 1) % _MOD
+        return prefix
+
+    def _segment(self, prefix, start, length):
+        return (prefix[start + length] - prefix[start] * self.powers[length]) % _MOD
+
+    def same(self, i, j, length):
+        return self._segment(self.prefix_a, i, length) == self._segment(self.prefix_b, j, length)
+
+    def forward(self, i, j, limit):
+        """Length of the common run starting at a[i], b[j] (at most `limit`)."""
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.same(i, j, mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def backward(self, i, j, limit):
+        """Length of the common run ending just before a[i], b[j]."""
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.same(i - mid, j - mid, mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+
+def _find_anchor(a, b, alo, ahi, blo, bhi, hasher, deadline=None):
+    """
+    Histogram step: pick the match seeded by the rarest line of `a` that
+    also occurs in `b`, extended as far as possible in both directions.
+    Among equally rare seeds the run closest to the middle of the region
+    wins (then the longer one), so the recursion splits regions evenly
+    instead of peeling one run off the left edge at a time.
+    Returns (start_a, start_b, length) or None (also when `deadline` passes).
+    """
+    occurrences = {}
+    for i in range(alo, ahi):
+        occurrences.setdefault(a[i], []).append(i)
+
+    best = None
+    best_count = MAX_CHAIN + 1
+    best_rank = None
+    middle = alo + ahi  # doubled, so run centres compare without halving
+
+    j = blo
+    steps = 0
+    while j < bhi:
+        steps += 1
+        if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+            return None
+
+        positions = occurrences.get(b[j])
+        if positions is None or len(positions) > best_count:
+            j += 1
+            continue
+
+        next_j = j + 1
+        count = len(positions)
+        for i in positions:
+            back = hasher.backward(i, j, min(i - alo, j - blo))
+            ahead = hasher.forward(i, j, min(ahi - i, bhi - j))
+            si, sj, length = i - back, j - back, back + ahead
+
+            rank = (-length, abs(2 * si + length - middle))
+            if best is None or count < best_count or (count == best_count and rank < best_rank):
+                best = (si, sj, length)
+                best_count = count
+                best_rank = rank
+            next_j = max(next_j, j + ahead)
+        j = next_j
+
+    # Guard against hash collisions before trusting the run
+    if best is not None:
+        si, sj, length = best
+        if a[si:si + length] != b[sj:sj + length]:
+            return None
+    return best
+
+
+def diff_opcodes(old_lines: List[str], new_lines: List[str], timeout: Optional[float] = DEFAULT_TIMEOUT) -> List[Opcode]:
+    """
+    Opcodes in difflib format ("equal" / "replace" / "delete" / "insert",
+    i1, i2, j1, j2). Never raises on large inputs: once `timeout` seconds
+    have passed, unresolved regions are reported as whole replacements.
+    """
+    a, b = _intern(old_lines, new_lines)
+    hasher = _RunHasher(a, b)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    matches = []  # (i, j, length)
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # Common prefix / suffix
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo, 1))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi, 1))
+
+        if alo == ahi or blo == bhi:
+            continue
+
+        if deadline is not None and time.monotonic() > deadline:
+            continue  # leave the region unmatched -> replace
+
+        anchor = _find_anchor(a, b, alo, ahi, blo, bhi, hasher, deadline)
+        if anchor is None:
+            # Only very common lines in common (blank lines, braces)
+            timed_out = deadline is not None and time.monotonic() > deadline
+            if not timed_out and (ahi - alo) * (bhi - blo) <= FALLBACK_REGION:
+                matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for i, j, size in matcher.get_matching_blocks():
+                    if size:
+                        matches.append((alo + i, blo + j, size))
+            continue
+
+        si, sj, length = anchor
+        matches.append((si, sj, length))
+        stack.append((si + length, ahi, sj + length, bhi))
+        stack.append((alo, si, blo, sj))
+
+    return _to_opcodes(matches, len(a), len(b))
+
+
+def _to_opcodes(matches, len_a, len_b) -> List[Opcode]:
+    matches.sort()
+
+    opcodes = []
+    i = j = 0
+    for mi, mj, size in matches + [(len_a, len_b, 0)]:
+        if i < mi and j < mj:
+            opcodes.append(("replace", i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(("delete", i, mi, j, j))
+        elif j < mj:
+            opcodes.append(("insert", i, i, j, mj))
+
+        if size:
+            # Merge adjacent equal runs
+            if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == mi:
+                _, ei1, _, ej1, _ = opcodes.pop()
+                opcodes.append(("equal", ei1, mi + size, ej1, mj + size))
+            else:
+                opcodes.append(("equal", mi, mi + size, mj, mj + size))
+        i, j = mi + size, mj + size
+
+    return opcodes
+
+
+def _strip_eol(line: str) -> str:
+    return line.rstrip("\r\n")
+
+
+def build_hunks(old_lines: List[str], new_lines: List[str], opcodes: List[Opcode], context: int = 3) -> List[dict]:
+    """Group opcodes into unified-diff hunks with `context` lines around changes."""
+    if not opcodes or all(tag == "equal" for tag, *_ in opcodes):
+        return []
+
+    # Trim leading / trailing context (same grouping as difflib)
+    codes = list(opcodes)
+    if codes[0][0] == "equal":
+        _, i1, i2, j1, j2 = codes[0]
+        codes[0] = ("equal", max(i1, i2 - context), i2, max(j1, j2 - context), j2)
+    if codes[-1][0] == "equal":
+        _, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = ("equal", i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+
+    groups = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+
+    hunks = []
+    for group in groups:
+        lines = []
+        added = removed = 0
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                lines.extend((" ", _strip_eol(line)) for line in old_lines[i1:i2])
+                continue
+            if tag in ("replace", "delete"):
+                lines.extend(("-", _strip_eol(line)) for line in old_lines[i1:i2])
+                removed += i2 - i1
+            if tag in ("replace", "insert"):
+                lines.extend(("+", _strip_eol(line)) for line in new_lines[j1:j2])
+                added += j2 - j1
+
+        first, last = group[0], group[-1]
+        hunks.append({
+            "old_start": first[1] + 1,
+            "old_lines": last[2] - first[1],
+            "new_start": first[3] + 1,
+            "new_lines": last[4] - first[3],
+            "added": added,
+            "removed": removed,
+            "lines": lines,
+        })
+    return hunks
+
+
+def _range(start: int, length: int) -> str:
+    # Unified diff convention: empty ranges point at the line before
+    if length == 1:
+        return f"{start}"
+    if length == 0:
+        return f"{start - 1},0"
+    return f"{start},{length}"
+
+
+def render_unified(hunks: List[dict], fromfile: str = "original", tofile: str = "refactored") -> str:
+    if not hunks:
+        return ""
+
+    out = [f"--- {fromfile}", f"+++ {tofile}"]
+    for hunk in hunks:
+        out.append(
+            f"@@ -{_range(hunk['old_start'], hunk['old_lines'])} "
+            f"+{_range(hunk['new_start'], hunk['new_lines'])} @@"
+        )
+        out.extend(prefix + line for prefix, line in hunk["lines"])
+    return "\n".join(out)
+
+
+def diff_texts(old_code: str, new_code: str, context: int = 3, timeout: Optional[float] = DEFAULT_TIMEOUT) -> dict:
+    """Structured diff of two texts: hunks plus added / removed line counts."""
+    old_lines = (old_code or "").splitlines(keepends=True)
+    new_lines = (new_code or "").splitlines(keepends=True)
+
+    opcodes = diff_opcodes(old_lines, new_lines, timeout=timeout)
+    hunks = build_hunks(old_lines, new_lines, opcodes, context=context)
+
+    return {
+        "hunks": hunks,
+        "added": sum(h["added"] for h in hunks),
+        "removed": sum(h["removed"] for h in hunks),
+    }
@@ -1,10 +1,10 @@
 # generator.py — Diff Engine
 # Responsibilities:
-# - Generate unified diff
+# - Generate unified diff (via diff/engine.py)
 # - Produce summary
 
 
-import difflib
+from diff.engine import diff_texts, render_unified
 
 def generate_diff(old_code: str, new_code: str) -> dict:
     """
@@ -15,6 +15,7 @@ def generate_diff(old_code: str, new_code: str) -> dict:
     Returns:
       A dictionary containing:
         - unified diff text
+        - structured hunks
         - summary of changes
     """
 
@@ -25,49 +26,17 @@ def generate_diff(old_code: str, new_code: str) -> dict:
     if old_code.strip() == new_code.strip():
         return {
             "diff": "",
+            "hunks": [],
             "summary": "No changes detected"
         }
 
     try:
-        old_lines = old_code.splitlines(keepends=True)
-        new_lines = new_code.splitlines(keepends=True)
-
-        # Generate unified diff (GitHub style)
-        diff_lines = list(
-            difflib.unified_diff(
-                old_lines,
-                new_lines,
-                fromfile="original",
-                tofile="refactored",
-                lineterm=""
-            )
-        )
-
-        # Combine lines into one full diff text
-        diff_text = "\n".join(diff_lines)
+        result = diff_texts(old_code, new_code)
+        diff_text = render_unified(result["hunks"], fromfile="original", tofile="refactored")
 
         # Count changes for summary
-        added = 0
-        removed = 0
-
-        for line in diff_lines:
-
-            # Ignore diff metadata
-            if (
-                line.startswith("---") or
-                line.startswith("+++") or
-                line.startswith("@@")
-            ):
-                continue
-
-            # Ignore file labels in unified diff
-            if line.startswith("+original") or line.startswith("-refactored"):
-                continue
-
-            if line.startswith("+"):
-                added += 1
-            elif line.startswith("-"):
-                removed += 1
+        added = result["added"]
+        removed = result["removed"]
 
         # Modified lines = lines that changed (paired add/remove)
         modified = min(added, removed)
@@ -76,11 +45,13 @@ def generate_diff(old_code: str, new_code: str) -> dict:
 
         return {
             "diff": diff_text,
+            "hunks": result["hunks"],
             "summary": summary
         }
 
     except Exception:
         return {
             "diff": "",
+            "hunks": [],
             "summary": "Diff generation failed"
         }
@@ -0,0 +1,236 @@
+# semantic.py — AST Semantic Diff
+# Responsibilities:
+# - Collect every function / class definition (top-level and nested)
+# - Hash each definition's own body bottom-up in one pass (Merkle style)
+# - Match definitions between two versions and classify the changes:
+#     unchanged, body_changed, renamed, moved, added, removed
+#
+# Everything is dict lookups over one pass of each tree, so the cost is
+# linear in the size of the two ASTs.
+
+import ast
+from typing import Optional
+
+DEF_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Fields that never affect meaning
+_SKIP_FIELDS = {"ctx", "type_comment"}
+
+# A nested definition contributes only this marker to its parent's hash,
+# so editing a method does not mark the whole class as changed
+_NESTED_MARKER = "<def>"
+
+
+def _kind(node) -> str:
+    return "class" if isinstance(node, ast.ClassDef) else "function"
+
+
+class _Definition:
+    __slots__ = ("name", "qualname", "kind", "node", "parent", "children", "digest", "match")
+
+    def __init__(self, name, qualname, kind, node, parent):
+        self.name = name
+        self.qualname = qualname
+        self.kind = kind
+        self.node = node
+        self.parent = parent
+        self.children = []
+        self.digest = None
+        self.match = None
+
+    @property
+    def lines(self):
+        if self.node is None:
+            return None
+        return [self.node.lineno, getattr(self.node, "end_lineno", self.node.lineno)]
+
+
+def _hash_node(node, owner, out) -> int:
+    """
+    Structural hash of `node` without positions. Definitions found on the
+    way are appended to `out` with their own hash (name excluded, so a
+    renamed definition keeps its hash).
+    """
+    is_def = isinstance(node, DEF_NODES)
+    if is_def:
+        qualname = f"{owner.qualname}.{node.name}" if owner.node is not None else node.name
+        definition = _Definition(node.name, qualname, _kind(node), node, owner)
+        owner.children.append(definition)
+        out.append(definition)
+        owner = definition
+
+    parts = [type(node).__name__]
+    for field, value in ast.iter_fields(node):
+        if field in _SKIP_FIELDS or (is_def and field == "name"):
+            continue
+        if isinstance(value, list):
+            parts.append(tuple(_hash_child(item, owner, out) for item in value))
+        else:
+            parts.append(_hash_child(value, owner, out))
+
+    # Digests only live for one comparison, so the builtin tuple hash will do
+    digest = hash(tuple(parts))
+    if is_def:
+        owner.digest = digest
+    return digest
+
+
+def _hash_child(value, owner, out):
+    if isinstance(value, ast.AST):
+        digest = _hash_node(value, owner, out)
+        return _NESTED_MARKER if isinstance(value, DEF_NODES) else digest
+    # 1, 1.0 and True hash equal on their own
+    return type(value).__name__, value
+
+
+def _collect(tree):
+    root = _Definition("", "", "module", None, None)
+    definitions = []
+    _hash_node(tree, root, definitions)
+    return root, definitions
+
+
+# ---------------------------
+# Matching
+# ---------------------------
+
+def _pair(old, new):
+    old.match = new
+    new.match = old
+
+
+def _match_children(old_parent, new_parent, stack):
+    """Match direct children of two matched parents by name, then by hash (rename)."""
+    new_by_name = {}
+    for d in reversed(new_parent.children):
+        if d.match is None:
+            new_by_name.setdefault((d.kind, d.name), []).append(d)
+
+    leftover_old = []
+    for d in old_parent.children:
+        if d.match is not None:
+            continue
+        candidates = new_by_name.get((d.kind, d.name))
+        if candidates:
+            _pair(d, candidates.pop())
+            stack.append((d, d.match))
+        else:
+            leftover_old.append(d)
+
+    # Renames: same parent, same body hash, unique on both sides
+    new_by_digest = {}
+    for d in new_parent.children:
+        if d.match is None:
+            new_by_digest.setdefault((d.kind, d.digest), []).append(d)
+    old_by_digest = {}
+    for d in leftover_old:
+        old_by_digest.setdefault((d.kind, d.digest), []).append(d)
+
+    for key, olds in old_by_digest.items():
+        news = new_by_digest.get(key)
+        if len(olds) == 1 and news and len(news) == 1:
+            _pair(olds[0], news[0])
+            stack.append((olds[0], news[0]))
+
+
+def _match_moves(old_defs, new_defs, stack):
+    """Unmatched definitions with the same name and body under a different parent."""
+    index = {}
+    for d in reversed(new_defs):
+        if d.match is None:
+            index.setdefault((d.kind, d.name, d.digest), []).append(d)
+
+    for d in old_defs:
+        if d.match is not None:
+            continue
+        candidates = index.get((d.kind, d.name, d.digest))
+        if candidates:
+            _pair(d, candidates.pop())
+            stack.append((d, d.match))
+
+
+def _status(old, new) -> str:
+    if old.parent.match is not new.parent:
+        return "moved"
+    if old.name != new.name:
+        return "renamed"
+    if old.digest != new.digest:
+        return "body_changed"
+    return "unchanged"
+
+
+def _change(status, old=None, new=None) -> dict:
+    entry = {
+        "status": status,
+        "kind": (new or old).kind,
+        "name": (new or old).qualname,
+    }
+    if old is not None and new is not None and old.qualname != new.qualname:
+        entry["old_name"] = old.qualname
+    entry["old_lines"] = old.lines if old is not None else None
+    entry["new_lines"] = new.lines if new is not None else None
+    return entry
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+
+def semantic_diff(old_code: str, new_code: str) -> Optional[dict]:
+    """
+    Definition-level diff of two sources. Returns None when either side
+    does not parse.
+
+    {
+      "changes":   [{status, kind, name, old_name?, old_lines, new_lines}],
+      "unchanged": [qualified names in the new code],
+      "counts":    {status: n}
+    }
+    """
+    try:
+        old_root, old_defs = _collect(ast.parse(old_code or ""))
+        new_root, new_defs = _collect(ast.parse(new_code or ""))
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+
+    # Top-down: children are matched only under matched parents
+    _pair(old_root, new_root)
+    stack = [(old_root, new_root)]
+    while stack:
+        old_parent, new_parent = stack.pop()
+        _match_children(old_parent, new_parent, stack)
+
+    # Definitions moved to another parent (their children follow them)
+    stack = []
+    _match_moves(old_defs, new_defs, stack)
+    while stack:
+        old_parent, new_parent = stack.pop()
+        _match_children(old_parent, new_parent, stack)
+
+    changes = []
+    unchanged = []
+    counts = {}
+
+    for d in old_defs:
+        if d.match is None:
+            changes.append(_change("removed", old=d))
+            counts["removed"] = counts.get("removed", 0) + 1
+
+    for d in new_defs:
+        if d.match is None:
+            status = "added"
+            changes.append(_change(status, new=d))
+        else:
+            status = _status(d.match, d)
+            if status == "unchanged":
+                unchanged.append(d.qualname)
+            else:
+                changes.append(_change(status, old=d.match, new=d))
+        counts[status] = counts.get(status, 0) + 1
+
+    return {"changes": changes, "unchanged": unchanged, "counts": counts}
+
+
+def sandboxed_semantic_diff(old_code: str, new_code: str, cancel=None) -> Optional[dict]:
+    """semantic_diff for services.sandbox.run_sandboxed (ast.parse of user code runs in a worker)."""
+    return semantic_diff(old_code, new_code)
@@ -1,13 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from routes.analyze import router as analyze_router
 from routes.ai_routes import router as ai_router
 from routes.version_routes import router as version_router
+from routes.blob_routes import router as blob_router
+
+from services import metrics
+from services.compression import CompressionMiddleware
+from services.lanes import lane_stats, stop_lanes
+from services.prompts import load_prompts
+from services.sandbox import sandbox_stats, start_sandbox, stop_sandbox
+from services.responses import FastJSONResponse
+from versions.shards import init_shards, compaction_job
+from versions.writer import stop_all as stop_writers
+from versions.db import close_all as close_db
+
 
-from versions.versions import init_db
+# Importing this module has no side effects: databases, prompts and
+# background jobs are set up here, and the AI SDK on first AI request
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_shards()
+    load_prompts()
+    start_sandbox()
+    compaction = compaction_job()
+    compaction.start()
+    try:
+        yield
+    finally:
+        compaction.stop()
+        stop_lanes()
+        stop_sandbox()
+        stop_writers()
+        close_db()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,19 +49,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
-init_db()
+# gzip/br responses above a size threshold; gzip request bodies accepted
+app.add_middleware(CompressionMiddleware)
 
 # Attach routers
 app.include_router(analyze_router)
 app.include_router(ai_router)
 app.include_router(version_router)
+app.include_router(blob_router)
 
 @app.get("/")
 def root():
     return {"message": "CodeSage Backend Running"}
 
+# 503 only while the fast lane (/analyze) is saturated, so load balancers
+# route around this instance. A full slow or gemini lane (AI calls, which
+# answer 503 + Retry-After themselves) is reported as "degraded" with 200:
+# pulling the instance would also take away its analysis capacity
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    lanes = {
+        name: {"saturated": stats["saturated"], "running": stats["running"], "queued": stats["queued"]}
+        for name, stats in lane_stats().items()
+    }
+    saturated = [name for name, lane in lanes.items() if lane["saturated"]]
+    if "fast" in saturated:
+        return FastJSONResponse({"status": "saturated", "saturated": saturated, "lanes": lanes}, status_code=503)
+    return {"status": "degraded" if saturated else "ok", "saturated": saturated, "lanes": lanes}
+
+@app.get("/metrics")
+def get_metrics():
+    return {**metrics.snapshot(), "lanes": lane_stats(), "sandbox": sandbox_stats()}
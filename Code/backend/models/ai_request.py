@@ -3,7 +3,9 @@ from typing import Optional, List, Dict, Any
 
 
 class AIRequest(BaseModel):
-    code: str
+    # Either the source itself or a handle from PUT /blobs
+    code: Optional[str] = None
+    code_ref: Optional[str] = None
     issues: Optional[List[Dict[str, Any]]] = None
     complexity: Optional[Dict[str, Any]] = None
     quality: Optional[Dict[str, Any]] = None
@@ -1,4 +1,10 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class AnalyzeRequest(BaseModel):
-    code: str
+    # Either the source itself or a handle from PUT /blobs
+    code: Optional[str] = None
+    code_ref: Optional[str] = None
+    # "fast" (lint-as-you-type) or "full"; `rules` narrows the profile's rule list
+    profile: str = "full"
+    rules: Optional[List[str]] = None
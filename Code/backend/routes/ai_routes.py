@@ -1,43 +1,81 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header, Request
 from models.ai_request import AIRequest
 from services.refactor import run_refactor_step
 from services.explain import run_explain_step
 from services.testcases import run_testcases_step
 from services.analyze_service import analyze_full
+from routes.blob_routes import code_from
+from services.cancellation import client_gone, run_cancellable
+from services.deadline import merge_degraded, request_deadline
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
+# Each route runs its step through run_cancellable: if the client
+# disconnects (tab closed, newer click aborted the fetch) the Gemini call
+# and compile() validation are skipped and the route answers 499.
+# X-Deadline-Ms (default per route, see services/deadline.py) bounds the
+# whole request; AI work that no longer fits is skipped and the response
+# says so under "degraded".
+
 @router.post("/refactor")
-def api_refactor(payload: AIRequest):
+async def api_refactor(payload: AIRequest, request: Request, x_deadline_ms: Optional[int] = Header(None)):
+    deadline = request_deadline("ai.refactor", x_deadline_ms)
+    code = code_from(payload.code, payload.code_ref)
     issues = payload.issues or []
-    result = run_refactor_step(payload.code, issues)
+    result = await run_cancellable(request, "ai.refactor", run_refactor_step, code, issues, deadline=deadline)
+    if result is None:
+        return client_gone()
     return {
         "refactored_code": result["refactored_code"],
         "notes": result["notes"],
+        "degraded": result.get("degraded"),
         "ai_model": "gemini-flash-latest",
     }
 
 @router.post("/explain")
-def api_explain(payload: AIRequest):
+async def api_explain(payload: AIRequest, request: Request, x_deadline_ms: Optional[int] = Header(None)):
+    deadline = request_deadline("ai.explain", x_deadline_ms)
+    code = code_from(payload.code, payload.code_ref)
     issues = payload.issues or []
-    result = run_explain_step(payload.code, issues)
+    result = await run_cancellable(request, "ai.explain", run_explain_step, code, issues, deadline=deadline)
+    if result is None:
+        return client_gone()
     return {
         "explanation": result["explanation"],
+        "degraded": result.get("degraded"),
         "ai_model": "gemini-flash-latest",
     }
 
 @router.post("/testcases")
-def api_testcases(payload: AIRequest):
+async def api_testcases(payload: AIRequest, request: Request, x_deadline_ms: Optional[int] = Header(None)):
+    deadline = request_deadline("ai.testcases", x_deadline_ms)
+    code = code_from(payload.code, payload.code_ref)
     issues = payload.issues or []
-    result = run_testcases_step(payload.code, issues)
+    result = await run_cancellable(request, "ai.testcases", run_testcases_step, code, issues, deadline=deadline)
+    if result is None:
+        return client_gone()
     return {
         "test_cases": result.get("test_cases", []),
+        "degraded": result.get("degraded"),
         "ai_model": "gemini-flash-latest",
     }
 
 @router.post("/analyze-and-refactor")
-def api_analyze_and_refactor(payload: AIRequest):
-    analysis = analyze_full(payload.code)
+async def api_analyze_and_refactor(payload: AIRequest, request: Request, x_deadline_ms: Optional[int] = Header(None)):
+    deadline = request_deadline("ai.analyze_and_refactor", x_deadline_ms)
+    code = code_from(payload.code, payload.code_ref)
+    result = await run_cancellable(
+        request, "ai.analyze_and_refactor", _analyze_and_refactor, code, deadline=deadline
+    )
+    if result is None:
+        return client_gone()
+    return result
+
+
+def _analyze_and_refactor(code, cancel=None, deadline=None):
+    analysis = analyze_full(code, cancel=cancel, deadline=deadline)
 
     raw_complexity = analysis.get("complexity", {})
 
@@ -55,13 +93,16 @@ def api_analyze_and_refactor(payload: AIRequest):
     }
 
     refactor = run_refactor_step(
-        payload.code,
-        analysis.get("issues", [])
+        code,
+        analysis.get("issues", []),
+        cancel,
+        deadline,
     )
 
     return {
         # Static analysis
         "issues": analysis.get("issues", []),
+        "issueSummary": analysis.get("issueSummary"),
         "complexity": complexity,
 
         # Quality scores
@@ -72,13 +113,9 @@ def api_analyze_and_refactor(payload: AIRequest):
         "qualityScore": analysis.get("qualityScore", 0),
 
         # AI refactor
-        "refactoredCode": refactor.get("refactored_code", payload.code),
+        "refactoredCode": refactor.get("refactored_code", code),
         "explanation": refactor.get("notes", ""),
+        "degraded": merge_degraded(analysis.get("degraded"), refactor.get("degraded")),
 
         "ai_model": "gemini-flash-latest",
     }
-
-
-
-
-
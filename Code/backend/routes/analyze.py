@@ -1,12 +1,92 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from models.analyze_request import AnalyzeRequest
-from services.analyze_service import analyze_full
+from analysis.run_all import resolve_selection, selection_key
+from routes.blob_routes import code_from
+from services.analyze_service import analyze_full, analysis_etag, result_issues
+from services.cancellation import client_gone, run_cancellable
+from services.deadline import request_deadline
+from services.code_store import code_ref_of
+from services.live_analysis import LiveSession
+from services.http_cache import REVALIDATE, cached_json, etag_matches, not_modified, uncached_json, variant_etag
+from services.responses import parse_fields, shape
 
 router = APIRouter(prefix = "/analyze",
                    tags = ['Analyze'])
 
 @router.post("")
-def analyze_code(request: AnalyzeRequest):
-    return analyze_full(request.code)
+async def analyze_code(
+    payload: AnalyzeRequest,
+    request: Request,
+    if_none_match: Optional[str] = Header(None),
+    x_deadline_ms: Optional[int] = Header(None),
+    fields: Optional[str] = Query(None, description="comma-separated top-level keys to return"),
+    issue_format: str = Query("full", pattern="^(full|compact)$"),
+):
+    # The result is a pure function of the code, so a matching ETag skips the analyzers
+    # (and, for a code_ref, even the lookup of the uploaded code)
+    try:
+        selection = resolve_selection(payload.profile, payload.rules)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    code = None if payload.code_ref else code_from(payload.code, None)
+    selected = parse_fields(fields)
+    etag = variant_etag(
+        analysis_etag(payload.code_ref or code_ref_of(code)),
+        selection_key(selection),
+        ",".join(selected) if selected else None,
+        issue_format if issue_format != "full" else None,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, REVALIDATE)
+
+    if code is None:
+        code = code_from(payload.code, payload.code_ref)
+    # Stops between analysis stages if the client disconnects; stages that
+    # no longer fit the deadline are skipped (listed under "degraded")
+    deadline = request_deadline("analyze", x_deadline_ms)
+    result = await run_cancellable(request, "analyze", analyze_full, code, selection, deadline=deadline)
+    if result is None:
+        return client_gone()
+    if result["degraded"]:
+        return uncached_json(shape(result, selected, issue_format))
+    return cached_json(shape(result, selected, issue_format), etag, REVALIDATE)
+
+
+# FULL ISSUE LIST OF A (TRUNCATED) RESULT, PAGE BY PAGE
+@router.get("/{result_id}/issues")
+def analyze_result_issues(
+    result_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    type: Optional[str] = None,
+    issue_format: str = Query("full", pattern="^(full|compact)$"),
+):
+    page = result_issues(result_id, offset=offset, limit=limit, issue_type=type)
+    if not page["ok"]:
+        raise HTTPException(status_code=410, detail=page["error"])
+    return shape(page, None, issue_format)
 
 
+# LIVE ANALYSIS (debounced, superseded runs cancelled; see services/live_analysis.py)
+@router.websocket("/live")
+async def analyze_live(websocket: WebSocket):
+    await websocket.accept()
+    session = LiveSession(websocket.send_text)
+    worker = asyncio.create_task(session.run())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await session.send({"type": "error", "code": "invalid_json", "error": "Messages must be JSON"})
+                continue
+            await session.receive(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+        worker.cancel()
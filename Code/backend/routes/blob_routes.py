@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
+from services.code_store import MAX_CODE_BYTES, CodeRefExpired, put_code, resolve_code
+
+router = APIRouter(prefix="/blobs", tags=["Blobs"])
+
+
+def code_from(code: Optional[str], code_ref: Optional[str]) -> str:
+    """Inline code or an uploaded handle; 410 tells the client to upload again."""
+    try:
+        return resolve_code(code, code_ref)
+    except CodeRefExpired as e:
+        raise HTTPException(status_code=410, detail={"error": "code_ref_expired", "code_ref": e.code_ref, "message": str(e)})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Code is larger than {MAX_CODE_BYTES} bytes")
+
+
+# UPLOAD CODE ONCE (raw UTF-8 body) -> content hash usable as code_ref.
+# An oversized upload is refused on its Content-Length, or as soon as the
+# streamed body passes the limit, never buffered whole
+@router.put("")
+async def api_put_code(request: Request):
+    try:
+        declared = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared > MAX_CODE_BYTES:
+        raise _too_large()
+
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_CODE_BYTES:
+            raise _too_large()
+        chunks.append(chunk)
+    body = b"".join(chunks)
+
+    try:
+        code = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+
+    return {"ok": True, "code_ref": put_code(code), "size": len(body)}
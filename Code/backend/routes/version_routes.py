@@ -1,33 +1,158 @@
-from fastapi import APIRouter
-from versions.versions import (
+import hmac
+import json
+import os
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from routes.blob_routes import code_from
+from services.deadline import request_deadline
+from services.http_cache import REVALIDATE, cached_json, etag_matches, not_modified, variant_etag
+from services.responses import parse_fields, shape
+from versions.versions import decode_cursor
+from versions.shards import (
     save_version,
     get_version_history,
+    iter_version_history,
+    diff_versions,
+    search_versions,
+    issue_trend,
+    quality_trend,
+    issue_summary,
     get_version,
+    version_etag,
     delete_version,
     clear_versions,
+    storage_stats,
+    compact,
 )
 
 router = APIRouter(prefix="/versions", tags=["Versions"])
 
-# SAVE VERSION
+# Admin endpoints require this token (X-Admin-Token); without it they are
+# disabled (404), so a deployment that forgets the token is not left open
+ADMIN_TOKEN = os.environ.get("CODESAGE_ADMIN_TOKEN")
+
+
+def _check_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# SAVE VERSION (original_code / refactored_code may be sent as *_ref handles;
+# X-Deadline-Ms bounds the optional work, see services/deadline.py)
 @router.post("/save")
-def api_save_version(payload: dict):
-    return save_version(**payload)
+def api_save_version(payload: dict, x_deadline_ms: Optional[int] = Header(None)):
+    deadline = request_deadline("versions.save", x_deadline_ms)
+    # Only handles are resolved; a missing refactored_code still falls back
+    # to original_code in save_version
+    for field in ("original_code", "refactored_code"):
+        ref = payload.pop(f"{field}_ref", None)
+        if ref:
+            payload[field] = code_from(payload.get(field), ref)
+    return save_version(**payload, deadline=deadline)
+
+# DIFF ANY TWO VERSIONS (declared before /{session_id})
+@router.get("/diff")
+def api_diff_versions(
+    from_id: int = Query(..., alias="from"),
+    to_id: int = Query(..., alias="to"),
+    field: str = Query("refactored", pattern="^(original|refactored)$"),
+):
+    return diff_versions(from_id, to_id, field=field)
+
+# SEARCH STORED CODE (declared before /{session_id})
+@router.get("/search")
+def api_search_versions(
+    q: str = Query(..., min_length=1, max_length=500),
+    session_id: Optional[str] = None,
+    field: Optional[str] = Query(None, pattern="^(original|refactored)$"),
+    mode: str = Query("phrase", pattern="^(phrase|all)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    return search_versions(q, session_id=session_id, field=field, mode=mode, limit=limit, offset=offset)
+
+# ADMIN: STORAGE STATS (declared before /{session_id})
+@router.get("/admin/stats")
+def api_storage_stats(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return storage_stats()
+
+# ADMIN: RUN RETENTION + VACUUM NOW
+@router.post("/admin/compact")
+def api_compact(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return compact()
 
-# GET SINGLE VERSION 
+# GET SINGLE VERSION (fields= selects keys of "version")
 @router.get("/version/{version_id}")
-def api_get_version(version_id: int):
-    return get_version(version_id)
+def api_get_version(
+    version_id: int,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description="comma-separated version keys to return"),
+    issue_format: str = Query("full", pattern="^(full|compact)$"),
+):
+    selected = parse_fields(fields)
+    variant = (",".join(selected) if selected else None, issue_format if issue_format != "full" else None)
+
+    if if_none_match:
+        # One primary-key read; no snapshots
+        etag = version_etag(version_id)
+        if etag is not None:
+            etag = variant_etag(etag, *variant)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, REVALIDATE)
+
+    result = get_version(version_id)
+    if not result.get("ok"):
+        return result
+
+    etag = variant_etag(result["etag"], *variant)
+    payload = {**result, "etag": etag, "version": shape(result["version"], selected, issue_format)}
+    return cached_json(payload, etag, REVALIDATE)
 
 # DELETE SINGLE VERSION
 @router.delete("/version/{version_id}")
 def api_delete_version(version_id: int):
     return delete_version(version_id)
 
-# GET VERSION HISTORY 
+# GET VERSION HISTORY (cursor-paginated, or NDJSON export with format=ndjson)
 @router.get("/{session_id}")
-def api_get_version_history(session_id: str):
-    return get_version_history(session_id)
+def api_get_version_history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    if format == "ndjson":
+        try:
+            if cursor:
+                decode_cursor(cursor)
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+
+        lines = (
+            json.dumps(item, ensure_ascii=False) + "\n"
+            for item in iter_version_history(session_id, cursor=cursor)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    return get_version_history(session_id, limit=limit, cursor=cursor)
+
+# QUALITY TRENDS FOR SESSION
+@router.get("/{session_id}/trends/issues")
+def api_issue_trend(session_id: str, type: Optional[str] = Query(None, max_length=64)):
+    return issue_trend(session_id, type)
+
+@router.get("/{session_id}/trends/quality")
+def api_quality_trend(session_id: str):
+    return quality_trend(session_id)
+
+@router.get("/{session_id}/trends/summary")
+def api_issue_summary(session_id: str):
+    return issue_summary(session_id)
 
 # CLEAR ALL VERSIONS FOR SESSION
 @router.delete("/{session_id}")
@@ -1,23 +1,96 @@
 import os
 import json
 import re
-import google.generativeai as genai
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 
+from services import metrics
+from services.lanes import LANES, LaneSaturated
+
 load_dotenv()
 
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise RuntimeError("Missing GOOGLE_API_KEY")
+MODEL_NAME = "models/gemini-flash-latest"
+
+# google.generativeai is heavy to import, so the SDK is loaded and the
+# model configured on first AI use rather than at app startup
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise RuntimeError("Missing GOOGLE_API_KEY")
+
+                import google.generativeai as genai
+
+                genai.configure(api_key=api_key)
+                _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+
+# Gemini round trips run in the "gemini" lane (services/lanes.py) so a
+# caller whose client disconnected (or whose deadline passed) can stop
+# waiting. The blocking SDK call itself cannot be interrupted; an abandoned
+# call finishes in the background (at the latest when the SDK timeout, the
+# time left before the deadline, runs out) and its answer is dropped. A
+# full lane raises LaneSaturated, which the routes answer with 503.
+CANCEL_POLL_INTERVAL = 0.1  # seconds
+
+# A call is not started with less than this left before the deadline
+MIN_CALL_MS = int(os.environ.get("CODESAGE_AI_MIN_CALL_MS", "2000"))
+
+CANCELLED = {"error": "Cancelled"}
+DEADLINE_EXCEEDED = {"error": "AI call skipped: not enough time left before the request deadline", "degraded": True}
+
+
+def _generate(prompt: str, cancel, deadline):
+    """SDK response, or CANCELLED / DEADLINE_EXCEEDED when the caller stopped waiting."""
+    if cancel is None and deadline is None:
+        return get_model().generate_content(prompt)
 
-genai.configure(api_key=API_KEY)
+    if cancel is not None and cancel.is_set():
+        metrics.increment("cancel.gemini.calls_avoided")
+        return CANCELLED
+    if deadline is not None and not deadline.allows(MIN_CALL_MS):
+        metrics.increment("deadline.gemini.calls_skipped")
+        return DEADLINE_EXCEEDED
 
-model = genai.GenerativeModel("models/gemini-flash-latest")
+    model = get_model()
+    if deadline is not None:
+        future = LANES["gemini"].start(model.generate_content, prompt, request_options={"timeout": deadline.remaining()})
+    else:
+        future = LANES["gemini"].start(model.generate_content, prompt)
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_INTERVAL)
+        except FutureTimeout:
+            if cancel is not None and cancel.is_set():
+                future.cancel()
+                metrics.increment("cancel.gemini.calls_abandoned")
+                return CANCELLED
+            if deadline is not None and deadline.expired():
+                future.cancel()
+                metrics.increment("deadline.gemini.calls_abandoned")
+                return DEADLINE_EXCEEDED
 
 
-def call_gemini(prompt: str):
+def call_gemini(prompt: str, cancel=None, deadline=None):
+    """
+    Parsed JSON answer, or {"error": ...}. The optional `cancel`
+    (threading.Event) and `deadline` (services.deadline.Deadline) end the
+    wait early with CANCELLED / DEADLINE_EXCEEDED. Raises LaneSaturated
+    when every Gemini slot is taken.
+    """
     try:
-        response = model.generate_content(prompt)
+        response = _generate(prompt, cancel, deadline)
+        if isinstance(response, dict):
+            return dict(response)
         text = response.text.strip()
 
         # Remove markdown code fences if present
@@ -26,6 +99,8 @@ def call_gemini(prompt: str):
 
         return json.loads(text)
 
+    except LaneSaturated:
+        raise
     except Exception as e:
         msg = str(e)
         if "429" in msg:
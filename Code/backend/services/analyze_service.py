@@ -1,16 +1,166 @@
-from analysis.run_all import run_static_analysis
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from analysis.aggregate import summarize_issues
+from analysis.common import check_cancelled, make_issue
+from analysis.run_all import BUDGET_BYTES, resolve_selection, run_static_analysis, selection_key, stage_estimate_ms
 from scoring.overall import overall_score
+from services.code_store import CodeRefExpired, code_ref_of, get_code, put_code
+from services.deadline import degraded
+from services.sandbox import SandboxError, run_sandboxed
+
+logger = logging.getLogger(__name__)
+
+# Bump when analyzer output changes so clients drop cached results
+ANALYSIS_VERSION = "2"
+
+# Full issue lists of truncated results, for GET /analyze/{result_id}/issues
+RESULT_CACHE_ISSUES = 200_000   # issues kept across all cached results
+_results = OrderedDict()        # result_id -> full issue list
+_results_issues = 0
+_results_lock = threading.Lock()
+
+
+def analysis_etag(code_ref: str) -> str:
+    """Strong ETag for the analysis of the code with this content hash (see services/code_store.py)."""
+    return f'"a{ANALYSIS_VERSION}-{code_ref[:32]}"'
+
+
+def _remember_issues(result_id: str, issues: list) -> None:
+    global _results_issues
+    with _results_lock:
+        if result_id in _results:
+            _results.move_to_end(result_id)
+            return
+        _results[result_id] = issues
+        _results_issues += len(issues)
+        while _results_issues > RESULT_CACHE_ISSUES and len(_results) > 1:
+            _, dropped = _results.popitem(last=False)
+            _results_issues -= len(dropped)
+
+
+def result_id_for(code_ref: str, selection: dict) -> str:
+    key = selection_key(selection)
+    return code_ref if key is None else f"{code_ref}-{key}"
+
+
+def _selection_of(result_id: str) -> tuple:
+    """result_id -> (code_ref, selection); inverse of result_id_for."""
+    code_ref, _, key = result_id.partition("-")
+    profile, _, rules = key.partition(":")
+    return code_ref, resolve_selection(profile or "full", rules.split(",") if rules else None)
+
+
+def run_analysis(code: str, selection: dict, deadline=None, cancel=None) -> dict:
+    """Static analysis plus scores: the part of analyze_full that runs in the sandbox."""
+    analysis_result = run_static_analysis(code, selection, cancel, deadline)
+    check_cancelled(cancel)
+    scores = {}
+    if selection["scores"]:
+        if deadline is None or deadline.allows(stage_estimate_ms(code, selection)):
+            scores = overall_score(code)
+        else:
+            analysis_result["skipped"].append("scores")
+    analysis_result["scores"] = scores
+    return analysis_result
 
-def analyze_full(code: str):
-    analysis_result = run_static_analysis(code)
-    scores = overall_score(code)
 
+def _aborted_analysis(error: SandboxError) -> dict:
+    """Well-formed result for a submission the sandbox could not analyze."""
     return {
-        "issues": analysis_result["issues"],
+        "issues": [make_issue(
+            issue_type="analysis-error",
+            message=f"Analysis aborted ({error.reason}): {error}",
+            line=1,
+            severity="high",
+            suggestion="Split the file or simplify deeply nested code.",
+        )],
+        "complexity": {},
+        "skipped": ["analysis"],
+        "scores": {},
+    }
+
+
+def analyze_full(code: str, selection: dict = None, cancel=None, deadline=None):
+    """
+    `selection` comes from analysis.run_all.resolve_selection (default: full
+    profile); setting `cancel` (threading.Event) aborts with AnalysisCancelled.
+    With a `deadline` (services.deadline.Deadline) stages that no longer fit
+    are skipped and listed under "degraded". The analyzers run in a sandbox
+    worker (services/sandbox.py); one that crashes or times out yields an
+    "analysis-error" issue.
+    """
+    selection = selection or resolve_selection()
+    started = time.perf_counter()
+
+    reason = "deadline"
+    try:
+        analysis_result = run_sandboxed(run_analysis, code, selection, deadline, cancel=cancel)
+    except SandboxError as e:
+        logger.warning("Sandboxed analysis failed (%s): %s", e.reason, e)
+        analysis_result, reason = _aborted_analysis(e), "sandbox"
+    skipped = analysis_result["skipped"]
+    scores = analysis_result["scores"]
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    budget_ms = selection["budget_ms"] * max(1.0, len(code) / BUDGET_BYTES)
+    if elapsed_ms > budget_ms:
+        logger.warning(
+            "Analysis profile %s took %.0f ms (budget %.0f ms, %d bytes)",
+            selection["profile"], elapsed_ms, budget_ms, len(code),
+        )
+
+    # The response carries a bounded list plus a per-template summary
+    result_id = result_id_for(code_ref_of(code), selection)
+    issues, summary = summarize_issues(analysis_result["issues"])
+    if summary["truncated"]:
+        # A degraded list is partial: the issues endpoint re-analyzes instead
+        if not skipped:
+            _remember_issues(result_id, analysis_result["issues"])
+        try:
+            put_code(code)  # lets the full list be rebuilt after eviction
+        except ValueError:
+            pass
+
+    return {
+        "issues": issues,
+        "issueSummary": {"resultId": result_id, **summary},
         "complexity": analysis_result["complexity"],
-        "qualityScore": scores["qualityScore"],
-        "readability": scores["readability"],
-        "maintainability": scores["maintainability"],
-        "style": scores["style"],
-        "documentation": scores["documentation"],
+        # Scores are None when the profile skips the scorers
+        "qualityScore": scores.get("qualityScore"),
+        "readability": scores.get("readability"),
+        "maintainability": scores.get("maintainability"),
+        "style": scores.get("style"),
+        "documentation": scores.get("documentation"),
+        "degraded": degraded(skipped, reason),
+    }
+
+
+def result_issues(result_id: str, offset: int = 0, limit: int = 100, issue_type: str = None) -> dict:
+    """One page of the full (uncapped) issue list of an analysis result."""
+    with _results_lock:
+        issues = _results.get(result_id)
+    if issues is None:
+        try:
+            code_ref, selection = _selection_of(result_id)
+            code = get_code(code_ref)
+        except (CodeRefExpired, ValueError):
+            return {"ok": False, "error": "Analysis result expired; analyze the code again"}
+        try:
+            issues = run_sandboxed(run_static_analysis, code, selection)["issues"]
+        except SandboxError as e:
+            return {"ok": False, "error": f"Analysis aborted ({e.reason}): {e}"}
+        _remember_issues(result_id, issues)
+
+    if issue_type:
+        issues = [issue for issue in issues if issue.get("type") == issue_type]
+
+    return {
+        "ok": True,
+        "result_id": result_id,
+        "total": len(issues),
+        "issues": issues[offset:offset + limit],
+        "has_more": offset + limit < len(issues),
     }
@@ -0,0 +1,79 @@
+# backend/services/cancellation.py
+"""
+Stop work for clients that went away.
+
+run_cancellable(request, name, fn, *args, **kwargs) runs
+fn(*args, **kwargs, cancel=event) in the route's lane (services/lanes.py;
+503 + Retry-After when that lane, or the Gemini lane, is saturated) while
+polling the connection. When the client disconnects (tab closed, fetch
+aborted because the user clicked again) the event is set; the pipeline
+checks it between stages (analysis.common.check_cancelled), skips or
+abandons the Gemini call (services/ai_client.py) and skips compile()
+validation. The route then answers 499 to nobody.
+
+Metrics (GET /metrics):
+- work.<name>             timing of runs that completed
+- cancel.<name>.requests  runs cancelled by a disconnect
+- cancel.<name>.saved_ms  estimated work saved: average run time minus
+                          the time already spent when the client left
+"""
+
+import asyncio
+import threading
+import time
+
+from fastapi import HTTPException, Response
+
+from analysis.common import AnalysisCancelled
+from services import metrics
+from services.lanes import LaneSaturated, route_lane
+
+POLL_INTERVAL = 0.25  # seconds between disconnect checks
+
+CLIENT_CLOSED_STATUS = 499
+
+
+def client_gone() -> Response:
+    return Response(status_code=CLIENT_CLOSED_STATUS)
+
+
+def _overloaded(e: LaneSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"code": "overloaded", "lane": e.lane, "error": str(e)},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def run_cancellable(request, name: str, fn, *args, **kwargs):
+    """fn(*args, **kwargs, cancel=event) in the route's lane; None if the client disconnected first."""
+    cancel = threading.Event()
+    started = time.perf_counter()
+    try:
+        task = route_lane(name).submit(fn, *args, cancel=cancel, **kwargs)
+    except LaneSaturated as e:
+        raise _overloaded(e)
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=POLL_INTERVAL)
+        if done:
+            break
+        if await request.is_disconnected():
+            cancel.set()
+            elapsed = (time.perf_counter() - started) * 1000
+            metrics.increment(f"cancel.{name}.requests")
+            metrics.increment(f"cancel.{name}.saved_ms", max(0.0, metrics.average_ms(f"work.{name}") - elapsed))
+            # Still queued: dropped from the lane. Running: stops at its
+            # next checkpoint; nobody waits for it
+            task.cancel()
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return None
+
+    try:
+        result = task.result()
+    except AnalysisCancelled:
+        return None
+    except LaneSaturated as e:  # every Gemini slot taken (services/ai_client.py)
+        raise _overloaded(e)
+    metrics.observe(f"work.{name}", (time.perf_counter() - started) * 1000)
+    return result
@@ -1,14 +1,11 @@
 # backend/services/clean_preview.py
 
 import logging
-import os
 from services.ai_client import call_gemini
+from services.prompts import get_prompt
 
 logger = logging.getLogger(__name__)
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-PROMPT_PATH = os.path.join(BASE_DIR, "prompts", "clean_preview.txt")
-
 
 def _safe_extract_preview(response: dict, original_code: str):
     """
@@ -43,8 +40,7 @@ def run_clean_preview(code, issues):
     """
 
     try:
-        with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-            template = f.read()
+        template = get_prompt("clean_preview")
 
         issues_text = "\n".join(
             f"- {i.get('type')}: {i.get('message')}"
@@ -0,0 +1,116 @@
+# backend/services/code_store.py
+"""
+Upload-once code handles.
+
+The client uploads a source once (PUT /blobs) and gets back its content
+hash; the analyze, AI and versions endpoints then accept that `code_ref`
+in place of the full text. Entries are content-addressed (identical
+uploads share one entry), kept in memory and bounded:
+
+- CODESAGE_CODE_STORE_BYTES  total bytes kept (default 64 MiB)
+- CODESAGE_CODE_REF_TTL      seconds since last use before a handle
+                             expires (default 3600)
+
+Least recently used entries are evicted first. An unknown or expired
+handle raises CodeRefExpired; the client re-uploads and retries.
+
+- put_code(code) -> code_ref
+- has_code(code_ref) -> bool
+- get_code(code_ref) -> str
+- resolve_code(code, code_ref) -> str
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+MAX_STORE_BYTES = int(os.environ.get("CODESAGE_CODE_STORE_BYTES", str(64 * 1024 * 1024)))
+CODE_REF_TTL = int(os.environ.get("CODESAGE_CODE_REF_TTL", "3600"))
+MAX_CODE_BYTES = 2 * 1024 * 1024  # a single upload
+
+# code_ref -> (code, size in bytes, last used)
+_store = OrderedDict()
+_store_bytes = 0
+_lock = threading.Lock()
+
+
+class CodeRefExpired(KeyError):
+    def __init__(self, code_ref: str):
+        super().__init__(code_ref)
+        self.code_ref = code_ref
+
+    def __str__(self) -> str:
+        return f"Code handle {self.code_ref} is unknown or expired; upload the code again (PUT /blobs)"
+
+
+def code_ref_of(code: str) -> str:
+    """sha256 of the UTF-8 text; clients can compute it to skip known uploads."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def _drop(code_ref: str) -> None:
+    global _store_bytes
+    _, size, _ = _store.pop(code_ref)
+    _store_bytes -= size
+
+
+def _expire(now: float) -> None:
+    # Oldest first: stop at the first entry still within its TTL
+    while _store:
+        code_ref, (_, _, used) = next(iter(_store.items()))
+        if now - used <= CODE_REF_TTL:
+            break
+        _drop(code_ref)
+
+
+def put_code(code: str) -> str:
+    global _store_bytes
+    code_ref = code_ref_of(code)
+    size = len(code.encode("utf-8"))
+    if size > MAX_CODE_BYTES:
+        raise ValueError(f"Code is larger than {MAX_CODE_BYTES} bytes")
+
+    now = time.monotonic()
+    with _lock:
+        _expire(now)
+        if code_ref in _store:
+            _drop(code_ref)
+        _store[code_ref] = (code, size, now)
+        _store_bytes += size
+        while _store_bytes > MAX_STORE_BYTES and len(_store) > 1:
+            _drop(next(iter(_store)))
+    return code_ref
+
+
+def has_code(code_ref: str) -> bool:
+    with _lock:
+        _expire(time.monotonic())
+        return code_ref in _store
+
+
+def get_code(code_ref: str) -> str:
+    now = time.monotonic()
+    with _lock:
+        _expire(now)
+        entry = _store.get(code_ref)
+        if entry is None:
+            raise CodeRefExpired(code_ref)
+        # Using a handle keeps it alive
+        _store[code_ref] = (entry[0], entry[1], now)
+        _store.move_to_end(code_ref)
+        return entry[0]
+
+
+def resolve_code(code: Optional[str], code_ref: Optional[str]) -> str:
+    """Exactly one of `code` / `code_ref`; raises ValueError or CodeRefExpired."""
+    if code_ref:
+        if code is not None:
+            raise ValueError("Send either code or code_ref, not both")
+        return get_code(code_ref)
+    if code is None:
+        raise ValueError("code or code_ref is required")
+    return code
+
@@ -0,0 +1,206 @@
+# backend/services/compression.py
+"""
+HTTP compression (ASGI middleware).
+
+Responses:
+- br (when the optional `brotli` package is installed) or gzip, chosen
+  from Accept-Encoding
+- single-body responses are compressed only at or above
+  CODESAGE_COMPRESS_MIN_BYTES (default 1024); streamed responses (NDJSON
+  export) are always compressed, flushed per chunk so lines still arrive
+  as they are produced
+- responses that already carry a Content-Encoding are left alone
+
+Requests:
+- `Content-Encoding: gzip` bodies are inflated before the route sees
+  them, capped at MAX_REQUEST_BYTES (413 beyond, 400 if corrupt)
+"""
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_SIZE = int(os.environ.get("CODESAGE_COMPRESS_MIN_BYTES", "1024"))
+MAX_REQUEST_BYTES = 16 * 1024 * 1024  # inflated request body
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _header(headers, name: bytes) -> bytes:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return b""
+
+
+def _choose_encoding(accept: bytes):
+    offered = {
+        part.split(b";")[0].strip().lower()
+        for part in accept.split(b",")
+        if not part.strip().endswith((b"q=0", b"q=0.0"))
+    }
+    if brotli is not None and b"br" in offered:
+        return "br"
+    if b"gzip" in offered:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush()
+
+
+async def _send_error(send, status: int, message: str) -> None:
+    body = ('{"detail":"%s"}' % message).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope["headers"]
+        if _header(headers, b"content-encoding").strip().lower() == b"gzip":
+            inflated = await self._inflate(receive)
+            if isinstance(inflated, tuple):
+                await _send_error(send, *inflated)
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (k, v) for k, v in headers if k.lower() not in (b"content-encoding", b"content-length")
+            ] + [(b"content-length", str(len(inflated)).encode())]
+            receive = self._replay(inflated, receive)
+
+        encoding = _choose_encoding(_header(headers, b"accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    # ---------------------------
+    # Requests
+    # ---------------------------
+
+    @staticmethod
+    async def _inflate(receive):
+        decoder = zlib.decompressobj(47)  # gzip or zlib header
+        out, size = [], 0
+        try:
+            more = True
+            while more:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return 400, "Client disconnected"
+                more = message.get("more_body", False)
+                # max_length bounds memory even for a decompression bomb
+                data = decoder.decompress(message.get("body", b""), MAX_REQUEST_BYTES + 1 - size)
+                size += len(data)
+                if size > MAX_REQUEST_BYTES or decoder.unconsumed_tail:
+                    return 413, "Request body too large"
+                out.append(data)
+            out.append(decoder.flush())
+        except zlib.error:
+            return 400, "Invalid gzip request body"
+        return b"".join(out)
+
+    @staticmethod
+    def _replay(body: bytes, upstream):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Later reads wait for the real disconnect (request.is_disconnected)
+            return await upstream()
+
+        return receive
+
+    # ---------------------------
+    # Responses
+    # ---------------------------
+
+    def _compressing_send(self, send, encoding: str):
+        start = None
+        encoder = None  # set once we decided to compress
+
+        async def wrapped(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if encoder is None and start is not False:
+                headers = start["headers"]
+                skip = (
+                    _header(headers, b"content-encoding")
+                    or start["status"] in (204, 304)
+                    or (not more and len(body) < self.minimum_size)
+                )
+                if skip:
+                    await send(start)
+                    start = False
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding)
+                headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"vary")]
+                vary = _header(start["headers"], b"vary")
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                if not more:
+                    data = encoder.finish(body)
+                    headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start, "headers": headers})
+                start = False
+                await send({"type": "http.response.body", "body": encoder.chunk(body), "more_body": True})
+                return
+
+            if encoder is None:
+                await send(message)  # pass-through response
+            elif more:
+                await send({"type": "http.response.body", "body": encoder.chunk(body), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.finish(body)})
+
+        return wrapped
@@ -0,0 +1,88 @@
+# backend/services/deadline.py
+"""
+Request-scoped deadlines.
+
+Every heavy route gets a Deadline: the caller's X-Deadline-Ms header
+(milliseconds it is still willing to wait) or the route's default from
+ROUTE_DEADLINES_MS, clamped to [MIN_DEADLINE_MS, MAX_DEADLINE_MS]. It is
+passed down explicitly (deadline=...) through analyze_full,
+run_refactor_step / run_explain_step / run_testcases_step, call_gemini
+and save_version. Each stage drops optional work when too little time is
+left and says so in the response:
+
+    "degraded": {"reason": "deadline", "skipped": ["docstrings", "scores"]}
+
+("degraded" is None when everything ran.)
+
+- request_deadline(route, header_ms) -> Deadline
+- Deadline.remaining_ms() / expired() / allows(ms)
+- degraded(skipped, reason) -> the "degraded" value for a response
+- merge_degraded(*values)   -> one "degraded" value for a multi-step route
+
+Settings (environment):
+- CODESAGE_DEADLINE_MAX_MS   (default 60000)
+"""
+
+import os
+import time
+from typing import Optional
+
+MIN_DEADLINE_MS = 100
+MAX_DEADLINE_MS = int(os.environ.get("CODESAGE_DEADLINE_MAX_MS", "60000"))
+
+# Default per route when the request sends no X-Deadline-Ms
+ROUTE_DEADLINES_MS = {
+    "analyze": 10_000,
+    "ai.refactor": 30_000,
+    "ai.explain": 30_000,
+    "ai.testcases": 30_000,
+    "ai.analyze_and_refactor": 40_000,
+    "versions.save": 10_000,
+}
+DEFAULT_DEADLINE_MS = 30_000
+
+
+class Deadline:
+    __slots__ = ("budget_ms", "expires_at")
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining_ms(self) -> float:
+        return max(0.0, (self.expires_at - time.monotonic()) * 1000)
+
+    def remaining(self) -> float:
+        """Seconds left (for timeouts)."""
+        return self.remaining_ms() / 1000
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, ms: float) -> bool:
+        """True when at least `ms` milliseconds are left."""
+        return self.remaining_ms() >= ms
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.remaining_ms():.0f} of {self.budget_ms:.0f} ms left)"
+
+
+def request_deadline(route: str, header_ms: Optional[int] = None) -> Deadline:
+    budget = header_ms if header_ms is not None else ROUTE_DEADLINES_MS.get(route, DEFAULT_DEADLINE_MS)
+    return Deadline(min(max(budget, MIN_DEADLINE_MS), MAX_DEADLINE_MS))
+
+
+def degraded(skipped, reason: str = "deadline") -> Optional[dict]:
+    return {"reason": reason, "skipped": list(skipped)} if skipped else None
+
+
+def merge_degraded(*values) -> Optional[dict]:
+    """
+    Combine the "degraded" values of several steps. Mixed reasons keep each
+    stage's own as "stage:reason" (e.g. "analysis:sandbox") under reason "mixed".
+    """
+    values = [value for value in values if value]
+    reasons = list(dict.fromkeys(value["reason"] for value in values))
+    if len(reasons) <= 1:
+        return degraded([stage for value in values for stage in value["skipped"]], *reasons)
+    return degraded([f"{stage}:{value['reason']}" for value in values for stage in value["skipped"]], "mixed")
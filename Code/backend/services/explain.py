@@ -1,10 +1,13 @@
 import logging
 from services.ai_client import call_gemini
+from services.deadline import degraded
+from services.lanes import LaneSaturated
+from services.prompts import get_prompt
 
 logger = logging.getLogger(__name__)
 
 
-def run_explain_step(code, issues):
+def run_explain_step(code, issues, cancel=None, deadline=None):
     """
     Runs AI-based code explanation.
 
@@ -12,26 +15,30 @@ def run_explain_step(code, issues):
     - explanation: str
 
     Safety guarantees:
-    - Never raises exceptions to the caller
+    - Never raises exceptions to the caller (except LaneSaturated: 503)
     - Falls back to empty explanation on failure
+    - Marked "degraded" when the request deadline left no time for the call
     """
 
     result = {}
     issues = issues or []
 
     try:
-        # Load explanation prompt template
-        with open("prompts/explain.txt", encoding="utf-8") as f:
-            template = f.read()
+        # Explanation prompt template (preloaded at startup)
+        template = get_prompt("explain")
 
         # Construct prompt
         prompt = template + "\n\nCODE TO ANALYZE:\n" + code
 
         # Call AI
-        response = call_gemini(prompt)
+        response = call_gemini(prompt, cancel, deadline)
 
         result["explanation"] = response.get("explanation", "")
+        if response.get("degraded"):
+            result["degraded"] = degraded(["ai_explain"])
 
+    except LaneSaturated:
+        raise
     except Exception:
         logger.exception("Explain step failed")
         result["explanation"] = ""
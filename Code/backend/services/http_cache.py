@@ -0,0 +1,58 @@
+# backend/services/http_cache.py
+"""
+Conditional GET helpers (ETag / If-None-Match).
+
+- etag_matches(if_none_match, etag) -> weak comparison per RFC 9110
+- not_modified(etag, cache_control) -> empty 304 carrying the validators
+- variant_etag(etag, *parts)         -> distinct ETag per representation
+- cached_json(payload, etag, cache_control) -> 200 with the same headers
+- uncached_json(payload)             -> 200 without a validator (no-store)
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+from services.responses import FastJSONResponse
+
+# Analysis results depend on the analyzer build, and a version's parent_id
+# changes when retention re-parents it (or the version is deleted): always
+# revalidate; the ETag keeps the revalidation to a 304
+REVALIDATE = "private, no-cache"
+
+# Partial (deadline-degraded) results must not be reused under the full result's ETag
+NO_STORE = "no-store"
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+
+def variant_etag(etag: str, *parts: Optional[str]) -> str:
+    """ETag of a reduced representation (fields=, compact issues) of the same resource."""
+    parts = [part for part in parts if part]
+    if not parts:
+        return etag
+    suffix = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=4).hexdigest()
+    return f'{etag[:-1]}-{suffix}"'
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def cached_json(payload, etag: str, cache_control: str) -> FastJSONResponse:
+    return FastJSONResponse(payload, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def uncached_json(payload) -> FastJSONResponse:
+    return FastJSONResponse(payload, headers={"Cache-Control": NO_STORE})
@@ -0,0 +1,164 @@
+# backend/services/lanes.py
+"""
+Admission control: separate execution lanes for cheap and slow work.
+
+Deterministic analysis (/analyze, live analysis) runs in the "fast" lane,
+Gemini-backed /ai/* work in the "slow" lane. Each lane has its own worker
+threads (concurrency) and a bounded queue, so an AI burst can no longer
+starve analysis. A lane that already holds concurrency + queue_size tasks
+rejects new work with LaneSaturated; routes answer 503 with Retry-After
+(services/cancellation.py).
+
+The "gemini" lane holds the Gemini round trips themselves (no queue). A
+call whose caller stopped waiting keeps its slot until the SDK returns
+(at the latest at the request deadline, passed as the SDK timeout), so
+abandoned calls fill the lane and new AI requests get 503 instead of
+queueing behind them.
+
+- route_lane(route)           -> Lane for a route name (ROUTE_LANES)
+- Lane.submit(fn, *a, **kw)   -> asyncio future (raises LaneSaturated)
+- Lane.start(fn, *a, **kw)    -> concurrent.futures.Future, for worker threads
+- Lane.stats()                -> running / queued / saturated / rejected
+- lane_stats()                -> stats of every lane (GET /metrics, /health)
+- stop_lanes()                -> shut the executors down (app shutdown)
+
+Settings (environment):
+- CODESAGE_LANE_FAST_CONCURRENCY   (default: CPU count)
+- CODESAGE_LANE_FAST_QUEUE         (default 64)
+- CODESAGE_LANE_SLOW_CONCURRENCY   (default 8)
+- CODESAGE_LANE_SLOW_QUEUE         (default 16)
+- CODESAGE_LANE_GEMINI_CONCURRENCY (default 8)
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services import metrics
+
+
+class LaneSaturated(Exception):
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} lane is saturated, retry in {retry_after} s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    def __init__(self, name: str, concurrency: int, queue_size: int, expected_ms: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.executor = None        # created on first use, dropped by stop()
+        self.in_flight = 0          # admitted and not finished (running + queued)
+        self.rejected = 0
+        self.avg_ms = expected_ms   # moving average of task time, for Retry-After
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.concurrency + self.queue_size
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new task has likely drained."""
+        waves = (self.in_flight - self.concurrency + 1) / self.concurrency
+        return max(1, math.ceil(max(waves, 1) * self.avg_ms / 1000))
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        return asyncio.wrap_future(self.start(fn, *args, **kwargs))
+
+    def start(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                retry_after = self.retry_after()
+                metrics.increment(f"lane.{self.name}.rejected")
+                raise LaneSaturated(self.name, retry_after)
+            self.in_flight += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"lane-{self.name}")
+            executor = self.executor
+
+        started = time.perf_counter()
+
+        def finished(_future) -> None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.avg_ms += (elapsed_ms - self.avg_ms) * 0.1
+
+        future = executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(finished)
+        return future
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self.in_flight
+            running = min(in_flight, self.concurrency)
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "running": running,
+                "queued": in_flight - running,
+                "saturated": in_flight >= self.capacity,
+                "rejected": self.rejected,
+                "avg_ms": round(self.avg_ms, 1),
+            }
+
+
+def _setting(name: str, default: int) -> int:
+    return int(os.environ.get(f"CODESAGE_LANE_{name}", str(default)))
+
+
+LANES = {
+    "fast": Lane(
+        "fast",
+        concurrency=_setting("FAST_CONCURRENCY", os.cpu_count() or 4),
+        queue_size=_setting("FAST_QUEUE", 64),
+        expected_ms=50,
+    ),
+    "slow": Lane(
+        "slow",
+        concurrency=_setting("SLOW_CONCURRENCY", 8),
+        queue_size=_setting("SLOW_QUEUE", 16),
+        expected_ms=5000,
+    ),
+    "gemini": Lane(
+        "gemini",
+        concurrency=_setting("GEMINI_CONCURRENCY", 8),
+        queue_size=0,
+        expected_ms=5000,
+    ),
+}
+
+# Route name (as used for metrics / deadlines) -> lane
+ROUTE_LANES = {
+    "analyze": "fast",
+    "analyze.live": "fast",
+    "ai.refactor": "slow",
+    "ai.explain": "slow",
+    "ai.testcases": "slow",
+    "ai.analyze_and_refactor": "slow",
+}
+
+
+def route_lane(route: str) -> Lane:
+    return LANES[ROUTE_LANES.get(route, "slow")]
+
+
+def lane_stats() -> dict:
+    return {name: lane.stats() for name, lane in LANES.items()}
+
+
+def stop_lanes() -> None:
+    for lane in LANES.values():
+        lane.stop()
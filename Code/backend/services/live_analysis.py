@@ -0,0 +1,157 @@
+# backend/services/live_analysis.py
+"""
+Live analysis over a WebSocket (/analyze/live).
+
+The editor sends every buffer change; the server analyzes once per pause
+in typing:
+
+    client -> {"type": "update", "rev": 7, "code": "...", "profile": "fast"}
+              ("code_ref" instead of "code", optional "rules", and
+               "immediate": true to skip the debounce, e.g. on save)
+    server -> {"type": "result", "rev": 7, "cached": false, "ms": 12.5,
+               "result": {... /analyze payload, compact issues ...}}
+    server -> {"type": "error", "rev": 7, "error": "...", "code": "..."}
+              (code "overloaded" carries "retry_after" seconds)
+
+- updates arriving within DEBOUNCE_MS of each other collapse into one
+  analysis of the newest revision
+- a newer revision cancels the in-flight analysis (checked between
+  stages, see analysis.common.check_cancelled); its result is never sent
+- results are cached by content hash + selection, so returning to an
+  earlier buffer (undo) is answered without analyzing; degraded results
+  (the sandbox timed out or was busy) are not cached
+- analyses run in the "fast" lane, like POST /analyze (services/lanes.py)
+
+Settings (environment):
+- CODESAGE_LIVE_DEBOUNCE_MS   (default 300)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from analysis.common import AnalysisCancelled
+from analysis.run_all import resolve_selection
+from services.analyze_service import analyze_full, result_id_for
+from services.code_store import CodeRefExpired, code_ref_of, resolve_code
+from services.lanes import LaneSaturated, route_lane
+from services.responses import dumps, shape
+
+DEBOUNCE_MS = int(os.environ.get("CODESAGE_LIVE_DEBOUNCE_MS", "300"))
+LIVE_CACHE_SIZE = 128
+
+# result_id -> shaped result, shared by all live sessions
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(result_id: str):
+    with _cache_lock:
+        result = _cache.get(result_id)
+        if result is not None:
+            _cache.move_to_end(result_id)
+        return result
+
+
+def _remember(result_id: str, result: dict) -> None:
+    with _cache_lock:
+        _cache[result_id] = result
+        if len(_cache) > LIVE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+class LiveSession:
+    def __init__(self, send_text, debounce_ms: int = DEBOUNCE_MS):
+        self.send_text = send_text
+        self.debounce = debounce_ms / 1000
+        self.pending = None                 # newest update not analyzed yet
+        self.changed = asyncio.Event()
+        self.cancel = None                  # threading.Event of the in-flight run
+        self.stats = {"updates": 0, "analyses": 0, "cached": 0, "cancelled": 0}
+
+    async def send(self, message: dict) -> None:
+        await self.send_text(dumps(message).decode("utf-8"))
+
+    async def receive(self, message) -> None:
+        """Handle one client message (called by the receive loop)."""
+        if not isinstance(message, dict) or message.get("type") != "update":
+            await self.send({"type": "error", "error": "Expected {\"type\": \"update\", ...}"})
+            return
+
+        self.stats["updates"] += 1
+        self.pending = message
+        if self.cancel is not None:
+            self.cancel.set()  # superseded
+        self.changed.set()
+
+    def close(self) -> None:
+        if self.cancel is not None:
+            self.cancel.set()
+
+    async def run(self) -> None:
+        """Worker loop: debounce, then analyze the newest revision."""
+        while True:
+            await self.changed.wait()
+            while not (self.pending or {}).get("immediate"):
+                self.changed.clear()
+                try:
+                    await asyncio.wait_for(self.changed.wait(), self.debounce)
+                except asyncio.TimeoutError:
+                    break  # a pause in typing
+            self.changed.clear()
+
+            update, self.pending = self.pending, None
+            if update is not None:
+                await self._analyze(update)
+
+    async def _analyze(self, update: dict) -> None:
+        rev = update.get("rev")
+        try:
+            selection = resolve_selection(update.get("profile") or "fast", update.get("rules"))
+            code = resolve_code(update.get("code"), update.get("code_ref"))
+        except CodeRefExpired as e:
+            await self.send({"type": "error", "rev": rev, "code": "code_ref_expired", "error": str(e)})
+            return
+        except (ValueError, TypeError) as e:
+            await self.send({"type": "error", "rev": rev, "code": "invalid_update", "error": str(e)})
+            return
+
+        started = time.perf_counter()
+        result_id = result_id_for(code_ref_of(code), selection)
+        result = _cached(result_id)
+        cached = result is not None
+
+        if not cached:
+            self.cancel = cancel = threading.Event()
+            try:
+                full = await route_lane("analyze.live").submit(analyze_full, code, selection, cancel)
+            except LaneSaturated as e:
+                await self.send({
+                    "type": "error", "rev": rev, "code": "overloaded",
+                    "error": str(e), "retry_after": e.retry_after,
+                })
+                return
+            except AnalysisCancelled:
+                self.stats["cancelled"] += 1
+                return
+            finally:
+                self.cancel = None
+            if cancel.is_set():
+                self.stats["cancelled"] += 1
+                return  # finished, but a newer revision is already waiting
+            result = shape(full, None, "compact")
+            if not full["degraded"]:  # a sandbox failure may pass on retry
+                _remember(result_id, result)
+            self.stats["analyses"] += 1
+        else:
+            self.stats["cached"] += 1
+
+        await self.send({
+            "type": "result",
+            "rev": rev,
+            "cached": cached,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "result": result,
+        })
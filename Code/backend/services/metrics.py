@@ -0,0 +1,48 @@
+# backend/services/metrics.py
+"""
+In-process counters and timings (served by GET /metrics).
+
+- increment(name, amount)  -> counters
+- observe(name, ms)        -> count / total / max of a duration
+- average_ms(name)         -> mean of an observed duration (0 if none yet)
+- snapshot()               -> everything, for the endpoint
+
+Names are dotted ("cancel.ai.refactor.requests"); values are per process.
+"""
+
+import threading
+
+_counters = {}
+_timings = {}   # name -> [count, total_ms, max_ms]
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, ms: float) -> None:
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += ms
+        timing[2] = max(timing[2], ms)
+
+
+def average_ms(name: str) -> float:
+    with _lock:
+        timing = _timings.get(name)
+    return timing[1] / timing[0] if timing and timing[0] else 0.0
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": {name: round(value, 1) for name, value in sorted(_counters.items())},
+            "timings": {
+                name: {"count": count, "avg_ms": round(total / count, 1), "max_ms": round(peak, 1)}
+                for name, (count, total, peak) in sorted(_timings.items())
+                if count
+            },
+        }
@@ -0,0 +1,41 @@
+# backend/services/prompts.py
+"""
+Prompt templates, read from prompts/*.txt once per process.
+
+load_prompts() is called from the app's lifespan hook so the first AI
+request does not pay for file I/O; get_prompt() falls back to loading on
+demand (scripts, one-off calls). Paths are resolved from this file, not
+from the working directory.
+"""
+
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPTS_DIR = os.path.join(BASE_DIR, "prompts")
+
+_prompts = {}
+_lock = threading.Lock()
+
+
+def load_prompts() -> dict:
+    """Read every template in prompts/ (file name without .txt -> text)."""
+    loaded = {}
+    for filename in sorted(os.listdir(PROMPTS_DIR)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(PROMPTS_DIR, filename), encoding="utf-8") as f:
+                loaded[filename[:-4]] = f.read()
+    with _lock:
+        _prompts.update(loaded)
+    return loaded
+
+
+def get_prompt(name: str) -> str:
+    with _lock:
+        template = _prompts.get(name)
+    if template is None:
+        with open(os.path.join(PROMPTS_DIR, f"{name}.txt"), encoding="utf-8") as f:
+            template = f.read()
+        with _lock:
+            _prompts[name] = template
+    return template
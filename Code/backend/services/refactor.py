@@ -1,15 +1,20 @@
 import logging
-import os
+from analysis.common import AnalysisCancelled
 from services.ai_client import call_gemini
+from services.deadline import degraded
+from services.lanes import LaneSaturated
+from services.prompts import get_prompt
+from services.sandbox import SandboxError, run_sandboxed
 
 logger = logging.getLogger(__name__)
 
-# Absolute path to prompts directory (VERY IMPORTANT)
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROMPT_PATH = os.path.join(BASE_DIR, "..", "prompts", "refactor.txt")
 
+def compile_source(source, cancel=None):
+    """compile() check of AI output; runs in a sandbox worker (raises on invalid code)."""
+    compile(source, "<string>", "exec")
 
-def run_refactor_step(code, issues):
+
+def run_refactor_step(code, issues, cancel=None, deadline=None):
     """
     Runs AI-based refactor step with full debugging visibility.
 
@@ -17,17 +22,21 @@ def run_refactor_step(code, issues):
     - No silent failures
     - Gemini text response handled correctly
     - Markdown fences stripped
-    - compile() validation before returning
-    - Safe fallback to original code
+    - compile() validation before returning (in a sandbox worker)
+    - Safe fallback to original code when the answer does not compile;
+      an answer the sandbox could not check is kept, marked "degraded"
+    - LaneSaturated (503) and AnalysisCancelled propagate
+    - cancel (threading.Event): skips the Gemini call / compile() once set
+    - deadline (services.deadline.Deadline): no call that cannot finish in
+      time; the original code comes back marked "degraded"
     """
 
     result = {}
     issues = issues or []
 
     try:
-        # Load prompt template
-        with open(PROMPT_PATH, encoding="utf-8") as f:
-            template = f.read()
+        # Prompt template (preloaded at startup)
+        template = get_prompt("refactor")
 
         # Build issues text
         issues_text = "\n".join(
@@ -45,12 +54,18 @@ def run_refactor_step(code, issues):
         )
 
         # Call Gemini
-        response = call_gemini(prompt)
+        response = call_gemini(prompt, cancel, deadline)
 
         if not isinstance(response, dict):
              result["refactored_code"] = code
              result["notes"] = "Invalid AI response format"
              return result
+
+        if response.get("degraded"):
+            result["refactored_code"] = code
+            result["notes"] = "AI refactor skipped — request deadline reached"
+            result["degraded"] = degraded(["ai_refactor"])
+            return result
         
         refactored_code = response.get("refactored_code", "").strip()
         raw_notes = response.get("notes", "")
@@ -69,15 +84,34 @@ def run_refactor_step(code, issues):
             result["notes"] = "AI returned empty refactor output"
             return result
 
-        # Validate generated code
+        # Client gone: nobody will read the validated result
+        if cancel is not None and cancel.is_set():
+            result["refactored_code"] = code
+            result["notes"] = "Refactor cancelled"
+            return result
+
+        # Validate generated code (a pathological answer only costs a worker)
         try:
-            compile(refactored_code, "<string>", "exec")
+            run_sandboxed(compile_source, refactored_code, cancel=cancel)
             result["refactored_code"] = refactored_code
             result["notes"] = "Refactor successful"
-        except Exception as compile_error:
+        except SandboxError as e:
+            if e.reason == "error":  # compile() raised: the answer is invalid
+                result["refactored_code"] = code
+                result["notes"] = "AI refactor invalid — fallback"
+            else:
+                # The check could not run (pool busy, timeout, crash): keep the
+                # answer, marked as unchecked
+                logger.warning("Refactor compile check skipped (%s): %s", e.reason, e)
+                result["refactored_code"] = refactored_code
+                result["notes"] = "Refactor successful (compile check skipped)"
+                result["degraded"] = degraded(["compile_check"], "sandbox")
+        except (SyntaxError, ValueError, RecursionError):  # compiled in-process (no pool)
             result["refactored_code"] = code
             result["notes"] = "AI refactor invalid — fallback"
 
+    except (LaneSaturated, AnalysisCancelled):
+        raise
     except Exception as e:
         logger.exception("Refactor step crashed")
         result["refactored_code"] = code
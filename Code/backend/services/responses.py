@@ -0,0 +1,104 @@
+# backend/services/responses.py
+"""
+Response encoding helpers.
+
+- dumps(content) / FastJSONResponse -> orjson when installed, compact json otherwise;
+                                       serializes Issue records via to_dict()
+- select_fields(payload, fields)    -> keep only the requested top-level keys
+- compact_issues(issues)            -> issues with deduplicated message templates
+- shape(payload, fields, issue_format) -> both of the above, as requested
+
+Compact issue format (opt-in with ?issue_format=compact):
+
+    {
+      "format": "compact",
+      "columns": ["type", "line", "severity", "message", "suggestion", "args"],
+      "templates": ["Variable '{}' is assigned but never used.", ...],
+      "rows": [["unused-variable", 3, "low", 0, 1, ["i"]], ...]
+    }
+
+`message` / `suggestion` index into `templates`; each '{}' is replaced by
+the next entry of `args` (the quoted names taken out of the text).
+"""
+
+import json
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+
+from analysis.common import split_message
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+COMPACT_COLUMNS = ["type", "line", "severity", "message", "suggestion", "args"]
+
+
+def _default(obj: Any):
+    # Analyzer records (analysis.common.Issue) become JSON only here
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """'issues, qualityScore' -> ['issues', 'qualityScore'] (None = everything)."""
+    if not fields:
+        return None
+    names = sorted({name.strip() for name in fields.split(",") if name.strip()})
+    return names or None
+
+
+def select_fields(payload: dict, fields: Optional[Iterable[str]]) -> dict:
+    if fields is None:
+        return payload
+    wanted = set(fields)
+    return {key: value for key, value in payload.items() if key in wanted}
+
+
+def compact_issues(issues: list) -> dict:
+    templates, index, rows = [], {}, []
+
+    def ref(template: str) -> int:
+        if template not in index:
+            index[template] = len(templates)
+            templates.append(template)
+        return index[template]
+
+    for issue in issues or []:
+        message, args = split_message(issue.get("message"))
+        suggestion, suggestion_args = split_message(issue.get("suggestion"))
+        if suggestion_args and suggestion_args != args:
+            # Rare: the suggestion quotes other names; keep it literal
+            suggestion, suggestion_args = issue.get("suggestion"), []
+        rows.append([
+            issue.get("type"),
+            issue.get("line"),
+            issue.get("severity"),
+            ref(message),
+            ref(suggestion),
+            args,
+        ])
+
+    return {"format": "compact", "columns": COMPACT_COLUMNS, "templates": templates, "rows": rows}
+
+
+def shape(payload: dict, fields: Optional[list] = None, issue_format: str = "full") -> dict:
+    payload = select_fields(payload, fields)
+    if issue_format == "compact" and isinstance(payload.get("issues"), list):
+        payload = {**payload, "issues": compact_issues(payload["issues"])}
+    return payload
@@ -0,0 +1,303 @@
+# backend/services/sandbox.py
+"""
+Sandboxed worker processes for work on untrusted code.
+
+ast.parse, the analysis rules, compile() of AI output and the semantic
+diff of saved versions run on whatever users submit. A pathological file
+can exhaust memory or the C stack; in a worker process that only costs
+the worker. The pool:
+
+- starts WORKERS processes, on a background thread so app startup does
+  not wait for them, from a forkserver that has the analysis modules
+  imported already (PRELOAD), so a new worker starts warm. Until one is
+  ready a task waits for it (within its timeout), then fails "unavailable"
+- limits each worker: RLIMIT_AS (MEMORY_MB) and RLIMIT_CPU (CPU_SECONDS
+  per task), plus a wall-clock TASK_TIMEOUT enforced by the caller
+- recycles a worker after MAX_TASKS tasks and replaces it (on a
+  background thread) after a crash, a timeout or a cancel
+- kills the worker running a task whose caller's cancel event is set
+  (AnalysisCancelled is raised to the caller)
+
+- start_sandbox() / stop_sandbox()   -> app startup / shutdown
+- run_sandboxed(fn, *args, cancel=None, timeout=None)
+      fn(*args) in a worker; SandboxError when the worker dies, times
+      out or fn raises. timeout (default TASK_TIMEOUT) covers the wait
+      for an idle worker and the task; <= 0 fails at once with reason
+      "timeout". fn must be a module-level function. Without a
+      running pool (scripts, CODESAGE_SANDBOX=0) fn(*args, cancel=cancel)
+      runs in-process instead.
+- sandbox_stats()                    -> counters for GET /metrics
+
+Settings (environment):
+- CODESAGE_SANDBOX              1 / 0 (default 1)
+- CODESAGE_SANDBOX_WORKERS      (default 2; each may use MEMORY_MB)
+- CODESAGE_SANDBOX_MAX_TASKS    tasks per worker before recycling (default 500)
+- CODESAGE_SANDBOX_TIMEOUT_S    wall-clock limit per task (default 10)
+- CODESAGE_SANDBOX_CPU_S        CPU limit per task (default 10)
+- CODESAGE_SANDBOX_MEMORY_MB    address-space limit per worker (default 1024)
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from analysis.common import AnalysisCancelled
+from services import metrics
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, timeouts still apply
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("CODESAGE_SANDBOX", "1") != "0"
+WORKERS = int(os.environ.get("CODESAGE_SANDBOX_WORKERS", "2"))
+MAX_TASKS = int(os.environ.get("CODESAGE_SANDBOX_MAX_TASKS", "500"))
+TASK_TIMEOUT = float(os.environ.get("CODESAGE_SANDBOX_TIMEOUT_S", "10"))
+CPU_SECONDS = int(os.environ.get("CODESAGE_SANDBOX_CPU_S", "10"))
+MEMORY_MB = int(os.environ.get("CODESAGE_SANDBOX_MEMORY_MB", "1024"))
+
+# Imported once in the forkserver; every worker forked from it starts warm
+PRELOAD = [
+    "services.sandbox",
+    "services.analyze_service",
+    "services.refactor",
+    "analysis.run_all",
+    "scoring.overall",
+    "diff.semantic",
+]
+
+POLL_INTERVAL = 0.05    # seconds between cancel checks while waiting
+START_TIMEOUT = 30      # seconds for a new worker to report ready
+
+
+class SandboxError(RuntimeError):
+    """The task did not produce a result (reason: timeout, crashed, unavailable, error)."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+# ---------------------------
+# Worker process
+# ---------------------------
+
+def _limit(kind, soft: int) -> None:
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(kind, (soft, hard))
+
+
+def _arm_cpu_limit() -> None:
+    """RLIMIT_CPU counts the worker's lifetime, so move it CPU_SECONDS past now."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _limit(resource.RLIMIT_CPU, math.ceil(usage.ru_utime + usage.ru_stime) + CPU_SECONDS)
+
+
+def _worker_main(conn) -> None:
+    if resource is not None:
+        _limit(resource.RLIMIT_AS, MEMORY_MB * 1024 * 1024)
+        _limit(resource.RLIMIT_CORE, 0)
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:  # recycled
+            return
+
+        fn, args = message
+        if resource is not None:
+            _arm_cpu_limit()
+        try:
+            conn.send(("ok", fn(*args)))
+        except MemoryError:
+            conn.send(("error", "MemoryError", "Memory limit exceeded"))
+            return  # the heap may be fragmented; start over in a fresh worker
+        except Exception as e:
+            conn.send(("error", type(e).__name__, str(e)))
+
+
+# ---------------------------
+# Pool
+# ---------------------------
+
+class _Worker:
+    __slots__ = ("process", "conn", "tasks")
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+        try:
+            if not self.conn.poll(START_TIMEOUT):
+                raise EOFError
+            self.conn.recv()  # ("ready", pid)
+        except (EOFError, OSError):
+            self.kill()
+            raise SandboxError("unavailable", "Sandbox worker did not start")
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def retire(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+
+class SandboxPool:
+    def __init__(self, size: int = WORKERS, max_tasks: int = MAX_TASKS, timeout: float = TASK_TIMEOUT):
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.ctx = multiprocessing.get_context(method)
+        if method == "forkserver":
+            self.ctx.set_forkserver_preload(PRELOAD)
+        self.size = size
+        self.max_tasks = max_tasks
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.stopped = False
+        self.stats = {"tasks": 0, "timeouts": 0, "crashes": 0, "cancelled": 0, "recycled": 0}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the workers off the caller's thread; run() waits for the first."""
+        def run():
+            for _ in range(self.size):
+                if self.stopped:
+                    return
+                try:
+                    worker = _Worker(self.ctx)
+                except Exception:
+                    logger.exception("Could not start a sandbox worker")
+                    continue
+                if self.stopped:
+                    worker.retire()
+                    return
+                self.idle.put(worker)
+
+        threading.Thread(target=run, name="sandbox-start", daemon=True).start()
+
+    def stop(self) -> None:
+        self.stopped = True
+        while True:
+            try:
+                self.idle.get_nowait().retire()
+            except queue.Empty:
+                return
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+        metrics.increment(f"sandbox.{name}")
+
+    def _replace(self, worker: _Worker, graceful: bool = False) -> None:
+        """Drop a worker and start its replacement off the request path."""
+        def run():
+            worker.retire() if graceful else worker.kill()
+            if self.stopped:
+                return
+            try:
+                self.idle.put(_Worker(self.ctx))
+            except Exception:
+                logger.exception("Could not start a replacement sandbox worker")
+
+        threading.Thread(target=run, name="sandbox-respawn", daemon=True).start()
+
+    def run(self, fn, args: tuple, cancel=None, timeout=None):
+        # One deadline from entry covers both the wait for a worker and the task
+        if timeout is None:
+            timeout = self.timeout
+        if timeout <= 0:
+            raise SandboxError("timeout", "No time left for the sandbox task")
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SandboxError("unavailable", "No sandbox worker available")
+
+        self._count("tasks")
+        try:
+            worker.conn.send((fn, args))
+            while not worker.conn.poll(POLL_INTERVAL):
+                if cancel is not None and cancel.is_set():
+                    self._count("cancelled")
+                    self._replace(worker)
+                    raise AnalysisCancelled()
+                if time.monotonic() > deadline:
+                    self._count("timeouts")
+                    self._replace(worker)
+                    raise SandboxError("timeout", f"Analysis exceeded {timeout:.0f} s")
+            status, *value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._count("crashes")
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            self._replace(worker)
+            raise SandboxError("crashed", f"Sandbox worker died (exit code {exitcode})")
+
+        worker.tasks += 1
+        if status == "error" and value[0] == "MemoryError":
+            self._replace(worker)  # exits after a MemoryError
+        elif worker.tasks >= self.max_tasks or self.stopped:
+            self._count("recycled")
+            self._replace(worker, graceful=True)
+        else:
+            self.idle.put(worker)
+
+        if status == "error":
+            error_type, message = value
+            raise SandboxError("error", f"{error_type}: {message}")
+        return value[0]
+
+
+_pool = None
+
+
+def start_sandbox() -> None:
+    global _pool
+    if not ENABLED or _pool is not None:
+        return
+    pool = SandboxPool()
+    pool.start()
+    _pool = pool
+
+
+def stop_sandbox() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
+
+
+def run_sandboxed(fn, *args, cancel=None, timeout=None):
+    pool = _pool
+    if pool is None:
+        return fn(*args, cancel=cancel)
+    return pool.run(fn, args, cancel=cancel, timeout=timeout)
+
+
+def sandbox_stats() -> dict:
+    pool = _pool
+    if pool is None:
+        return {"enabled": False}
+    with pool._lock:
+        stats = dict(pool.stats)
+    return {"enabled": True, "workers": pool.size, "idle": pool.idle.qsize(), **stats}
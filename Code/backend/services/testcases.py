@@ -1,25 +1,31 @@
 import logging
 from services.ai_client import call_gemini
+from services.deadline import degraded
+from services.lanes import LaneSaturated
+from services.prompts import get_prompt
 
 logger = logging.getLogger(__name__)
 
-def run_testcases_step(refactored_code, issues):
+def run_testcases_step(refactored_code, issues, cancel=None, deadline=None):
     result = {}
 
     try:
-        with open("prompts/testcases.txt") as f:
-            template = f.read()
+        template = get_prompt("testcases")
 
         prompt = template + f"\n\nCODE TO TEST:\n{refactored_code}"
-        response = call_gemini(prompt)
+        response = call_gemini(prompt, cancel, deadline)
 
         if isinstance(response, list):
             result["test_cases"] = response
         elif isinstance(response, dict):
             result["test_cases"] = response.get("test_cases", [])
+            if response.get("degraded"):
+                result["degraded"] = degraded(["ai_testcases"])
         else:
             result["test_cases"] = []
 
+    except LaneSaturated:
+        raise
     except:
         logger.exception("Testcase generation failed")
         result["test_cases"] = []
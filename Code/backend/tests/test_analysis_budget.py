@@ -0,0 +1,66 @@
+import statistics
+import time
+
+import pytest
+
+from analysis.run_all import BUDGET_BYTES, PROFILES, resolve_selection
+from complexity import cfg
+from services.analyze_service import run_analysis
+
+# budget_ms is the target on a developer machine; shared CI runners get
+# this much headroom before the test fails
+HEADROOM = 2.0
+RUNS = 7
+
+_UNIT = '''
+class Widget{i}:
+    """Widget number {i}."""
+
+    def __init__(self, items):
+        self.items = list(items)
+
+    def total(self, limit=None):
+        result = 0
+        for item in self.items:
+            if limit is not None and item > limit:
+                continue
+            for part in range(item):
+                if part % 3 == 0 and part:
+                    result += part
+        return result
+
+
+def helper_{i}(values):
+    seen = set()
+    for value in values:
+        if value in seen:
+            return value
+        seen.add(value)
+    return None
+'''
+
+
+def _source(size):
+    """Ordinary classes, loops and branches, BUDGET_BYTES long."""
+    parts, length, i = [], 0, 0
+    while length < size:
+        parts.append(_UNIT.format(i=i))
+        length += len(parts[-1])
+        i += 1
+    return "".join(parts)[:size].rsplit("\n\n\n", 1)[0] + "\n"
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_profile_meets_its_budget(profile):
+    code = _source(BUDGET_BYTES)
+    selection = resolve_selection(profile)
+
+    timings = []
+    for _ in range(RUNS):
+        cfg.clear_cache()  # cold: every unit is new, as on first load
+        started = time.perf_counter()
+        result = run_analysis(code, selection)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    assert result["skipped"] == []
+    assert statistics.median(timings) < PROFILES[profile]["budget_ms"] * HEADROOM
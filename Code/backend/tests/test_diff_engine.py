@@ -0,0 +1,44 @@
+import difflib
+import time
+
+from diff.engine import diff_opcodes, diff_texts
+
+
+def _apply(old_lines, new_lines, opcodes):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            assert old_lines[i1:i2] == new_lines[j1:j2]
+            out += old_lines[i1:i2]
+        else:
+            out += new_lines[j1:j2]
+    return out
+
+
+def test_strided_deletions_stay_minimal_and_fast():
+    # Every 7th of 5000 unique lines deleted: all anchors are equally rare,
+    # so a left-biased tie-break recursed one run at a time into the timeout
+    old = "".join(f"line {i}\n" for i in range(5000))
+    new = "".join(f"line {i}\n" for i in range(5000) if i % 7)
+
+    started = time.monotonic()
+    result = diff_texts(old, new)
+    elapsed = time.monotonic() - started
+
+    assert (result["added"], result["removed"]) == (0, 715)
+    assert elapsed < 1.0
+
+
+def test_opcodes_rebuild_new_text():
+    old = [f"{i % 13}\n" for i in range(300)]
+    new = list(old)
+    del new[40:45]
+    new[100:100] = ["inserted\n"] * 3
+    new[200] = "changed\n"
+
+    opcodes = diff_opcodes(old, new)
+    assert _apply(old, new, opcodes) == new
+
+    changed = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag != "equal")
+    baseline = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+    assert changed <= sum(i2 - i1 for tag, i1, i2, _, _ in baseline if tag != "equal")
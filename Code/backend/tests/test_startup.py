@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measured ~0.3 s (mostly FastAPI); generous so slow CI machines pass
+IMPORT_BUDGET_S = 3.0
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "modules": [name for name in sys.modules if name.startswith("google")],
+}))
+"""
+
+
+def _import_main():
+    # A fresh interpreter: this test process may have imported anything already
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_main_is_cheap_and_skips_the_ai_sdk():
+    probe = _import_main()
+
+    assert "google.generativeai" not in probe["modules"]
+    assert probe["seconds"] < IMPORT_BUDGET_S
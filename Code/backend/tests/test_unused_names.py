@@ -0,0 +1,20 @@
+from analysis.unused_imports import rule_unused_names
+
+
+def _reported(code):
+    return {(issue["type"], issue["message"].split("'")[1]) for issue in rule_unused_names(code)}
+
+
+def test_dotted_import_binds_its_first_name():
+    assert _reported("import os.path\nprint(os.path.join('a', 'b'))\n") == set()
+    assert _reported("import os.path\n") == {("unused-import", "os")}
+
+
+def test_in_place_update_is_not_a_use():
+    code = "def f():\n    total = 0\n    total += 1\n    count = 0\n    count += 1\n    return count\n"
+    assert _reported(code) == {("unused-variable", "total")}
+
+
+def test_class_body_names_are_attributes():
+    code = "class Config:\n    debug = False\n\n    def enabled(self):\n        return self.debug\n"
+    assert _reported(code) == set()
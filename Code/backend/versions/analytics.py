@@ -0,0 +1,199 @@
+"""
+Quality Analytics
+
+Issues and key metrics of every version are written at save time to two
+normalized, indexed tables, so trends are answered by SQL GROUP BY rather
+than by loading and parsing each version's JSON:
+
+- version_issues  (version_id, session_id, type, severity, line, count)
+- version_metrics (version_id, session_id, created_at, quality_score,
+                   complexity_score, nesting_depth, loop_depth, big_o,
+                   issue_count)
+
+The JSON columns on version_history stay the source of truth for
+get_version; these tables are derived from them. Saved issue lists are
+capped (analysis/aggregate.py), so a save may also pass the analysis'
+exact per-(type, severity) counts: the issues beyond the list are stored
+as one row per pair with line NULL and `count` set, and every query sums
+`count`.
+"""
+
+import sqlite3
+from typing import Any, Optional
+
+from versions.db import connection
+
+
+def _number(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def extract_metrics(complexity: Any) -> dict:
+    """
+    Accepts both complexity shapes the client saves: the raw analyzer
+    output ({nesting: {...}, loops: {...}, big_o, score}) and the
+    normalized one from /ai/analyze-and-refactor ({nestingDepth, loopDepth, bigO, score}).
+    """
+    complexity = complexity if isinstance(complexity, dict) else {}
+    nesting = complexity.get("nesting") if isinstance(complexity.get("nesting"), dict) else {}
+    loops = complexity.get("loops") if isinstance(complexity.get("loops"), dict) else {}
+
+    big_o = complexity.get("big_o", complexity.get("bigO"))
+    return {
+        "complexity_score": _number(complexity.get("score")),
+        "nesting_depth": _number(nesting.get("max_nesting_depth", complexity.get("nestingDepth"))),
+        "loop_depth": _number(loops.get("max_loop_depth", complexity.get("loopDepth"))),
+        "big_o": big_o if isinstance(big_o, str) and big_o != "—" else None,
+    }
+
+
+def _issue_key(issue: dict) -> tuple:
+    return str(issue.get("type") or "unknown"), str(issue.get("severity") or "low")
+
+
+def _issue_rows(version_id: int, session_id: str, issues: Any, issue_counts: Any = None) -> list:
+    rows = []
+    listed = {}
+    for issue in issues if isinstance(issues, list) else []:
+        if not isinstance(issue, dict):
+            continue
+        key = _issue_key(issue)
+        listed[key] = listed.get(key, 0) + 1
+        line = issue.get("line")
+        rows.append((version_id, session_id, *key, line if isinstance(line, int) else None, 1))
+
+    # Issues the capped list left out, from the exact totals
+    for entry in issue_counts if isinstance(issue_counts, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        count = entry.get("count")
+        if not isinstance(count, int) or isinstance(count, bool):
+            continue
+        key = _issue_key(entry)
+        missing = count - listed.get(key, 0)
+        if missing > 0:
+            rows.append((version_id, session_id, *key, None, missing))
+            listed[key] = count
+    return rows
+
+
+# ---------------------------
+# Maintenance (inside the caller's transaction)
+# ---------------------------
+
+def record_analysis(cur, version_id: int, session_id: str, created_at: str,
+                    issues: Any, complexity: Any, quality_score: Optional[int],
+                    issue_counts: Any = None) -> None:
+    rows = _issue_rows(version_id, session_id, issues, issue_counts)
+    if rows:
+        cur.executemany(
+            "INSERT INTO version_issues (version_id, session_id, type, severity, line, count) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    metrics = extract_metrics(complexity)
+    cur.execute("""
+        INSERT OR REPLACE INTO version_metrics (
+            version_id, session_id, created_at, quality_score,
+            complexity_score, nesting_depth, loop_depth, big_o, issue_count
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        version_id, session_id, created_at, _number(quality_score),
+        metrics["complexity_score"], metrics["nesting_depth"], metrics["loop_depth"],
+        metrics["big_o"], sum(row[-1] for row in rows),
+    ))
+
+
+def forget_version(cur, version_id: int) -> None:
+    cur.execute("DELETE FROM version_issues WHERE version_id = ?", (version_id,))
+    cur.execute("DELETE FROM version_metrics WHERE version_id = ?", (version_id,))
+
+
+def forget_session(cur, session_id: str) -> None:
+    cur.execute("DELETE FROM version_issues WHERE session_id = ?", (session_id,))
+    cur.execute("DELETE FROM version_metrics WHERE session_id = ?", (session_id,))
+
+
+# ---------------------------
+# Trend queries
+# ---------------------------
+
+def issue_trend(session_id: str, issue_type: Optional[str] = None, *, db_path: str) -> dict:
+    """Issue counts per type for every version of the session (oldest first)."""
+    type_filter, params = "", [session_id]
+    if issue_type:
+        # Filter in the join so versions without that issue still appear
+        type_filter, params = "AND i.type = ?", [issue_type, session_id]
+
+    with connection(db_path) as conn:
+        try:
+            rows = conn.execute(f"""
+                SELECT m.version_id, m.created_at, i.type, SUM(i.count) AS count
+                FROM version_metrics m
+                LEFT JOIN version_issues i
+                    ON i.version_id = m.version_id {type_filter}
+                WHERE m.session_id = ?
+                GROUP BY m.version_id, i.type
+                ORDER BY m.created_at ASC, m.version_id ASC
+            """, params).fetchall()
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
+
+    points = []
+    for r in rows:
+        if not points or points[-1]["version_id"] != r["version_id"]:
+            points.append({"version_id": r["version_id"], "created_at": r["created_at"], "counts": {}})
+        if r["type"] is not None:
+            points[-1]["counts"][r["type"]] = r["count"]
+
+    return {"ok": True, "session_id": session_id, "type": issue_type, "points": points}
+
+
+def quality_trend(session_id: str, *, db_path: str) -> dict:
+    with connection(db_path) as conn:
+        try:
+            rows = conn.execute("""
+                SELECT version_id, created_at, quality_score, complexity_score,
+                       nesting_depth, loop_depth, big_o, issue_count
+                FROM version_metrics
+                WHERE session_id = ?
+                ORDER BY created_at ASC, version_id ASC
+            """, (session_id,)).fetchall()
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
+
+    return {"ok": True, "session_id": session_id, "points": [dict(r) for r in rows]}
+
+
+def issue_summary(session_id: str, *, db_path: str) -> dict:
+    """Totals per (type, severity) over the session, plus score range."""
+    with connection(db_path) as conn:
+        try:
+            by_type = conn.execute("""
+                SELECT type, severity, SUM(count) AS count,
+                       COUNT(DISTINCT version_id) AS versions
+                FROM version_issues
+                WHERE session_id = ?
+                GROUP BY type, severity
+                ORDER BY count DESC
+            """, (session_id,)).fetchall()
+
+            scores = conn.execute("""
+                SELECT COUNT(*) AS versions,
+                       MIN(quality_score) AS min_quality,
+                       MAX(quality_score) AS max_quality,
+                       AVG(quality_score) AS avg_quality,
+                       AVG(issue_count) AS avg_issues
+                FROM version_metrics
+                WHERE session_id = ?
+            """, (session_id,)).fetchone()
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
+
+    return {
+        "ok": True,
+        "session_id": session_id,
+        "by_type": [dict(r) for r in by_type],
+        **dict(scores),
+    }
@@ -0,0 +1,262 @@
+"""
+Content-Addressed Blob Storage
+
+Version snapshots (original code, refactored code, diff text) are stored
+once per distinct content in the `blobs` table:
+
+- hash      -> sha256 of the UTF-8 text (primary key)
+- data      -> zlib-compressed bytes (full text or a line delta)
+- base_hash -> blob the delta applies to (NULL for keyframes)
+- depth     -> delta chain length down to the nearest keyframe
+- refcount  -> version columns and deltas pointing at the blob
+
+A new snapshot is stored as a line delta against its base when that is
+smaller than the full text, and as a full keyframe every KEYFRAME_INTERVAL
+links so reconstruction never replays more than that many deltas.
+Reconstructed texts are kept in a bounded LRU cache keyed by hash.
+
+All helpers take a cursor so they run inside the caller's transaction.
+prepare_blob() is the exception: it does the CPU work (hash, zlib,
+line delta) without touching the database, so save_version can run it
+before its write reaches the writer thread; store_blob() then only
+INSERTs / bumps refcounts.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from diff.engine import diff_opcodes
+
+CODEC = "zlib"
+DELTA_CODEC = "zlib-delta"
+COMPRESSION_LEVEL = 6
+
+KEYFRAME_INTERVAL = int(os.environ.get("CODESAGE_KEYFRAME_INTERVAL", "16"))
+TEXT_CACHE_BYTES = 16 * 1024 * 1024
+
+_text_cache = OrderedDict()
+_text_cache_size = 0
+_text_cache_lock = threading.Lock()
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# Reconstruction cache
+# ---------------------------
+
+def _cache_get(digest: str) -> Optional[str]:
+    with _text_cache_lock:
+        text = _text_cache.get(digest)
+        if text is not None:
+            _text_cache.move_to_end(digest)
+        return text
+
+
+def _cache_put(digest: str, text: str) -> None:
+    global _text_cache_size
+
+    with _text_cache_lock:
+        if digest in _text_cache or len(text) > TEXT_CACHE_BYTES:
+            return
+        _text_cache[digest] = text
+        _text_cache_size += len(text)
+        while _text_cache_size > TEXT_CACHE_BYTES:
+            _, evicted = _text_cache.popitem(last=False)
+            _text_cache_size -= len(evicted)
+
+
+# ---------------------------
+# Encoding
+# ---------------------------
+
+def _encode(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def make_delta(base: str, text: str) -> list:
+    """
+    Line delta turning `base` into `text`:
+      [0, start, end] -> copy base lines[start:end]
+      [1, "lines"]    -> insert literal text
+    """
+    base_lines = base.splitlines(keepends=True)
+    new_lines = text.splitlines(keepends=True)
+
+    ops = []
+    for tag, i1, i2, j1, j2 in diff_opcodes(base_lines, new_lines):
+        if tag == "equal":
+            ops.append([0, i1, i2])
+        elif j2 > j1:
+            ops.append([1, "".join(new_lines[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == 0:
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def _decode(codec: str, data: bytes) -> str:
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if codec == "raw":
+        return bytes(data).decode("utf-8")
+    raise ValueError(f"Unknown blob codec '{codec}'")
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+
+def prepare_blob(text: Optional[str], base: Optional[str] = None,
+                 base_text: Optional[str] = None) -> Optional[dict]:
+    """
+    Hash and encode `text` without touching the database (runs outside
+    the write transaction). With `base` / `base_text` (a blob read
+    beforehand) the line delta against it is kept when it is smaller.
+    """
+    if text is None:
+        return None
+
+    digest = blob_hash(text)
+    prepared = {"hash": digest, "text": text, "data": _encode(text), "base": None, "delta": None}
+
+    if base is not None and base_text is not None and base != digest:
+        delta = zlib.compress(
+            json.dumps(make_delta(base_text, text), separators=(",", ":")).encode("utf-8"),
+            COMPRESSION_LEVEL,
+        )
+        if len(delta) < len(prepared["data"]):
+            prepared["base"], prepared["delta"] = base, delta
+    return prepared
+
+
+def store_blob(cur, prepared: Optional[dict]) -> Optional[str]:
+    """Store a prepare_blob() result (or add a reference to the existing copy); returns its hash."""
+    if prepared is None:
+        return None
+
+    digest = prepared["hash"]
+
+    cur.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+    if cur.rowcount:
+        return digest
+
+    codec, data, base_hash, depth = CODEC, prepared["data"], None, 0
+
+    base = prepared["base"]
+    if base is not None:
+        # The delta was computed before this transaction: the base may have
+        # been released since, or its chain grown past the keyframe interval
+        cur.execute("SELECT depth FROM blobs WHERE hash = ?", (base,))
+        row = cur.fetchone()
+        if row is not None and row["depth"] + 1 < KEYFRAME_INTERVAL:
+            codec, data, base_hash, depth = DELTA_CODEC, prepared["delta"], base, row["depth"] + 1
+            cur.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (base,))
+
+    cur.execute(
+        "INSERT INTO blobs (hash, codec, size, data, refcount, base_hash, depth) VALUES (?, ?, ?, ?, 1, ?, ?)",
+        (digest, codec, len(prepared["text"]), data, base_hash, depth)
+    )
+    _cache_put(digest, prepared["text"])
+    return digest
+
+
+def delta_base(cur, base: Optional[str]) -> Optional[str]:
+    """Text of `base` if a new delta may still point at it (None: store a keyframe)."""
+    if base is None:
+        return None
+    cur.execute("SELECT depth FROM blobs WHERE hash = ?", (base,))
+    row = cur.fetchone()
+    # Keyframe every KEYFRAME_INTERVAL links bounds reconstruction cost
+    if row is None or row["depth"] + 1 >= KEYFRAME_INTERVAL:
+        return None
+    return get_blob(cur, base)
+
+
+def put_blob(cur, text: Optional[str], base: Optional[str] = None) -> Optional[str]:
+    """
+    Store `text` (or add a reference to the existing copy); returns its hash.
+    `base` is the hash of a similar blob (e.g. the parent version) to delta against.
+    """
+    if text is None:
+        return None
+
+    digest = blob_hash(text)
+
+    cur.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+    if cur.rowcount:
+        return digest  # skip encoding entirely
+
+    base_text = delta_base(cur, base) if base != digest else None
+    return store_blob(cur, prepare_blob(text, base, base_text))
+
+
+def get_blob(cur, digest: Optional[str]) -> Optional[str]:
+    if digest is None:
+        return None
+
+    cached = _cache_get(digest)
+    if cached is not None:
+        return cached
+
+    # Walk down to a keyframe (or a cached ancestor), then replay deltas
+    chain = []
+    current = digest
+    text = None
+    while current is not None:
+        cached = _cache_get(current)
+        if cached is not None:
+            text = cached
+            break
+
+        cur.execute("SELECT codec, data, base_hash FROM blobs WHERE hash = ?", (current,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+
+        if row["codec"] == DELTA_CODEC:
+            chain.append((current, row["data"]))
+            current = row["base_hash"]
+        else:
+            text = _decode(row["codec"], row["data"])
+            _cache_put(current, text)
+            break
+
+    if text is None:
+        return None
+
+    for link_hash, data in reversed(chain):
+        text = apply_delta(text, json.loads(zlib.decompress(data)))
+        _cache_put(link_hash, text)
+
+    return text
+
+
+def release_blob(cur, digest: Optional[str]) -> None:
+    """Drop one reference; the blob is deleted when nothing points at it."""
+    while digest is not None:
+        cur.execute("UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?", (digest,))
+        cur.execute("SELECT refcount, base_hash FROM blobs WHERE hash = ?", (digest,))
+        row = cur.fetchone()
+        if row is None or row["refcount"] > 0:
+            return
+
+        cur.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+
+        # A deleted delta no longer holds its base
+        digest = row["base_hash"]
@@ -0,0 +1,119 @@
+"""
+SQLite Connection Management
+
+Provides:
+- open_connection(db_path): one tuned connection (used by the writer thread)
+- ConnectionPool: bounded, thread-safe pool of tuned connections
+- connection(db_path): context manager that borrows a pooled connection
+- close_all(): close every pool (app shutdown)
+
+Every connection is opened in WAL mode with tuned pragmas so readers
+never block the writer and page reads hit the cache / mmap first.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+POOL_SIZE = int(os.environ.get("CODESAGE_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = 30  # seconds to wait for a free connection
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8192",        # 8 MiB page cache
+    "PRAGMA mmap_size = 67108864",      # 64 MiB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+)
+
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """A standalone tuned connection (pooled ones are made the same way)."""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._all = []
+
+    def _connect(self) -> sqlite3.Connection:
+        return open_connection(self.db_path)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                conn = self._connect()
+                self._created += 1
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Database connection pool exhausted")
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue(maxsize=self.size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = ConnectionPool(db_path)
+                _pools[db_path] = pool
+    return pool
+
+
+@contextmanager
+def connection(db_path: str):
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
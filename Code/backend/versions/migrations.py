@@ -0,0 +1,329 @@
+"""
+Versioned Schema Migrations
+
+Each migration runs once, inside its own transaction, and bumps
+`PRAGMA user_version`. Append new migrations to MIGRATIONS - never edit
+one that has shipped. A migration works on the schema as it was when it
+shipped, so it carries frozen copies of the SQL and helpers it needs
+instead of calling live code that later migrations change.
+"""
+
+import hashlib
+import json
+import sqlite3
+import zlib
+
+
+def _m001_base_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS code_sessions (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            created_at TEXT
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS version_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            parent_id INTEGER,
+            original_code TEXT,
+            refactored_code TEXT,
+            diff TEXT,
+            diff_summary TEXT,
+            issues TEXT,
+            complexity TEXT,
+            quality_score INTEGER,
+            created_at TEXT,
+            FOREIGN KEY(session_id) REFERENCES code_sessions(id),
+            FOREIGN KEY(parent_id) REFERENCES version_history(id)
+        )
+    """)
+
+
+def _m002_history_index_and_head(cur):
+    # created_at is ISO-8601 UTC, so plain text order is chronological
+    # and (session_id, created_at, rowid) serves the history listing.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_version_history_session_created
+        ON version_history(session_id, created_at)
+    """)
+
+    # Per-session head pointer: parent lookup on save is a primary-key read
+    cur.execute("ALTER TABLE code_sessions ADD COLUMN head_version_id INTEGER")
+    cur.execute("""
+        UPDATE code_sessions SET head_version_id = (
+            SELECT v.id FROM version_history v
+            WHERE v.session_id = code_sessions.id
+            ORDER BY v.created_at DESC, v.id DESC
+            LIMIT 1
+        )
+    """)
+
+
+def _m003_content_addressed_blobs(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    cur.execute("ALTER TABLE version_history ADD COLUMN original_hash TEXT")
+    cur.execute("ALTER TABLE version_history ADD COLUMN refactored_hash TEXT")
+    cur.execute("ALTER TABLE version_history ADD COLUMN diff_hash TEXT")
+
+    # Frozen copy of the original blob writer (later schema changes must not leak in)
+    def put_blob(cur, text):
+        if text is None:
+            return None
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cur.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+        if cur.rowcount == 0:
+            cur.execute(
+                "INSERT INTO blobs (hash, codec, size, data, refcount) VALUES (?, 'zlib', ?, ?, 1)",
+                (digest, len(text), zlib.compress(text.encode("utf-8"), 6))
+            )
+        return digest
+
+    # Move existing snapshots into blobs and drop the inline copies
+    rows = cur.execute(
+        "SELECT id, original_code, refactored_code, diff FROM version_history"
+    ).fetchall()
+    for row in rows:
+        cur.execute("""
+            UPDATE version_history
+            SET original_hash = ?, refactored_hash = ?, diff_hash = ?,
+                original_code = NULL, refactored_code = NULL, diff = NULL
+            WHERE id = ?
+        """, (
+            put_blob(cur, row["original_code"]),
+            put_blob(cur, row["refactored_code"]),
+            put_blob(cur, row["diff"] or None),
+            row["id"],
+        ))
+
+
+def _m004_delta_chains(cur):
+    cur.execute("ALTER TABLE blobs ADD COLUMN base_hash TEXT")
+    cur.execute("ALTER TABLE blobs ADD COLUMN depth INTEGER NOT NULL DEFAULT 0")
+
+
+def _m005_semantic_diff(cur):
+    cur.execute("ALTER TABLE version_history ADD COLUMN semantic_diff TEXT")
+
+
+def _m006_parent_index(cur):
+    # Retention re-parents children of pruned versions
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_version_history_parent
+        ON version_history(parent_id)
+    """)
+
+
+def _m007_code_search(cur):
+    try:
+        cur.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS version_search USING fts5(
+                original, refactored,
+                content = '',
+                tokenize = "unicode61 tokenchars '_'"
+            )
+        """)
+    except sqlite3.OperationalError:
+        return  # SQLite without FTS5: search stays disabled
+
+    # Frozen copy of the blob reader at schema 6 (keyframes + zlib line deltas)
+    def get_blob(cur, digest):
+        chain = []
+        while digest is not None:
+            row = cur.execute("SELECT codec, data, base_hash FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            if row["codec"] != "zlib-delta":
+                break
+            chain.append(row["data"])
+            digest = row["base_hash"]
+        if digest is None:
+            return None
+
+        data = row["data"]
+        text = (zlib.decompress(data) if row["codec"] == "zlib" else bytes(data)).decode("utf-8")
+        for delta in reversed(chain):
+            lines = text.splitlines(keepends=True)
+            text = "".join(
+                "".join(lines[op[1]:op[2]]) if op[0] == 0 else op[1]
+                for op in json.loads(zlib.decompress(delta))
+            )
+        return text
+
+    rows = cur.execute(
+        "SELECT id, original_hash, refactored_hash FROM version_history"
+    ).fetchall()
+    for row in rows:
+        cur.execute(
+            "INSERT INTO version_search (rowid, original, refactored) VALUES (?, ?, ?)",
+            (row["id"], get_blob(cur, row["original_hash"]) or "", get_blob(cur, row["refactored_hash"]) or "")
+        )
+
+
+def _m008_quality_analytics(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS version_issues (
+            id INTEGER PRIMARY KEY,
+            version_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            line INTEGER
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_version_issues_session_type
+        ON version_issues(session_id, type, version_id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_version_issues_version
+        ON version_issues(version_id, type)
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS version_metrics (
+            version_id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            created_at TEXT,
+            quality_score REAL,
+            complexity_score REAL,
+            nesting_depth INTEGER,
+            loop_depth INTEGER,
+            big_o TEXT,
+            issue_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_version_metrics_session_created
+        ON version_metrics(session_id, created_at)
+    """)
+
+    # Frozen copy of the schema-8 analytics writer (issue rows, metrics)
+    def number(value):
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+    def load(value):
+        try:
+            return json.loads(value) if value else None
+        except ValueError:
+            return None
+
+    def record_analysis(cur, version_id, session_id, created_at, issues, complexity, quality_score):
+        rows = []
+        for issue in issues if isinstance(issues, list) else []:
+            if not isinstance(issue, dict):
+                continue
+            line = issue.get("line")
+            rows.append((
+                version_id,
+                session_id,
+                str(issue.get("type") or "unknown"),
+                str(issue.get("severity") or "low"),
+                line if isinstance(line, int) else None,
+            ))
+        if rows:
+            cur.executemany(
+                "INSERT INTO version_issues (version_id, session_id, type, severity, line) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+        complexity = complexity if isinstance(complexity, dict) else {}
+        nesting = complexity.get("nesting") if isinstance(complexity.get("nesting"), dict) else {}
+        loops = complexity.get("loops") if isinstance(complexity.get("loops"), dict) else {}
+        big_o = complexity.get("big_o", complexity.get("bigO"))
+        cur.execute("""
+            INSERT OR REPLACE INTO version_metrics (
+                version_id, session_id, created_at, quality_score,
+                complexity_score, nesting_depth, loop_depth, big_o, issue_count
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            version_id, session_id, created_at, number(quality_score),
+            number(complexity.get("score")),
+            number(nesting.get("max_nesting_depth", complexity.get("nestingDepth"))),
+            number(loops.get("max_loop_depth", complexity.get("loopDepth"))),
+            big_o if isinstance(big_o, str) and big_o != "—" else None,
+            len(rows),
+        ))
+
+    # Backfill from the JSON columns
+    rows = cur.execute("""
+        SELECT id, session_id, created_at, issues, complexity, quality_score
+        FROM version_history
+    """).fetchall()
+    for row in rows:
+        record_analysis(
+            cur, row["id"], row["session_id"], row["created_at"],
+            load(row["issues"]), load(row["complexity"]), row["quality_score"],
+        )
+
+
+def _m009_issue_counts(cur):
+    # One row can stand for several issues: the ones the capped issue list
+    # of a save left out (line is NULL for those)
+    cur.execute("ALTER TABLE version_issues ADD COLUMN count INTEGER NOT NULL DEFAULT 1")
+
+
+def _m010_search_merge_policy(cur):
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'version_search'").fetchone() is None:
+        return  # no FTS5
+    # Fewer merges inside saves (compaction merges instead); index pages
+    # that fill a 4 KB database page
+    cur.execute("INSERT INTO version_search (version_search, rank) VALUES ('automerge', 8)")
+    cur.execute("INSERT INTO version_search (version_search, rank) VALUES ('pgsz', 4050)")
+
+
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "history index and session head pointer", _m002_history_index_and_head),
+    (3, "content-addressed blob storage", _m003_content_addressed_blobs),
+    (4, "delta chains with keyframes", _m004_delta_chains),
+    (5, "definition-level semantic diff", _m005_semantic_diff),
+    (6, "parent index for retention", _m006_parent_index),
+    (7, "FTS5 code search index", _m007_code_search),
+    (8, "normalized issue and metric tables", _m008_quality_analytics),
+    (9, "issue counts beyond the capped list", _m009_issue_counts),
+    (10, "FTS merge policy", _m010_search_merge_policy),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations; returns the resulting schema version."""
+    version = current_version(conn)
+
+    for number, _, apply in MIGRATIONS:
+        if number <= version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have migrated while we waited for the lock
+            version = current_version(conn)
+            if number <= version:
+                conn.commit()
+                continue
+
+            apply(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+
+    return version
@@ -0,0 +1,309 @@
+"""
+Retention & Compaction
+
+A background job keeps versions.db bounded:
+
+1. max versions per session  -> oldest versions beyond the limit are pruned
+2. max age                   -> versions older than the cutoff are pruned;
+                                sessions left empty are dropped
+3. global byte cap           -> oldest non-head versions (any session) are
+                                pruned until the live data fits (stops early
+                                when a round frees nothing)
+
+Pruning goes through versions.remove_versions, so children are re-parented
+and chains stay intact, and deletes are queued on the group-commit writer
+in small chunks so saves are never blocked for long. Deletes from the
+contentless FTS index are only tombstones, so the index is optimized
+after pruning (and before the byte cap is measured); every pass also runs
+a bounded FTS 'merge' (see versions/search.py for the index cost). Afterwards freed
+pages are returned to the filesystem with an incremental vacuum.
+
+Settings (environment, 0 disables a limit):
+- CODESAGE_RETENTION_MAX_VERSIONS   per session (default 200)
+- CODESAGE_RETENTION_MAX_AGE_DAYS   (default 90)
+- CODESAGE_RETENTION_MAX_BYTES      (default 256 MiB, 64 MiB on Render)
+- CODESAGE_COMPACTION_INTERVAL      seconds between runs (default 600)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from versions.db import connection, open_connection
+from versions.search import merge_index, optimize_index
+from versions.versions import DEFAULT_DB_PATH, IS_RENDER, remove_versions
+from versions.writer import get_writer
+
+MAX_VERSIONS_PER_SESSION = int(os.environ.get("CODESAGE_RETENTION_MAX_VERSIONS", "200"))
+MAX_AGE_DAYS = int(os.environ.get("CODESAGE_RETENTION_MAX_AGE_DAYS", "90"))
+MAX_BYTES = int(os.environ.get(
+    "CODESAGE_RETENTION_MAX_BYTES",
+    str((64 if IS_RENDER else 256) * 1024 * 1024),
+))
+COMPACTION_INTERVAL = int(os.environ.get("CODESAGE_COMPACTION_INTERVAL", "600"))
+
+PRUNE_CHUNK = 200          # versions deleted per writer transaction
+VACUUM_PAGES = 2000        # pages released per incremental_vacuum step
+MAX_BYTE_CAP_ROUNDS = 100  # safety bound for the byte-cap loop
+
+_last_run = {}
+_last_run_lock = threading.Lock()
+
+
+# ---------------------------
+# Storage stats
+# ---------------------------
+
+def _pragma(conn, name: str) -> int:
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def live_bytes(conn) -> int:
+    """Bytes in use by pages that hold data (free pages excluded)."""
+    return (_pragma(conn, "page_count") - _pragma(conn, "freelist_count")) * _pragma(conn, "page_size")
+
+
+def storage_stats(db_path: str = DEFAULT_DB_PATH) -> dict:
+    with connection(db_path) as conn:
+        try:
+            page_size = _pragma(conn, "page_size")
+            page_count = _pragma(conn, "page_count")
+            freelist = _pragma(conn, "freelist_count")
+
+            counts = conn.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM code_sessions) AS sessions,
+                    (SELECT COUNT(*) FROM version_history) AS versions,
+                    (SELECT COUNT(*) FROM blobs) AS blobs,
+                    (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs) AS blob_bytes,
+                    (SELECT COALESCE(SUM(size), 0) FROM blobs) AS raw_bytes,
+                    (SELECT COUNT(*) FROM blobs WHERE base_hash IS NOT NULL) AS delta_blobs
+            """).fetchone()
+
+            wal_path = db_path + "-wal"
+            with _last_run_lock:
+                last = _last_run.get(db_path)
+
+            return {
+                "ok": True,
+                "sessions": counts["sessions"],
+                "versions": counts["versions"],
+                "blobs": counts["blobs"],
+                "delta_blobs": counts["delta_blobs"],
+                "blob_bytes": counts["blob_bytes"],
+                "raw_bytes": counts["raw_bytes"],
+                "page_size": page_size,
+                "page_count": page_count,
+                "freelist_pages": freelist,
+                "live_bytes": (page_count - freelist) * page_size,
+                "file_bytes": os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+                "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(_pragma(conn, "auto_vacuum")),
+                "retention": {
+                    "max_versions_per_session": MAX_VERSIONS_PER_SESSION,
+                    "max_age_days": MAX_AGE_DAYS,
+                    "max_bytes": MAX_BYTES,
+                    "interval_seconds": COMPACTION_INTERVAL,
+                },
+                "last_compaction": last,
+            }
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
+
+
+# ---------------------------
+# Pruning
+# ---------------------------
+
+def _prune(db_path: str, version_ids) -> int:
+    """Delete in chunks, each as one queued write on the group-commit writer."""
+    writer = get_writer(db_path)
+    removed = 0
+    for start in range(0, len(version_ids), PRUNE_CHUNK):
+        chunk = version_ids[start:start + PRUNE_CHUNK]
+        removed += writer.submit(lambda cur, chunk=chunk: remove_versions(cur, chunk)).result()
+    return removed
+
+
+def _over_session_limit(conn) -> list:
+    if MAX_VERSIONS_PER_SESSION <= 0:
+        return []
+    rows = conn.execute("""
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY session_id ORDER BY created_at DESC, id DESC
+            ) AS rank
+            FROM version_history
+        )
+        WHERE rank > ?
+    """, (MAX_VERSIONS_PER_SESSION,)).fetchall()
+    return [r["id"] for r in rows]
+
+
+def _age_cutoff() -> str:
+    cutoff = datetime.utcnow() - timedelta(days=MAX_AGE_DAYS)
+    return cutoff.replace(microsecond=0).isoformat() + "Z"
+
+
+def _expired(conn) -> list:
+    if MAX_AGE_DAYS <= 0:
+        return []
+    rows = conn.execute(
+        "SELECT id FROM version_history WHERE created_at < ?", (_age_cutoff(),)
+    ).fetchall()
+    return [r["id"] for r in rows]
+
+
+def _drop_empty_sessions(db_path: str) -> int:
+    if MAX_AGE_DAYS <= 0:
+        return 0
+
+    def write(cur):
+        cur.execute("""
+            DELETE FROM code_sessions
+            WHERE created_at < ?
+              AND NOT EXISTS (SELECT 1 FROM version_history v WHERE v.session_id = code_sessions.id)
+        """, (_age_cutoff(),))
+        return cur.rowcount
+
+    return get_writer(db_path).submit(write).result()
+
+
+def _oldest_non_head(conn, limit: int) -> list:
+    rows = conn.execute("""
+        SELECT v.id FROM version_history v
+        WHERE v.id NOT IN (
+            SELECT head_version_id FROM code_sessions WHERE head_version_id IS NOT NULL
+        )
+        ORDER BY v.created_at ASC, v.id ASC
+        LIMIT ?
+    """, (limit,)).fetchall()
+    return [r["id"] for r in rows]
+
+
+def _optimize_search(db_path: str) -> None:
+    get_writer(db_path).submit(optimize_index).result()
+
+
+def _enforce_byte_cap(db_path: str, max_bytes: int) -> int:
+    if max_bytes <= 0:
+        return 0
+
+    removed = 0
+    with connection(db_path) as conn:
+        used = live_bytes(conn)
+    for _ in range(MAX_BYTE_CAP_ROUNDS):
+        if used <= max_bytes:
+            break
+        with connection(db_path) as conn:
+            victims = _oldest_non_head(conn, PRUNE_CHUNK)
+        if not victims:
+            break  # only session heads left
+        removed += _prune(db_path, victims)
+        _optimize_search(db_path)
+
+        with connection(db_path) as conn:
+            after = live_bytes(conn)
+        if after >= used:
+            break  # pruning no longer frees space: don't empty the store for nothing
+        used = after
+    return removed
+
+
+# ---------------------------
+# Vacuum
+# ---------------------------
+
+def _vacuum(db_path: str) -> int:
+    """Return free pages to the filesystem; returns pages released."""
+    conn = open_connection(db_path)
+    try:
+        if _pragma(conn, "auto_vacuum") != 2:
+            # One-time conversion of files created before incremental vacuum
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            before = _pragma(conn, "page_count")
+            conn.execute("VACUUM")
+            return max(0, before - _pragma(conn, "page_count"))
+
+        released = 0
+        while _pragma(conn, "freelist_count") > 0:
+            before = _pragma(conn, "page_count")
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            step = before - _pragma(conn, "page_count")
+            if step <= 0:
+                break
+            released += step
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return released
+    finally:
+        conn.close()
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+
+def compact(db_path: str = DEFAULT_DB_PATH, max_bytes: int = MAX_BYTES) -> dict:
+    """
+    Apply every retention limit, then vacuum. Safe to run at any time.
+    `max_bytes` is this file's share of the global cap (see versions/shards.py).
+    """
+    started = time.monotonic()
+    try:
+        with connection(db_path) as conn:
+            over_limit = _over_session_limit(conn)
+            expired = _expired(conn)
+
+        pruned = {
+            "session_limit": _prune(db_path, over_limit),
+            "max_age": _prune(db_path, sorted(set(expired) - set(over_limit))),
+        }
+        if pruned["session_limit"] or pruned["max_age"]:
+            _optimize_search(db_path)
+        pruned["byte_cap"] = _enforce_byte_cap(db_path, max_bytes)
+        get_writer(db_path).submit(merge_index).result()
+        sessions_dropped = _drop_empty_sessions(db_path)
+        pages_released = _vacuum(db_path)
+    except sqlite3.DatabaseError as e:
+        return {"ok": False, "error": str(e)}
+
+    result = {
+        "ok": True,
+        "pruned": pruned,
+        "sessions_dropped": sessions_dropped,
+        "pages_released": pages_released,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        "finished_at": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+    }
+    with _last_run_lock:
+        _last_run[db_path] = result
+    return result
+
+
+class CompactionJob:
+    """Runs compact() on every database every `interval` seconds on a daemon thread."""
+
+    def __init__(self, db_paths=(DEFAULT_DB_PATH,), interval: int = COMPACTION_INTERVAL, max_bytes: int = MAX_BYTES):
+        self.db_paths = list(db_paths)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="codesage-compaction", daemon=True)
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=30)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            for db_path in self.db_paths:
+                if self._stop.is_set():
+                    return
+                compact(db_path, max_bytes=self.max_bytes)
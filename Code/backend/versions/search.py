@@ -0,0 +1,203 @@
+"""
+Code Search (SQLite FTS5)
+
+`version_search` is a contentless FTS5 index (rowid = version id) over the
+original and refactored code of every version. The text itself stays in
+the compressed blob store, but the postings are not small: every version
+lists every token (with positions, for phrase queries) of both texts, so
+a history of small edits, which the blob store keeps as tiny deltas,
+costs the full postings of each version. Measured: 100 saves of a 22 KB
+file take ~0.95 MB of index (~10 KB per save for the two texts), and
+optimizing it recovers only ~5%. The index is usually the largest part of the file
+and counts against the retention byte cap (versions/retention.py).
+
+Merge policy (migration 10): automerge 8 and 4 KB index pages keep the
+merge work done inside saves small; compaction runs a bounded 'merge'
+every pass and an 'optimize' after pruning, which is what turns delete
+tombstones into free pages.
+
+- index_version()   -> called by save_version inside its write
+- unindex_version() -> called when a version is deleted (contentless
+                       tables need the indexed text back to remove it)
+- merge_index()     -> bounded incremental merge (every compaction)
+- optimize_index()  -> merge all segments; until then deletes are only
+                       tombstones and free no space (retention calls it)
+- search_versions() -> bm25-ranked matches, optional session filter,
+                       highlights computed from the blob text per hit
+
+Identifiers keep underscores (tokenchars '_'); a query is matched as a
+phrase by default, so snippets like `foo(bar)` find `foo ( bar`.
+When SQLite is built without FTS5 the index is skipped and search
+reports that it is unavailable.
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+from versions.blobs import get_blob
+from versions.db import connection
+
+SEARCH_TABLE = "version_search"
+
+FIELDS = ("original", "refactored")
+MERGE_PAGES = 500        # leaf pages written per compaction 'merge'
+MAX_HIGHLIGHTS = 3       # matching lines returned per hit
+MAX_LINE_LENGTH = 300    # highlighted lines are clipped to this
+
+# Same notion of a token as the FTS tokenizer (unicode61 + '_')
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+_enabled = {}
+_enabled_lock = threading.Lock()
+
+
+def search_enabled(cur) -> bool:
+    """Whether this database has the index (cached per database file)."""
+    db_file = cur.execute("PRAGMA database_list").fetchone()["file"]
+    with _enabled_lock:
+        enabled = _enabled.get(db_file)
+    if enabled is None:
+        enabled = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+        ).fetchone() is not None
+        with _enabled_lock:
+            _enabled[db_file] = enabled
+    return enabled
+
+
+# ---------------------------
+# Maintenance
+# ---------------------------
+
+def index_version(cur, version_id: int, original: Optional[str], refactored: Optional[str]) -> None:
+    if not search_enabled(cur):
+        return
+    cur.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, original, refactored) VALUES (?, ?, ?)",
+        (version_id, original or "", refactored or "")
+    )
+
+
+def unindex_version(cur, row) -> None:
+    """`row` needs id, original_hash and refactored_hash (read before the blobs are released)."""
+    if not search_enabled(cur):
+        return
+    # Deleting a rowid the index never saw corrupts a contentless table
+    cur.execute(f"SELECT 1 FROM {SEARCH_TABLE} WHERE rowid = ?", (row["id"],))
+    if cur.fetchone() is None:
+        return
+    cur.execute(
+        f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, original, refactored) VALUES ('delete', ?, ?, ?)",
+        (row["id"], get_blob(cur, row["original_hash"]) or "", get_blob(cur, row["refactored_hash"]) or "")
+    )
+
+
+def merge_index(cur, pages: int = MERGE_PAGES) -> None:
+    if search_enabled(cur):
+        cur.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('merge', ?)", (pages,))
+
+
+def optimize_index(cur) -> None:
+    if search_enabled(cur):
+        cur.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+# ---------------------------
+# Querying
+# ---------------------------
+
+def build_query(text: str, field: Optional[str] = None, mode: str = "phrase") -> Optional[str]:
+    """
+    Turn free text into an FTS5 expression: tokens are quoted so user
+    input can never be parsed as query syntax.
+    """
+    tokens = _TOKEN.findall(text or "")
+    if not tokens:
+        return None
+
+    quoted = [f'"{t}"' for t in tokens]
+    expression = f'"{" ".join(tokens)}"' if mode == "phrase" else " AND ".join(quoted)
+    if field in FIELDS:
+        expression = f"{field} : ({expression})"
+    return expression
+
+
+def _highlights(text: str, terms: set, field: str) -> list:
+    out = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        matches = [
+            [m.start(), m.end()] for m in _TOKEN.finditer(line)
+            if m.group().lower() in terms and m.end() <= MAX_LINE_LENGTH
+        ]
+        if matches:
+            out.append({"field": field, "line": number, "text": line[:MAX_LINE_LENGTH], "matches": matches})
+            if len(out) >= MAX_HIGHLIGHTS:
+                break
+    return out
+
+
+def search_versions(
+    query: str,
+    session_id: Optional[str] = None,
+    field: Optional[str] = None,
+    mode: str = "phrase",
+    limit: int = 20,
+    offset: int = 0,
+    *,
+    db_path: str,
+) -> dict:
+    expression = build_query(query, field, mode)
+    if expression is None:
+        return {"ok": False, "error": "Query has no searchable terms"}
+
+    terms = {t.lower() for t in _TOKEN.findall(query)}
+    fields = (field,) if field in FIELDS else FIELDS
+
+    with connection(db_path) as conn:
+        try:
+            cur = conn.cursor()
+            if not search_enabled(cur):
+                return {"ok": False, "error": "Search is unavailable (SQLite built without FTS5)"}
+
+            params = [expression]
+            where = f"{SEARCH_TABLE} MATCH ?"
+            if session_id:
+                where += " AND v.session_id = ?"
+                params.append(session_id)
+
+            rows = cur.execute(f"""
+                SELECT v.id, v.session_id, v.parent_id, v.created_at,
+                       v.original_hash, v.refactored_hash,
+                       bm25({SEARCH_TABLE}) AS score
+                FROM {SEARCH_TABLE}
+                JOIN version_history v ON v.id = {SEARCH_TABLE}.rowid
+                WHERE {where}
+                ORDER BY score
+                LIMIT ? OFFSET ?
+            """, params + [limit + 1, offset]).fetchall()
+
+            has_more = len(rows) > limit
+            results = []
+            for r in rows[:limit]:
+                highlights = []
+                for name in fields:
+                    text = get_blob(cur, r[f"{name}_hash"]) or ""
+                    highlights.extend(_highlights(text, terms, name))
+                    # Unchanged code would repeat the same lines
+                    if r["original_hash"] == r["refactored_hash"]:
+                        break
+                results.append({
+                    "version_id": r["id"],
+                    "session_id": r["session_id"],
+                    "parent_id": r["parent_id"],
+                    "created_at": r["created_at"],
+                    "score": round(-r["score"], 4),  # bm25 is lower-is-better
+                    "highlights": highlights[:MAX_HIGHLIGHTS],
+                })
+
+            return {"ok": True, "query": query, "results": results, "has_more": has_more}
+
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
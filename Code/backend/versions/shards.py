@@ -0,0 +1,218 @@
+"""
+Shard Router
+
+Sessions are partitioned across SHARD_COUNT SQLite files by a stable hash
+of session_id. Each file has its own pool and group-commit writer, so
+writes to different shards never wait on the same lock.
+
+- Session-scoped calls go to session_shard(session_id)
+- Id-scoped calls go to version_shard(id): with more than one shard,
+  ids are allocated so that id % MAX_SHARDS is the shard index
+- SHARD_COUNT = 1 (the default) keeps the original single versions.db,
+  with plain AUTOINCREMENT ids
+
+Shard files are named versions.<i>-of-<n>.db, so changing
+CODESAGE_DB_SHARDS never silently routes into files laid out for another
+count. Use versions/split_shards.py to split an existing versions.db.
+"""
+
+import hashlib
+import os
+from typing import Iterator, List, Optional
+
+from versions import versions as store
+from versions import analytics
+from versions import retention
+from versions import search
+from versions.versions import DB_DIR, MAX_SHARDS
+
+SHARD_COUNT = int(os.environ.get("CODESAGE_DB_SHARDS", "1"))
+
+if not 1 <= SHARD_COUNT <= MAX_SHARDS:
+    raise ValueError(f"CODESAGE_DB_SHARDS must be between 1 and {MAX_SHARDS}")
+
+
+def shard_path(index: int, count: Optional[int] = None, db_dir: str = DB_DIR) -> str:
+    count = count or SHARD_COUNT
+    if count == 1:
+        return os.path.join(db_dir, "versions.db")
+    return os.path.join(db_dir, f"versions.{index}-of-{count}.db")
+
+
+def shard_paths(count: Optional[int] = None, db_dir: str = DB_DIR) -> List[str]:
+    count = count or SHARD_COUNT
+    return [shard_path(i, count, db_dir) for i in range(count)]
+
+
+def session_shard(session_id: str, count: Optional[int] = None) -> int:
+    count = count or SHARD_COUNT
+    # Stable across processes (unlike hash())
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def version_shard(version_id: int, count: Optional[int] = None) -> Optional[int]:
+    count = count or SHARD_COUNT
+    if count == 1:
+        return 0
+    shard = version_id % MAX_SHARDS
+    return shard if shard < count else None
+
+
+# ---------------------------
+# Lifecycle
+# ---------------------------
+
+def init_shards() -> None:
+    for path in shard_paths():
+        store.init_db(path)
+
+
+def compaction_job() -> "retention.CompactionJob":
+    # The global byte cap is split evenly across shards
+    return retention.CompactionJob(shard_paths(), max_bytes=retention.MAX_BYTES // SHARD_COUNT)
+
+
+# ---------------------------
+# Routed API (same signatures as versions.versions)
+# ---------------------------
+
+_NOT_FOUND = {"ok": False, "error": "Version not found"}
+
+
+def save_version(session_id: str, *args, **kwargs) -> dict:
+    shard = session_shard(session_id)
+    return store.save_version(
+        session_id, *args,
+        db_path=shard_path(shard),
+        shard=shard if SHARD_COUNT > 1 else None,
+        **kwargs,
+    )
+
+
+def get_version_history(session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    return store.get_version_history(
+        session_id, limit=limit, cursor=cursor, db_path=shard_path(session_shard(session_id))
+    )
+
+
+def iter_version_history(session_id: str, cursor: Optional[str] = None) -> Iterator[dict]:
+    return store.iter_version_history(
+        session_id, cursor=cursor, db_path=shard_path(session_shard(session_id))
+    )
+
+
+def get_version(version_id: int) -> dict:
+    shard = version_shard(version_id)
+    if shard is None:
+        return dict(_NOT_FOUND)
+    return store.get_version(version_id, db_path=shard_path(shard))
+
+
+def version_etag(version_id: int) -> Optional[str]:
+    shard = version_shard(version_id)
+    return None if shard is None else store.version_etag(version_id, db_path=shard_path(shard))
+
+
+def delete_version(version_id: int) -> dict:
+    shard = version_shard(version_id)
+    if shard is None:
+        return {"ok": True}
+    return store.delete_version(version_id, db_path=shard_path(shard))
+
+
+def clear_versions(session_id: str) -> dict:
+    return store.clear_versions(session_id, db_path=shard_path(session_shard(session_id)))
+
+
+def diff_versions(from_id: int, to_id: int, field: str = "refactored") -> dict:
+    from_shard, to_shard = version_shard(from_id), version_shard(to_id)
+    if from_shard is None or to_shard is None:
+        return dict(_NOT_FOUND)
+    return store.diff_versions(
+        from_id, to_id, field=field,
+        db_path=shard_path(from_shard),
+        to_db_path=shard_path(to_shard),
+    )
+
+
+def search_versions(
+    query: str,
+    session_id: Optional[str] = None,
+    field: Optional[str] = None,
+    mode: str = "phrase",
+    limit: int = 20,
+    offset: int = 0,
+) -> dict:
+    if session_id:
+        return search.search_versions(
+            query, session_id, field, mode, limit, offset,
+            db_path=shard_path(session_shard(session_id)),
+        )
+
+    # Every shard returns its best offset + limit hits; merge by score
+    merged = []
+    has_more = False
+    for path in shard_paths():
+        page = search.search_versions(query, None, field, mode, offset + limit, 0, db_path=path)
+        if not page.get("ok"):
+            return page
+        merged.extend(page["results"])
+        has_more = has_more or page["has_more"]
+
+    merged.sort(key=lambda r: r["score"], reverse=True)
+    return {
+        "ok": True,
+        "query": query,
+        "results": merged[offset:offset + limit],
+        "has_more": has_more or len(merged) > offset + limit,
+    }
+
+
+def issue_trend(session_id: str, issue_type: Optional[str] = None) -> dict:
+    return analytics.issue_trend(session_id, issue_type, db_path=shard_path(session_shard(session_id)))
+
+
+def quality_trend(session_id: str) -> dict:
+    return analytics.quality_trend(session_id, db_path=shard_path(session_shard(session_id)))
+
+
+def issue_summary(session_id: str) -> dict:
+    return analytics.issue_summary(session_id, db_path=shard_path(session_shard(session_id)))
+
+
+# ---------------------------
+# Admin (aggregated over shards)
+# ---------------------------
+
+_SUMMED_STATS = (
+    "sessions", "versions", "blobs", "delta_blobs", "blob_bytes", "raw_bytes",
+    "live_bytes", "file_bytes", "wal_bytes",
+)
+
+
+def storage_stats() -> dict:
+    shards = [retention.storage_stats(path) for path in shard_paths()]
+    failed = [s for s in shards if not s.get("ok")]
+    if failed:
+        return failed[0]
+    if SHARD_COUNT == 1:
+        return {**shards[0], "shard_count": 1}
+
+    totals = {key: sum(s[key] for s in shards) for key in _SUMMED_STATS}
+    return {
+        "ok": True,
+        **totals,
+        "shard_count": SHARD_COUNT,
+        "retention": shards[0]["retention"],
+        "shards": shards,
+    }
+
+
+def compact() -> dict:
+    max_bytes = retention.MAX_BYTES // SHARD_COUNT
+    results = [retention.compact(path, max_bytes=max_bytes) for path in shard_paths()]
+    failed = [r for r in results if not r.get("ok")]
+    if failed:
+        return failed[0]
+    return results[0] if SHARD_COUNT == 1 else {"ok": True, "shards": results}
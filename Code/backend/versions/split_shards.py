@@ -0,0 +1,160 @@
+"""
+Split a single-file versions.db into hash-sharded files.
+
+Usage (from Code/backend, with the app stopped):
+
+    python -m versions.split_shards --shards 4
+    python -m versions.split_shards --shards 4 --source /path/versions.db --map-file ids.json
+
+Every session is copied to shard session_shard(session_id) with its
+versions in chronological order. Versions get new ids in the shard's id
+space (id % MAX_SHARDS == shard); parent links and session heads are
+rewritten accordingly. --map-file writes the old -> new id mapping.
+
+The source file is never modified. Target shard files must not already
+hold versions. Start the app with CODESAGE_DB_SHARDS=<n> afterwards.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from versions.analytics import record_analysis
+from versions.blobs import get_blob, put_blob
+from versions.db import open_connection
+from versions.migrations import migrate
+from versions.search import index_version
+from versions.shards import session_shard, shard_path
+from versions.versions import DB_DIR, DEFAULT_DB_PATH, init_db, next_version_id
+
+# Columns copied as-is (snapshot text goes through the target's blob store)
+COPIED_COLUMNS = (
+    "diff_summary", "semantic_diff", "issues", "complexity", "quality_score", "created_at",
+)
+
+
+def _load(value):
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        return None
+
+
+def _copy_session(src, dst, session, shard: int, id_map: dict) -> int:
+    dst.execute(
+        "INSERT INTO code_sessions (id, filename, created_at) VALUES (?, ?, ?)",
+        (session["id"], session["filename"], session["created_at"])
+    )
+
+    rows = src.execute("""
+        SELECT * FROM version_history
+        WHERE session_id = ?
+        ORDER BY created_at ASC, id ASC
+    """, (session["id"],)).fetchall()
+
+    last_original = {}  # new version id -> original hash (delta base for children)
+    for row in rows:
+        new_id = next_version_id(dst, shard)
+        parent_id = id_map.get(row["parent_id"]) if row["parent_id"] is not None else None
+
+        original_hash = put_blob(dst, get_blob(src, row["original_hash"]), base=last_original.get(parent_id))
+        refactored_hash = put_blob(dst, get_blob(src, row["refactored_hash"]), base=original_hash)
+        diff_hash = put_blob(dst, get_blob(src, row["diff_hash"]))
+
+        dst.execute(f"""
+            INSERT INTO version_history (
+                id, session_id, parent_id, original_hash, refactored_hash, diff_hash,
+                {", ".join(COPIED_COLUMNS)}
+            )
+            VALUES (?, ?, ?, ?, ?, ?, {", ".join("?" for _ in COPIED_COLUMNS)})
+        """, (
+            new_id, session["id"], parent_id, original_hash, refactored_hash, diff_hash,
+            *(row[column] for column in COPIED_COLUMNS),
+        ))
+        index_version(dst, new_id, get_blob(dst, original_hash), get_blob(dst, refactored_hash))
+        record_analysis(
+            dst, new_id, session["id"], row["created_at"],
+            _load(row["issues"]), _load(row["complexity"]), row["quality_score"],
+        )
+        id_map[row["id"]] = new_id
+        last_original[new_id] = original_hash
+
+    head = session["head_version_id"]
+    dst.execute(
+        "UPDATE code_sessions SET head_version_id = ? WHERE id = ?",
+        (id_map.get(head) if head is not None else None, session["id"])
+    )
+    return len(rows)
+
+
+def split(source: str, shards: int, db_dir: str = DB_DIR) -> dict:
+    if shards < 2:
+        raise ValueError("Splitting needs at least 2 shards")
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+
+    src = open_connection(source)
+    migrate(src)  # bring the source up to the current schema first
+
+    targets = []
+    for index in range(shards):
+        path = shard_path(index, shards, db_dir)
+        init_db(path)
+        conn = open_connection(path)
+        if conn.execute("SELECT COUNT(*) FROM version_history").fetchone()[0]:
+            raise RuntimeError(f"Target shard {path} already contains versions")
+        conn.execute("BEGIN IMMEDIATE")
+        targets.append(conn)
+
+    id_map = {}
+    counts = [0] * shards
+    try:
+        for session in src.execute("SELECT * FROM code_sessions").fetchall():
+            shard = session_shard(session["id"], shards)
+            counts[shard] += _copy_session(src, targets[shard].cursor(), session, shard, id_map)
+        for conn in targets:
+            conn.commit()
+    except Exception:
+        for conn in targets:
+            conn.rollback()
+        raise
+    finally:
+        for conn in targets:
+            conn.close()
+        src.close()
+
+    return {
+        "shards": [shard_path(i, shards, db_dir) for i in range(shards)],
+        "versions_per_shard": counts,
+        "id_map": id_map,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Split versions.db into hash-sharded files")
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--source", default=DEFAULT_DB_PATH)
+    parser.add_argument("--db-dir", default=DB_DIR)
+    parser.add_argument("--map-file", help="write the old -> new version id mapping here")
+    args = parser.parse_args(argv)
+
+    try:
+        result = split(args.source, args.shards, args.db_dir)
+    except (ValueError, RuntimeError, FileNotFoundError, sqlite3.DatabaseError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if args.map_file:
+        with open(args.map_file, "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in result["id_map"].items()}, f)
+
+    for path, count in zip(result["shards"], result["versions_per_shard"]):
+        print(f"{path}: {count} versions")
+    print(f"Done. Start the app with CODESAGE_DB_SHARDS={args.shards}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,22 +4,48 @@ Version History Logic
 Provides:
 - init_db(db_path)
 - save_version(...)
-- get_version_history(session_id)
-- get_version(version_id)
+- get_version_history(session_id, limit, cursor)
+- iter_version_history(session_id, cursor)
+- get_version(version_id) / version_etag(version_id)
+- delete_version(version_id) / remove_versions(cur, ids)
 - generate_diff(old, new)
+- semantic_diff stored per version (see diff/semantic.py)
+- diff_versions(from_id, to_id, field)
+- FTS5 search index kept in step on save / delete (see versions/search.py)
+- Issues / metrics mirrored into indexed tables for trends (see versions/analytics.py)
 
 Notes:
-- SQLite-based persistence
+- SQLite-based persistence (pooled WAL connections, see versions/db.py)
+- Versioned schema migrations (see versions/migrations.py)
+- Snapshots stored once per content in compressed blobs, as line deltas
+  against the parent version with periodic keyframes (see versions/blobs.py)
 - JSON-safe storage
-- Git-like version chaining
+- Git-like version chaining (per-session head pointer)
+- Saves are batched by a group-commit writer thread (see versions/writer.py)
 """
 
 import sqlite3
+import base64
+import hashlib
 import json
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import ExitStack
 from datetime import datetime
-import difflib
-from typing import Optional, Any, Tuple
+from typing import Optional, Any, Tuple, Iterator
+
+from diff.engine import diff_texts, render_unified
+from diff.semantic import sandboxed_semantic_diff
+from services.deadline import degraded
+from services.sandbox import SandboxError, run_sandboxed
+from versions.analytics import record_analysis, forget_version, forget_session
+from versions.blobs import get_blob, release_blob, prepare_blob, store_blob, delta_base
+from versions.db import connection
+from versions.migrations import migrate
+from versions.search import index_version, unindex_version
+from versions.writer import WRITE_QUEUE_TIMEOUT, get_writer, WriteQueueFull
 
 IS_RENDER = os.environ.get("RENDER") == "true"
 
@@ -30,55 +56,36 @@ else:
         os.path.join(os.path.dirname(__file__), "..", "..", "database")
     )
 
-os.makedirs(DB_DIR, exist_ok=True)
 DEFAULT_DB_PATH = os.path.join(DB_DIR, "versions.db")
 
+SAVE_TIMEOUT = 30  # seconds to wait for the group-commit writer
+
+# With a request deadline, the (optional) semantic diff is skipped when
+# less than this is left; the write itself is never skipped
+SEMANTIC_DIFF_MIN_MS = 500
+
+# Sharded stores encode the shard in the low bits of every version id
+# (id % MAX_SHARDS == shard), so ids stay unique across shard files
+MAX_SHARDS = 256
+
 
 # ---------------------------
 # Database helpers
 # ---------------------------
 
-def get_conn(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, timeout=30)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
 def init_db(db_path: str = DEFAULT_DB_PATH) -> None:
-    """Initialize DB schema (call explicitly from app startup)."""
-    conn = get_conn(db_path)
-    try:
-        cur = conn.cursor()
+    """Initialize / migrate DB schema (call explicitly from app startup)."""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if not os.path.exists(db_path):
+        # auto_vacuum has to be chosen before WAL / the first table exists;
+        # older files are converted once by the compaction job
+        raw = sqlite3.connect(db_path)
+        raw.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        raw.execute("VACUUM")
+        raw.close()
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS code_sessions (
-                id TEXT PRIMARY KEY,
-                filename TEXT,
-                created_at TEXT
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS version_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                parent_id INTEGER,
-                original_code TEXT,
-                refactored_code TEXT,
-                diff TEXT,
-                diff_summary TEXT,
-                issues TEXT,
-                complexity TEXT,
-                quality_score INTEGER,
-                created_at TEXT,
-                FOREIGN KEY(session_id) REFERENCES code_sessions(id),
-                FOREIGN KEY(parent_id) REFERENCES version_history(id)
-            )
-        """)
-
-        conn.commit()
-    finally:
-        conn.close()
+    with connection(db_path) as conn:
+        migrate(conn)
 
 
 # ---------------------------
@@ -105,42 +112,70 @@ def _json_loads_safe(value: Optional[str]) -> Any:
         return value
 
 
+def next_version_id(cur, shard: int) -> int:
+    """Next id in `shard`'s id space; never reuses ids (AUTOINCREMENT sequence)."""
+    row = cur.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'version_history'"
+    ).fetchone()
+    seq = row[0] if row is not None else 0
+    return (seq // MAX_SHARDS + 1) * MAX_SHARDS + shard
+
+
+def _release_snapshot_blobs(cur, rows) -> None:
+    for row in rows:
+        release_blob(cur, row["original_hash"])
+        release_blob(cur, row["refactored_hash"])
+        release_blob(cur, row["diff_hash"])
+
+
 # ---------------------------
-# Diff generation
+# ETags
 # ---------------------------
 
-def generate_diff(old_code: str, new_code: str) -> Tuple[str, str]:
-    old_code = old_code or ""
-    new_code = new_code or ""
-
-    if old_code == new_code:
-        return "", ""
+def _etag_of(row) -> str:
+    """Strong ETag from the content hashes (and the only mutable link, parent_id)."""
+    parts = f"{row['id']}:{row['parent_id']}:{row['original_hash']}:{row['refactored_hash']}:{row['diff_hash']}"
+    return '"' + hashlib.blake2b(parts.encode("utf-8"), digest_size=16).hexdigest() + '"'
 
-    old_lines = old_code.splitlines(keepends=True)
-    new_lines = new_code.splitlines(keepends=True)
 
-    diff_lines = list(
-        difflib.unified_diff(
-            old_lines,
-            new_lines,
-            fromfile="original.py",
-            tofile="refactored.py",
-            lineterm=""
-        )
-    )
+def version_etag(version_id: int, db_path: str = DEFAULT_DB_PATH) -> Optional[str]:
+    """
+    ETag without loading snapshots: one primary-key read. Derived from the
+    stored row every time, so it follows re-parenting and deletes as soon
+    as they commit, in every worker process.
+    """
+    with connection(db_path) as conn:
+        row = conn.execute("""
+            SELECT id, parent_id, original_hash, refactored_hash, diff_hash
+            FROM version_history WHERE id = ?
+        """, (version_id,)).fetchone()
+    return _etag_of(row) if row is not None else None
 
-    diff_text = "\n".join(diff_lines)
 
-    additions = sum(1 for ln in diff_lines if ln.startswith("+") and not ln.startswith("+++"))
-    deletions = sum(1 for ln in diff_lines if ln.startswith("-") and not ln.startswith("---"))
+# ---------------------------
+# Diff generation
+# ---------------------------
 
+def _summarize(additions: int, deletions: int) -> str:
     summary = []
     if additions:
         summary.append(f"{additions} additions")
     if deletions:
         summary.append(f"{deletions} deletions")
+    return ", ".join(summary) if summary else "modified"
+
+
+def generate_diff(old_code: str, new_code: str) -> Tuple[str, str]:
+    old_code = old_code or ""
+    new_code = new_code or ""
+
+    if old_code == new_code:
+        return "", ""
 
-    return diff_text, ", ".join(summary) if summary else "modified"
+    result = diff_texts(old_code, new_code)
+    diff_text = render_unified(result["hunks"], fromfile="original.py", tofile="refactored.py")
+
+    return diff_text, _summarize(result["added"], result["removed"])
 
 
 # ---------------------------
@@ -155,161 +190,438 @@ def save_version(
     qualityScore: Optional[int],
     refactored_code: Optional[str] = None,
     diff: Optional[str] = None,
+    issueCounts: Any = None,
     db_path: str = DEFAULT_DB_PATH,
+    shard: Optional[int] = None,
+    deadline=None,
 ) -> dict:
-    """Save a Git-like version snapshot."""
+    """
+    Save a Git-like version snapshot. `shard` is set by the shard router
+    (versions/shards.py) so the new id lands in that shard's id space.
+    `issues` is the (capped) list shown to the user; `issueCounts` the
+    analysis' exact totals (issueSummary.counts), so the trend tables
+    count what the cap left out (see versions/analytics.py).
+    With a `deadline` (services.deadline.Deadline) the semantic diff is
+    skipped when time is short and the wait for queue space is bounded by
+    the time left. The semantic diff runs in the analysis sandbox
+    (services/sandbox.py); when the worker fails it is skipped too.
+    """
 
     refactored_code = refactored_code or original_code
 
-    conn = get_conn(db_path)
-    try:
+    # Diff handling (on the caller's thread, outside the write transaction)
+    if original_code == refactored_code:
+        diff_text, diff_summary = "", ""
+    elif diff is not None:
+        diff_text = diff
+        _, diff_summary = generate_diff(original_code, refactored_code)
+    else:
+        diff_text, diff_summary = generate_diff(original_code, refactored_code)
+
+    # Definition-level changes, so later analysis can skip unchanged definitions
+    skipped, reason = [], "deadline"
+    if deadline is None or deadline.allows(SEMANTIC_DIFF_MIN_MS):
+        # ast.parse of user code: in a sandbox worker, like analysis
+        timeout = deadline.remaining() if deadline is not None else None
+        try:
+            semantic = run_sandboxed(sandboxed_semantic_diff, original_code, refactored_code, timeout=timeout)
+        except SandboxError:
+            semantic = None
+            skipped.append("semantic_diff")
+            reason = "sandbox"
+    else:
+        semantic = None
+        skipped.append("semantic_diff")
+
+    # Hashing, compression and line deltas also run here: the writer thread
+    # holds the write lock for its whole batch. The parent read here may be
+    # stale by the time the write runs; store_blob checks the base again
+    with connection(db_path) as conn:
         cur = conn.cursor()
-
-        # Ensure session exists
-        cur.execute("SELECT id FROM code_sessions WHERE id = ?", (session_id,))
-        if cur.fetchone() is None:
+        cur.execute("""
+            SELECT v.original_hash FROM code_sessions s
+            JOIN version_history v ON v.id = s.head_version_id
+            WHERE s.id = ?
+        """, (session_id,))
+        head = cur.fetchone()
+        parent_hash = head["original_hash"] if head is not None else None
+        parent_text = delta_base(cur, parent_hash)
+
+    # Original deltas against the parent, refactored against the original
+    original_blob = prepare_blob(original_code, parent_hash, parent_text)
+    refactored_blob = prepare_blob(refactored_code, original_blob["hash"], original_code)
+    diff_blob = prepare_blob(diff_text or None)
+    semantic_json = _json_dumps_safe(semantic) if semantic is not None else None
+    issues_json = _json_dumps_safe(issues)
+    complexity_json = _json_dumps_safe(complexity)
+
+    # Runs on the writer thread, inside its batch transaction
+    def write(cur) -> dict:
+        # Ensure session exists + parent version from head pointer
+        cur.execute("SELECT head_version_id FROM code_sessions WHERE id = ?", (session_id,))
+        session = cur.fetchone()
+        if session is None:
             cur.execute(
                 "INSERT INTO code_sessions (id, filename, created_at) VALUES (?, ?, ?)",
                 (session_id, None, iso_now())
             )
-
-        # Find parent version
-        cur.execute("""
-            SELECT id FROM version_history
-            WHERE session_id = ?
-            ORDER BY datetime(created_at) DESC
-            LIMIT 1
-        """, (session_id,))
-        parent = cur.fetchone()
-        parent_id = parent["id"] if parent else None
-
-        # Diff handling
-        if original_code == refactored_code:
-            diff_text, diff_summary = "", ""
-        elif diff is not None:
-            diff_text = diff
-            _, diff_summary = generate_diff(original_code, refactored_code)
+            parent_id = None
         else:
-            diff_text, diff_summary = generate_diff(original_code, refactored_code)
+            parent_id = session["head_version_id"]
+
+        original_hash = store_blob(cur, original_blob)
+        refactored_hash = store_blob(cur, refactored_blob)
 
         created_at = iso_now()
 
         cur.execute("""
             INSERT INTO version_history (
-                session_id, parent_id,
-                original_code, refactored_code,
-                diff, diff_summary,
+                id, session_id, parent_id,
+                original_hash, refactored_hash,
+                diff_hash, diff_summary, semantic_diff,
                 issues, complexity,
                 quality_score, created_at
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
+            next_version_id(cur, shard) if shard is not None else None,
             session_id,
             parent_id,
-            original_code,
-            refactored_code,
-            diff_text,
+            original_hash,
+            refactored_hash,
+            store_blob(cur, diff_blob),
             diff_summary,
-            _json_dumps_safe(issues),
-            _json_dumps_safe(complexity),
+            semantic_json,
+            issues_json,
+            complexity_json,
             qualityScore,
             created_at,
         ))
+        version_id = cur.lastrowid
+        index_version(cur, version_id, original_code, refactored_code)
+        record_analysis(cur, version_id, session_id, created_at, issues, complexity, qualityScore, issueCounts)
 
-        conn.commit()
-        return {"ok": True, "version_id": cur.lastrowid, "parent_id": parent_id, "created_at": created_at}
+        cur.execute(
+            "UPDATE code_sessions SET head_version_id = ? WHERE id = ?",
+            (version_id, session_id)
+        )
 
+        return {
+            "ok": True,
+            "version_id": version_id,
+            "parent_id": parent_id,
+            "created_at": created_at,
+            "degraded": degraded(skipped, reason),
+        }
+
+    # Once queued the write commits regardless, so only the queue wait is bounded
+    queue_timeout = WRITE_QUEUE_TIMEOUT if deadline is None else min(WRITE_QUEUE_TIMEOUT, deadline.remaining())
+    try:
+        return get_writer(db_path).submit(write, timeout=queue_timeout).result(timeout=SAVE_TIMEOUT)
+    except WriteQueueFull as e:
+        return {"ok": False, "error": str(e)}
+    except FutureTimeout:
+        return {"ok": False, "error": "Timed out waiting for the version write"}
     except sqlite3.DatabaseError as e:
-        conn.rollback()
         return {"ok": False, "error": str(e)}
 
-    finally:
-        conn.close()
+
+def encode_cursor(created_at: str, version_id: int) -> str:
+    raw = json.dumps([created_at, version_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
 
-def get_version_history(session_id: str, db_path: str = DEFAULT_DB_PATH) -> dict:
-    conn = get_conn(db_path)
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Raises ValueError for anything that is not a cursor we issued."""
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, parent_id, created_at, diff_summary
-            FROM version_history
-            WHERE session_id = ?
-            ORDER BY datetime(created_at) ASC
-        """, (session_id,))
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, version_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(version_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, version_id
+
+
+def _history_page(cur, session_id: str, limit: Optional[int], after: Optional[Tuple[str, int]]):
+    """Keyset page on (created_at, id); fetches one extra row to detect more."""
+    params = [session_id]
+    where = "session_id = ?"
+    if after is not None:
+        where += " AND (created_at, id) > (?, ?)"
+        params += list(after)
+
+    sql = f"""
+        SELECT id, parent_id, created_at, diff_summary
+        FROM version_history
+        WHERE {where}
+        ORDER BY created_at ASC, id ASC
+    """
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    rows = cur.execute(sql, params).fetchall()
+    has_more = limit is not None and len(rows) > limit
+    return rows[:limit] if has_more else rows, has_more
+
+
+def _history_item(r) -> dict:
+    return {
+        "version_id": r["id"],
+        "parent_id": r["parent_id"],
+        "created_at": r["created_at"],
+        "summary": r["diff_summary"] or "Snapshot",
+        "diff_summary": r["diff_summary"] or "",
+    }
+
+
+def get_version_history(
+    session_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db_path: str = DEFAULT_DB_PATH,
+) -> dict:
+    """One page of history (oldest first); `next_cursor` continues after it."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
 
-        history = [{
-            "version_id": r["id"],
-            "parent_id": r["parent_id"],
-            "created_at": r["created_at"],
-            "summary": r["diff_summary"] or "Snapshot",
-            "diff_summary": r["diff_summary"] or "",
-        } for r in cur.fetchall()]
+    with connection(db_path) as conn:
+        try:
+            rows, has_more = _history_page(conn.cursor(), session_id, limit, after)
 
-        return {"ok": True, "history": history}
+            history = [_history_item(r) for r in rows]
+            next_cursor = (
+                encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+                if has_more else None
+            )
 
-    except sqlite3.DatabaseError as e:
-        return {"ok": False, "error": str(e)}
+            return {"ok": True, "history": history, "has_more": has_more, "next_cursor": next_cursor}
 
-    finally:
-        conn.close()
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
 
 
-def get_version(version_id: int, db_path: str = DEFAULT_DB_PATH) -> dict:
-    conn = get_conn(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM version_history WHERE id = ?", (version_id,))
-        row = cur.fetchone()
+def iter_version_history(
+    session_id: str,
+    cursor: Optional[str] = None,
+    page_size: int = 500,
+    db_path: str = DEFAULT_DB_PATH,
+) -> Iterator[dict]:
+    """
+    Stream the whole history page by page (for exports). A connection is
+    only held while one page is read, never across yields.
+    """
+    after = decode_cursor(cursor) if cursor else None
 
-        if not row:
-            return {"ok": False, "error": "Version not found"}
+    while True:
+        with connection(db_path) as conn:
+            rows, has_more = _history_page(conn.cursor(), session_id, page_size, after)
 
-        return {
-            "ok": True,
-            "version": {
-                "id": row["id"],
-                "session_id": row["session_id"],
-                "parent_id": row["parent_id"],
-                "original_code": row["original_code"],
-                "refactored_code": row["refactored_code"],
-                "diff": row["diff"] or "",
-                "diff_summary": row["diff_summary"] or "",
-                "issues": _json_loads_safe(row["issues"]),
-                "complexity": _json_loads_safe(row["complexity"]),
-                "qualityScore": row["quality_score"],
-                "created_at": row["created_at"],
-            },
-        }
+        for r in rows:
+            yield _history_item(r)
 
-    except sqlite3.DatabaseError as e:
-        return {"ok": False, "error": str(e)}
+        if not has_more:
+            return
+        after = (rows[-1]["created_at"], rows[-1]["id"])
 
-    finally:
-        conn.close()
+
+def get_version(version_id: int, db_path: str = DEFAULT_DB_PATH) -> dict:
+    with connection(db_path) as conn:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM version_history WHERE id = ?", (version_id,))
+            row = cur.fetchone()
+
+            if not row:
+                return {"ok": False, "error": "Version not found"}
+
+            etag = _etag_of(row)
+
+            return {
+                "ok": True,
+                "etag": etag,
+                "version": {
+                    "id": row["id"],
+                    "session_id": row["session_id"],
+                    "parent_id": row["parent_id"],
+                    "original_code": get_blob(cur, row["original_hash"]),
+                    "refactored_code": get_blob(cur, row["refactored_hash"]),
+                    "diff": get_blob(cur, row["diff_hash"]) or "",
+                    "diff_summary": row["diff_summary"] or "",
+                    "semantic_diff": _json_loads_safe(row["semantic_diff"]),
+                    "issues": _json_loads_safe(row["issues"]),
+                    "complexity": _json_loads_safe(row["complexity"]),
+                    "qualityScore": row["quality_score"],
+                    "created_at": row["created_at"],
+                },
+            }
+
+        except sqlite3.DatabaseError as e:
+            return {"ok": False, "error": str(e)}
+
+
+def remove_versions(cur, version_ids) -> int:
+    """
+    Delete versions inside the caller's transaction without breaking
+    chains: children are re-parented to the deleted version's parent,
+    snapshot blobs are released and session heads are moved back.
+    Returns the number of rows deleted.
+    """
+    removed = 0
+    sessions = set()
+
+    # Oldest first, so a run of deleted ancestors collapses onto the survivor
+    for version_id in sorted(version_ids):
+        cur.execute("""
+            SELECT id, session_id, parent_id, original_hash, refactored_hash, diff_hash
+            FROM version_history WHERE id = ?
+        """, (version_id,))
+        row = cur.fetchone()
+        if row is None:
+            continue
+        unindex_version(cur, row)
+        forget_version(cur, version_id)
+
+        cur.execute(
+            "UPDATE version_history SET parent_id = ? WHERE parent_id = ?",
+            (row["parent_id"], version_id)
+        )
+        cur.execute("DELETE FROM version_history WHERE id = ?", (version_id,))
+        _release_snapshot_blobs(cur, [row])
+        sessions.add(row["session_id"])
+        removed += 1
+
+    # Move head pointers back where the head was deleted
+    for session_id in sessions:
+        cur.execute("""
+            UPDATE code_sessions SET head_version_id = (
+                SELECT id FROM version_history
+                WHERE session_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            )
+            WHERE id = ? AND head_version_id NOT IN (
+                SELECT id FROM version_history WHERE session_id = ?
+            )
+        """, (session_id, session_id, session_id))
+
+    return removed
 
 
 def delete_version(version_id: int, db_path: str = DEFAULT_DB_PATH) -> dict:
-    conn = get_conn(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM version_history WHERE id = ?", (version_id,))
-        conn.commit()
-        return {"ok": True}
-    except sqlite3.DatabaseError as e:
-        return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
+    with connection(db_path) as conn:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            remove_versions(conn.cursor(), [version_id])
+            conn.commit()
+            return {"ok": True}
+        except sqlite3.DatabaseError as e:
+            conn.rollback()
+            return {"ok": False, "error": str(e)}
 
 
 def clear_versions(session_id: str, db_path: str = DEFAULT_DB_PATH) -> dict:
-    conn = get_conn(db_path)
+    with connection(db_path) as conn:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, original_hash, refactored_hash, diff_hash
+                FROM version_history WHERE session_id = ?
+            """, (session_id,))
+            rows = cur.fetchall()
+            for row in rows:
+                unindex_version(cur, row)
+            _release_snapshot_blobs(cur, rows)
+            forget_session(cur, session_id)
+            cur.execute("DELETE FROM version_history WHERE session_id = ?", (session_id,))
+            cur.execute("UPDATE code_sessions SET head_version_id = NULL WHERE id = ?", (session_id,))
+            conn.commit()
+            return {"ok": True}
+        except sqlite3.DatabaseError as e:
+            conn.rollback()
+            return {"ok": False, "error": str(e)}
+
+
+# ---------------------------
+# Pairwise version diff
+# ---------------------------
+
+DIFF_FIELDS = {
+    "original": "original_hash",
+    "refactored": "refactored_hash",
+}
+
+DIFF_CACHE_SIZE = 256
+
+# (hash_from, hash_to) -> hunks + summary; blobs never change, so entries never go stale
+_pair_diff_cache = OrderedDict()
+_pair_diff_lock = threading.Lock()
+
+
+def _snapshot_hash(cur, version_id: int, column: str):
+    cur.execute(f"SELECT {column} AS hash FROM version_history WHERE id = ?", (version_id,))
+    return cur.fetchone()
+
+
+def diff_versions(
+    from_id: int,
+    to_id: int,
+    field: str = "refactored",
+    db_path: str = DEFAULT_DB_PATH,
+    to_db_path: Optional[str] = None,
+) -> dict:
+    """
+    Diff one snapshot field of any two stored versions. `to_db_path` is
+    only set by the shard router when the versions live in different files.
+    """
+    column = DIFF_FIELDS.get(field)
+    if column is None:
+        return {"ok": False, "error": f"Unknown field '{field}'"}
+
+    to_db_path = to_db_path or db_path
+
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM version_history WHERE session_id = ?", (session_id,))
-        conn.commit()
-        return {"ok": True}
+        with ExitStack() as stack:
+            from_cur = stack.enter_context(connection(db_path)).cursor()
+            to_cur = (
+                from_cur if to_db_path == db_path
+                else stack.enter_context(connection(to_db_path)).cursor()
+            )
+            from_row = _snapshot_hash(from_cur, from_id, column)
+            to_row = _snapshot_hash(to_cur, to_id, column)
+            if from_row is None or to_row is None:
+                return {"ok": False, "error": "Version not found"}
+
+            key = (from_row["hash"], to_row["hash"])
+            with _pair_diff_lock:
+                result = _pair_diff_cache.get(key)
+                if result is not None:
+                    _pair_diff_cache.move_to_end(key)
+
+            if result is None:
+                old_code = get_blob(from_cur, key[0]) or ""
+                new_code = get_blob(to_cur, key[1]) or ""
+                structured = diff_texts(old_code, new_code)
+                result = {
+                    "hunks": structured["hunks"],
+                    "summary": _summarize(structured["added"], structured["removed"]) if structured["hunks"] else "",
+                }
+                with _pair_diff_lock:
+                    _pair_diff_cache[key] = result
+                    if len(_pair_diff_cache) > DIFF_CACHE_SIZE:
+                        _pair_diff_cache.popitem(last=False)
+
+            # Headers name the requested ids, so they are rendered per request
+            # (other version pairs can share the cached content pair)
+            diff = render_unified(result["hunks"], fromfile=f"version-{from_id}", tofile=f"version-{to_id}")
+            return {
+                "ok": True, "from": from_id, "to": to_id, "field": field,
+                "hunks": result["hunks"], "diff": diff, "summary": result["summary"],
+            }
+
     except sqlite3.DatabaseError as e:
         return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
@@ -0,0 +1,181 @@
+"""
+Group-Commit Writer
+
+One background thread per database owns the write connection. Callers
+queue a write (a function of a cursor) and get a Future back; the thread
+drains everything queued and runs it in a single transaction. Writes that
+arrive while a batch commits form the next batch, so N concurrent saves
+cost one fsync and one acquisition of SQLite's write lock instead of N,
+while a lone save is committed immediately.
+
+- Each write runs under its own SAVEPOINT: a failing write is rolled back
+  alone and its future gets the exception, the rest of the batch commits.
+- Futures resolve only after COMMIT, so a returned version id is durable
+  according to the configured durability level.
+- Backpressure: the queue is bounded; submit() waits up to
+  WRITE_QUEUE_TIMEOUT seconds for room, then raises WriteQueueFull.
+
+Settings (environment):
+- CODESAGE_WRITE_BATCH_MS      extra time to wait for more writes (default 0)
+- CODESAGE_WRITE_BATCH_SIZE    max writes per transaction (default 64)
+- CODESAGE_WRITE_QUEUE_SIZE    queued writes before backpressure (default 1024)
+- CODESAGE_WRITE_DURABILITY    full | normal | off (PRAGMA synchronous, default normal)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from versions.db import open_connection
+
+BATCH_WINDOW = int(os.environ.get("CODESAGE_WRITE_BATCH_MS", "0")) / 1000
+MAX_BATCH = int(os.environ.get("CODESAGE_WRITE_BATCH_SIZE", "64"))
+QUEUE_SIZE = int(os.environ.get("CODESAGE_WRITE_QUEUE_SIZE", "1024"))
+WRITE_QUEUE_TIMEOUT = 5  # seconds a caller waits for queue space
+
+DURABILITY = {
+    "full": "FULL",      # fsync on every commit
+    "normal": "NORMAL",  # WAL default: a power loss may drop the last commits
+    "off": "OFF",        # no fsync (tests / throwaway data)
+}
+DEFAULT_DURABILITY = os.environ.get("CODESAGE_WRITE_DURABILITY", "normal")
+
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    pass
+
+
+class GroupCommitWriter:
+    def __init__(self, db_path: str, durability: str = DEFAULT_DURABILITY):
+        if durability not in DURABILITY:
+            raise ValueError(f"Unknown durability '{durability}'")
+
+        self.db_path = db_path
+        self.durability = durability
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+        # Stats for /metrics-style reporting
+        self.batches = 0
+        self.writes = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"codesage-writer:{os.path.basename(db_path)}", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, write: Callable, timeout: float = WRITE_QUEUE_TIMEOUT) -> Future:
+        """Queue `write(cursor)`; the future resolves to its return value after commit."""
+        future = Future()
+        try:
+            self._queue.put((write, future), timeout=timeout)
+        except queue.Full:
+            raise WriteQueueFull("Write queue is full, try again later")
+        return future
+
+    def stop(self, timeout: float = 10) -> None:
+        """Flush everything queued so far, then stop the thread."""
+        if self.alive:
+            self._queue.put((_STOP, None))
+            self._thread.join(timeout)
+
+    # ---- writer thread ----
+
+    def _gather(self):
+        """Block for the first write, then take whatever else is queued (waiting up to BATCH_WINDOW)."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_WINDOW
+
+        while len(batch) < MAX_BATCH and batch[-1][0] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        conn = open_connection(self.db_path)
+        conn.execute(f"PRAGMA synchronous = {DURABILITY[self.durability]}")
+        try:
+            while True:
+                batch = self._gather()
+                stop = batch[-1][0] is _STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._commit_batch(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.cursor()
+            for write, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cur.execute("SAVEPOINT write")
+                try:
+                    results.append((future, write(cur), None))
+                    cur.execute("RELEASE write")
+                except Exception as e:
+                    cur.execute("ROLLBACK TO write")
+                    cur.execute("RELEASE write")
+                    results.append((future, None, e))
+            conn.commit()
+        except sqlite3.Error as e:
+            # The whole transaction is gone: every write in it failed
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(results)
+        for future, value, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path: str) -> GroupCommitWriter:
+    writer = _writers.get(db_path)
+    if writer is None or not writer.alive:
+        with _writers_lock:
+            writer = _writers.get(db_path)
+            if writer is None or not writer.alive:
+                writer = GroupCommitWriter(db_path)
+                _writers[db_path] = writer
+    return writer
+
+
+def stop_all() -> None:
+    """Flush and stop every writer (app shutdown)."""
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.stop()
+        _writers.clear()
@@ -18,6 +18,7 @@ import {
   deleteVersion,
   clearAllVersions,
   generateTestCases,
+  isSuperseded,
 } from "../utils/api";
 
 function Home({ theme, setTheme }) {
@@ -26,6 +27,8 @@ function Home({ theme, setTheme }) {
   const [code, setCode] = useState("");
 
   const [issues, setIssues] = useState([]);
+  // Exact per-type totals; `issues` is capped (saved with each version)
+  const [issueCounts, setIssueCounts] = useState(null);
   const [activeFilter, setActiveFilter] = useState("all");
 
   const [complexity, setComplexity] = useState(null);
@@ -64,6 +67,7 @@ function Home({ theme, setTheme }) {
   useEffect(() => {
     if (isCodeEmpty) {
       setIssues([]);
+      setIssueCounts(null);
       setComplexity(null);
       setScores({ finalScore: null });
       setRefactoredCode("");
@@ -98,15 +102,23 @@ function Home({ theme, setTheme }) {
     if (isCodeEmpty) {
       // Clean analyze screen (no backend call)
       setIssues([]);
+      setIssueCounts(null);
       setComplexity(null);
       setScores({ finalScore: null });
       scrollTo(issuesRef);
       return;
     }
 
-    const result = await analyzeCode(code);
+    let result;
+    try {
+      result = await analyzeCode(code);
+    } catch (err) {
+      if (isSuperseded(err)) return;
+      throw err;
+    }
 
     setIssues(result.issues);
+    setIssueCounts(result.issueSummary?.counts ?? null);
 
     const c = result.complexity;
     setComplexity({
@@ -134,7 +146,13 @@ function Home({ theme, setTheme }) {
       return;
     }
 
-    const result = await refactorCode(code, issues);
+    let result;
+    try {
+      result = await refactorCode(code, issues);
+    } catch (err) {
+      if (isSuperseded(err)) return; // a newer refactor is running
+      throw err;
+    }
     setRefactoredCode(result.refactoredCode);
     setExplanation(result.explanation);
   }
@@ -142,6 +160,7 @@ function Home({ theme, setTheme }) {
   async function handleFullPipeline() {
     if (isCodeEmpty) {
       setIssues([]);
+      setIssueCounts(null);
       setComplexity(null);
       setScores({ finalScore: null });
       setRefactoredCode("");
@@ -150,9 +169,16 @@ function Home({ theme, setTheme }) {
       return;
     }
 
-    const result = await analyzeAndRefactor(code);
+    let result;
+    try {
+      result = await analyzeAndRefactor(code);
+    } catch (err) {
+      if (isSuperseded(err)) return;
+      throw err;
+    }
 
     setIssues(result.issues);
+    setIssueCounts(result.issueSummary?.counts ?? null);
     setComplexity(result.complexity);
     setScores({
       readability: result.readability,
@@ -170,6 +196,7 @@ function Home({ theme, setTheme }) {
       original_code: code,
       refactored_code: result.refactoredCode,
       issues: result.issues,
+      issueCounts: result.issueSummary?.counts ?? null,
       complexity: result.complexity,
       qualityScore: result.qualityScore,
     });
@@ -192,6 +219,7 @@ function Home({ theme, setTheme }) {
       );
       setTestCases(tests);
     } catch (err) {
+      if (isSuperseded(err)) return;
       console.error("Test case generation failed", err);
     }
   }
@@ -202,6 +230,7 @@ function Home({ theme, setTheme }) {
         original_code: code,
         refactored_code: refactoredCode || code,
         issues,
+        issueCounts,
         complexity,
         qualityScore: scores.finalScore,
       });
@@ -9,25 +9,175 @@ export const sessionId =
     return id;
   })();
 
+// CODE HANDLES
+// Large sources are uploaded once (PUT /blobs) and then sent as a
+// content-hash ref; a 410 means the server dropped it, so re-upload.
+const INLINE_CODE_LIMIT = 8 * 1024;
+const CODE_REF_CACHE_SIZE = 16;
+const codeRefs = new Map(); // code -> code_ref
+
+async function gzip(text) {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+  return new Response(stream).arrayBuffer();
+}
+
+async function uploadCode(code) {
+  const headers = { "Content-Type": "text/plain; charset=utf-8" };
+  let body = code;
+  if (typeof CompressionStream !== "undefined") {
+    headers["Content-Encoding"] = "gzip";
+    body = await gzip(code);
+  }
+
+  const res = await fetch(`${BASE_URL}/blobs`, { method: "PUT", headers, body });
+
+  if (!res.ok) throw new Error("Upload failed");
+  const { code_ref } = await res.json();
+
+  codeRefs.set(code, code_ref);
+  if (codeRefs.size > CODE_REF_CACHE_SIZE) {
+    codeRefs.delete(codeRefs.keys().next().value);
+  }
+  return code_ref;
+}
+
+// { code, original_code, ... } -> body fields, large ones as *_ref
+async function codeFields(fields) {
+  const body = {};
+  for (const [name, code] of Object.entries(fields)) {
+    const refName = name === "code" ? "code_ref" : `${name}_ref`;
+    if (typeof code !== "string" || code.length < INLINE_CODE_LIMIT) {
+      body[name] = code;
+    } else {
+      body[refName] = codeRefs.get(code) ?? (await uploadCode(code));
+    }
+  }
+  return body;
+}
+
+async function postWithCode(path, fields, extra = {}, headers = {}, signal) {
+  const send = async () =>
+    fetch(`${BASE_URL}${path}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", ...headers },
+      body: JSON.stringify({ ...extra, ...(await codeFields(fields)) }),
+      signal,
+    });
+
+  const res = await send();
+  if (res.status !== 410) return res;
+
+  for (const code of Object.values(fields)) codeRefs.delete(code);
+  return send();
+}
+
+// A new request of the same kind aborts the previous one; the server sees
+// the disconnect and stops its analysis / Gemini call (services/cancellation.py).
+// Callers ignore errors for which isSuperseded(err) is true.
+const inFlight = new Map();
+
+function supersede(kind) {
+  inFlight.get(kind)?.abort();
+  const controller = new AbortController();
+  inFlight.set(kind, controller);
+  return controller.signal;
+}
+
+export function isSuperseded(err) {
+  return err?.name === "AbortError";
+}
+
+// Compact issues reference shared message templates (see services/responses.py)
+function expandIssues(issues) {
+  if (!issues || issues.format !== "compact") return issues;
+
+  const fill = (template, args) => {
+    let i = 0;
+    return template.replace(/\{\}/g, () => args[i++] ?? "{}");
+  };
+  return issues.rows.map(([type, line, severity, message, suggestion, args]) => ({
+    type,
+    message: fill(issues.templates[message], args),
+    line,
+    severity,
+    suggestion: fill(issues.templates[suggestion], args),
+  }));
+}
+
 // ANALYZE CODE
-export async function analyzeCode(code) {
-  const res = await fetch(`${BASE_URL}/analyze`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ code }),
-  });
+// Recent results keyed by ETag: re-analyzing unchanged code gets a 304
+const ANALYSIS_CACHE_SIZE = 8;
+const analysisCache = new Map();
+
+// profile: "full" (default) or "fast" (lint-as-you-type: syntax, nesting,
+// naming; no complexity score or quality scores)
+export async function analyzeCode(code, profile = "full") {
+  const headers = {};
+  if (analysisCache.size) {
+    headers["If-None-Match"] = [...analysisCache.keys()].join(", ");
+  }
+
+  const res = await postWithCode(
+    "/analyze?issue_format=compact", { code }, { profile }, headers, supersede(`analyze:${profile}`)
+  );
+
+  const etag = res.headers.get("ETag");
+  if (res.status === 304 && analysisCache.has(etag)) {
+    return analysisCache.get(etag);
+  }
 
   if (!res.ok) throw new Error("Analyze failed");
-  return await res.json();
+  const data = await res.json();
+  data.issues = expandIssues(data.issues);
+
+  if (etag) {
+    analysisCache.delete(etag);
+    analysisCache.set(etag, data);
+    if (analysisCache.size > ANALYSIS_CACHE_SIZE) {
+      analysisCache.delete(analysisCache.keys().next().value);
+    }
+  }
+  return data;
+}
+
+// LIVE ANALYSIS (WebSocket): send every edit, get one result per pause in
+// typing; stale revisions are cancelled server-side
+export function openLiveAnalysis({ onResult, onError, profile = "fast" } = {}) {
+  const ws = new WebSocket(`${BASE_URL.replace(/^http/, "ws")}/analyze/live`);
+  const queued = [];
+  let rev = 0;
+
+  ws.onopen = () => queued.splice(0).forEach((m) => ws.send(m));
+  ws.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    // Ignore anything older than the newest edit
+    if (message.rev !== undefined && message.rev !== rev) return;
+
+    if (message.type === "result") {
+      const result = message.result;
+      result.issues = expandIssues(result.issues);
+      onResult?.(result, message);
+    } else if (message.type === "error") {
+      onError?.(message);
+    }
+  };
+
+  return {
+    update(code, { immediate = false } = {}) {
+      rev += 1;
+      const message = JSON.stringify({ type: "update", rev, code, profile, immediate });
+      if (ws.readyState === WebSocket.OPEN) ws.send(message);
+      else queued.splice(0, queued.length, message);
+    },
+    close() {
+      ws.close();
+    },
+  };
 }
 
 // AI REFACTOR
 export async function refactorCode(code, issues = []) {
-  const res = await fetch(`${BASE_URL}/ai/refactor`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ code, issues }),
-  });
+  const res = await postWithCode("/ai/refactor", { code }, { issues }, {}, supersede("refactor"));
 
   const data = await res.json();
 
@@ -39,11 +189,7 @@ export async function refactorCode(code, issues = []) {
 
 // ANALYZE + REFACTOR
 export async function analyzeAndRefactor(code) {
-  const res = await fetch(`${BASE_URL}/ai/analyze-and-refactor`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ code }),
-  });
+  const res = await postWithCode("/ai/analyze-and-refactor", { code }, {}, {}, supersede("pipeline"));
 
   if (!res.ok) throw new Error("Pipeline failed");
   return res.json();
@@ -51,23 +197,31 @@ export async function analyzeAndRefactor(code) {
 
 // TEST CASES
 export async function generateTestCases(code) {
-  const res = await fetch(`${BASE_URL}/ai/testcases`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ code }),
-  });
+  const res = await postWithCode("/ai/testcases", { code }, {}, {}, supersede("testcases"));
 
   if (!res.ok) throw new Error("Testcase generation failed");
   const data = await res.json();
   return data.test_cases ?? [];
 }
 
-// VERSION HISTORY
+// VERSION HISTORY (follows cursor pages until has_more is false)
 export async function getVersionHistory() {
-  const res = await fetch(`${BASE_URL}/versions/${sessionId}`);
-  if (!res.ok) return [];
-  const data = await res.json();
-  return data.history ?? [];
+  const history = [];
+  let cursor = null;
+
+  do {
+    const params = new URLSearchParams({ limit: "200" });
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`${BASE_URL}/versions/${sessionId}?${params}`);
+    if (!res.ok) return history;
+    const data = await res.json();
+
+    history.push(...(data.history ?? []));
+    cursor = data.has_more ? data.next_cursor : null;
+  } while (cursor);
+
+  return history;
 }
 
 export async function getVersionDetails(versionId) {
@@ -81,14 +235,12 @@ export async function getVersionDetails(versionId) {
 }
 
 export async function saveVersion(snapshot) {
-  const res = await fetch(`${BASE_URL}/versions/save`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({
-      session_id: sessionId,
-      ...snapshot,
-    }),
-  });
+  const { original_code, refactored_code, ...rest } = snapshot;
+  const res = await postWithCode(
+    "/versions/save",
+    { original_code, refactored_code },
+    { session_id: sessionId, ...rest }
+  );
 
   if (!res.ok) throw new Error("Save version failed");
   return res.json();